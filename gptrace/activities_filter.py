@@ -0,0 +1,332 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import errno
+import fnmatch
+import functools
+import itertools
+import operator
+import re
+import shlex
+
+from ptrace.syscall import SYSCALL_NAMES
+
+from gptrace.syscall_format import format_syscall
+
+KEY_SYSCALL = 'syscall'
+KEY_PID = 'pid'
+KEY_RESULT = 'result'
+KEY_ERRNO = 'errno'
+KEY_PATH = 'path'
+KEY_TIME = 'time'
+KEY_TEXT = 'text'
+# The cheapest tests are checked first
+KEYS_ORDER = (KEY_SYSCALL, KEY_PID, KEY_ERRNO, KEY_RESULT, KEY_TIME,
+              KEY_PATH, KEY_TEXT)
+COMPARISONS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+COMPARISON_PATTERN = re.compile(r'(!=|<=|>=|<|>|=)?(-?\d+)$')
+TIME_PATTERN = re.compile(r'([\d.]*)-([\d.]*)$')
+# States of the names checked on demand in the bitmaps
+NAME_UNKNOWN = 0
+NAME_REJECTED = 1
+NAME_ACCEPTED = 2
+# A full refilter is faster than notifying more than a fraction of the rows
+REFILTER_FRACTION = 4
+
+
+class FilterError(Exception):
+    pass
+
+
+def is_pattern(value):
+    """Check if the value contains any glob wildcard"""
+    return any(character in value for character in '*?[')
+
+
+def match_patterns(name, patterns):
+    """Check if the name matches any of the glob patterns"""
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+
+
+def parse_pids(values):
+    """Convert the values to a set of processes identifiers"""
+    try:
+        return frozenset(int(value) for value in values)
+    except ValueError:
+        raise FilterError(f'Invalid PID: {",".join(values)}')
+
+
+def create_names_test(patterns, names, get_id):
+    """Create a test matching the interned names of a column against the
+    glob patterns, checking every name only once in a bitmap"""
+    bitmap = bytearray()
+
+    def test(index):
+        name_id = get_id(index)
+        if name_id >= len(bitmap):
+            bitmap.extend(bytes(name_id + 1 - len(bitmap)))
+        state = bitmap[name_id]
+        if state == NAME_UNKNOWN:
+            name = names[name_id]
+            state = (NAME_ACCEPTED
+                     if name is not None and match_patterns(name, patterns)
+                     else NAME_REJECTED)
+            bitmap[name_id] = state
+        return state == NAME_ACCEPTED
+    return test
+
+
+def compile_syscall(values, store):
+    """Match the syscall names or glob patterns"""
+    known = set(SYSCALL_NAMES.values())
+    for value in values:
+        if not is_pattern(value) and value not in known:
+            raise FilterError(f'Unknown syscall: {value}')
+    return create_names_test(values, store.syscalls_names,
+                             store.get_syscall_id)
+
+
+def compile_pid(values, store):
+    """Match the processes identifiers"""
+    pids = parse_pids(values)
+    get_pid = store.get_pid
+    return lambda index: get_pid(index) in pids
+
+
+def compile_result(values, store):
+    """Match the syscalls results, using a comparison operator or else
+    the equality"""
+    results = set()
+    comparisons = []
+    for value in values:
+        match = COMPARISON_PATTERN.match(value)
+        if not match:
+            raise FilterError(f'Invalid result: {value}')
+        comparison, number = match.groups()
+        if comparison in (None, '='):
+            results.add(int(number))
+        else:
+            comparisons.append((COMPARISONS[comparison], int(number)))
+    get_result = store.get_result
+    if not comparisons:
+        return lambda index: get_result(index) in results
+    elif len(comparisons) == 1 and not results:
+        function, number = comparisons[0]
+
+        def test(index):
+            result = get_result(index)
+            return result is not None and function(result, number)
+        return test
+
+    def test(index):
+        result = get_result(index)
+        return result is not None and (
+            result in results or
+            any(function(result, number)
+                for function, number in comparisons))
+    return test
+
+
+def compile_errno(values, store):
+    """Match the syscalls failed with the error names or numbers"""
+    results = set()
+    for value in values:
+        code = (int(value) if value.isdigit()
+                else getattr(errno, value.upper(), None))
+        if code is None:
+            raise FilterError(f'Unknown error: {value}')
+        results.add(-code)
+    get_result = store.get_result
+    return lambda index: get_result(index) in results
+
+
+def compile_path(values, store):
+    """Match the first path of the syscalls against the glob patterns"""
+    return create_names_test(values, store.paths_names, store.get_path_id)
+
+
+def compile_time(values, store):
+    """Match the syscalls in the START-END ranges of seconds since the
+    session start, each bound being optional"""
+    ranges = []
+    for value in values:
+        match = TIME_PATTERN.match(value)
+        try:
+            start, end = match.groups()
+            ranges.append((round(float(start or 0) * 1000000000),
+                           round(float(end) * 1000000000)
+                           if end else float('inf')))
+        except (AttributeError, ValueError):
+            raise FilterError(f'Invalid time range: {value}')
+    get_timestamp = store.get_timestamp
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        return lambda index: start <= get_timestamp(index) <= end
+    return lambda index: any(start <= get_timestamp(index) <= end
+                             for start, end in ranges)
+
+
+def compile_text(values, store):
+    """Match the texts in the rendered syscalls, ignoring the case"""
+    texts = [value.lower() for value in values]
+
+    def test(index):
+        syscall = store.get_syscall(index)
+        line = format_syscall(syscall, store.get_arguments(index)).lower()
+        return any(text in line for text in texts)
+    return test
+
+
+COMPILERS = {
+    KEY_SYSCALL: compile_syscall,
+    KEY_PID: compile_pid,
+    KEY_RESULT: compile_result,
+    KEY_ERRNO: compile_errno,
+    KEY_PATH: compile_path,
+    KEY_TIME: compile_time,
+    KEY_TEXT: compile_text,
+}
+
+
+def negate(test):
+    """Invert the result of a test"""
+    return lambda index: not test(index)
+
+
+def parse_filter(expression):
+    """
+    Parse a filter expression to its terms, each one made of the negation,
+    the key and the values.
+
+    The expression is made of space separated terms, all of which must
+    match. Each term is key:value1,value2 where any value can match, a
+    leading ! excludes the matching rows and the terms without a key
+    search the text. The keys are syscall, pid, result, errno, path,
+    time and text.
+    """
+    try:
+        words = shlex.split(expression)
+    except ValueError as error:
+        raise FilterError(str(error))
+    terms = []
+    for word in words:
+        negated = word.startswith('!')
+        if negated:
+            word = word[1:]
+        key, separator, value = word.partition(':')
+        if not separator:
+            key, value = KEY_TEXT, word
+        elif key not in COMPILERS:
+            raise FilterError(f'Unknown filter: {key}')
+        values = tuple(item for item in value.split(',') if item)
+        if not values:
+            raise FilterError(f'Missing value for the filter: {key}')
+        terms.append((negated, key, values))
+    return terms
+
+
+def compile_terms(terms, store):
+    """
+    Compile the parsed terms to a single predicate over the row indexes
+    of the activities store, returning None when there are no terms
+    """
+    tests = []
+    for negated, key, values in terms:
+        test = COMPILERS[key](values, store)
+        tests.append((KEYS_ORDER.index(key), negate(test) if negated
+                      else test))
+    if not tests:
+        return None
+    tests = [test for _, test in sorted(tests, key=operator.itemgetter(0))]
+    if len(tests) == 1:
+        return tests[0]
+
+    def predicate(index):
+        for test in tests:
+            if not test(index):
+                return False
+        return True
+    return predicate
+
+
+def compile_filter(expression, store):
+    """Compile a filter expression to a single predicate over the row
+    indexes of the activities store, returning None for an empty
+    expression"""
+    return compile_terms(parse_filter(expression), store)
+
+
+def create_group_test(terms, key):
+    """Create a test for the syscalls names or the processes identifiers
+    accepted by all the terms of a key"""
+    tests = []
+    for negated, term_key, values in terms:
+        if term_key == key == KEY_SYSCALL:
+            tests.append((negated,
+                          functools.partial(match_patterns, patterns=values)))
+        elif term_key == key == KEY_PID:
+            tests.append((negated, parse_pids(values).__contains__))
+    return lambda name: all(test(name) != negated for negated, test in tests)
+
+
+def get_changed_rows(previous_terms, terms, store):
+    """
+    Get the sorted indexes of the rows which could change their visibility
+    switching from the previous terms to the new terms, using the rows
+    indexes of the syscalls and of the processes.
+    Return None when the terms differ by any other key or when there are
+    too many rows to check them one by one.
+    """
+    changed_keys = {key for _, key, _ in
+                    set(previous_terms).symmetric_difference(terms)}
+    if not changed_keys.issubset((KEY_SYSCALL, KEY_PID)):
+        return None
+    limit = len(store) // REFILTER_FRACTION
+    count = 0
+    rows_lists = []
+    for key, names, postings in (
+            (KEY_SYSCALL, store.syscalls_names, store.syscalls_rows),
+            (KEY_PID, None, store.pids_rows)):
+        if key not in changed_keys:
+            continue
+        # The other terms are the same, so only the rows whose group is
+        # accepted differently can change their visibility
+        previous_test = create_group_test(previous_terms, key)
+        test = create_group_test(terms, key)
+        for group in postings:
+            name = group if names is None else names[group]
+            if previous_test(name) != test(name):
+                rows_count = postings.get_count(group)
+                if not rows_count:
+                    continue
+                count += rows_count
+                if count > limit:
+                    return None
+                rows_lists.append(postings.get_rows(group))
+    if len(rows_lists) == 1:
+        return rows_lists[0]
+    return sorted(set(itertools.chain.from_iterable(rows_lists)))
@@ -25,6 +25,17 @@ from gptrace.constants import (APP_NAME,
                                VERBOSE_LEVEL_QUIET,
                                VERBOSE_LEVEL_NORMAL,
                                VERBOSE_LEVEL_MAX)
+from gptrace.decoding_profiles import parse_profile
+
+
+def parse_decoding(value):
+    """Parse a decoding profile option as a (name, profile) tuple"""
+    name, _, profile = value.partition('=')
+    try:
+        return name.strip(), parse_profile(profile)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f'invalid decoding profile: {value}')
 
 
 class CommandLineOptions(object):
@@ -49,6 +60,52 @@ class CommandLineOptions(object):
                                  action='store_const',
                                  const=VERBOSE_LEVEL_QUIET,
                                  help='hide error and information messages')
+        group = self.add_group('Headless tracing')
+        group.add_argument('--headless',
+                           action='store_true',
+                           help='trace the program without user interface')
+        group.add_argument('-o', '--output',
+                           default='-',
+                           help='file where to write the traced events '
+                                '(default to standard output)')
+        group.add_argument('-r', '--record',
+                           help='file where to record the binary trace')
+        group.add_argument('-s', '--syscalls',
+                           help='comma separated list of syscalls to trace '
+                                '(default to every syscall)')
+        group.add_argument('--seccomp',
+                           action='store_true',
+                           help='filter the syscalls in the kernel (without '
+                                'CAP_SYS_ADMIN the setuid programs run '
+                                'without their privileges)')
+        group.add_argument('-c', '--counts-only',
+                           action='store_true',
+                           help='count the syscalls without decoding them')
+        group.add_argument('-d', '--decoding',
+                           action='append',
+                           type=parse_decoding,
+                           default=[],
+                           metavar='NAME=LENGTH,ITEMS,BUFFERS',
+                           help='decoding profile for a syscall or for the '
+                                'file, socket, memory, process and default '
+                                'categories (can be repeated)')
+        group.add_argument('-p', '--pid',
+                           action='append',
+                           type=int,
+                           default=[],
+                           help='attach the running process with the PID '
+                                '(can be repeated)')
+        group.add_argument('-n', '--name',
+                           action='append',
+                           default=[],
+                           help='attach every running process with the name '
+                                '(can be repeated)')
+        group.add_argument('-t', '--threads',
+                           action='store_true',
+                           help='attach every thread of the processes')
+        group.add_argument('program',
+                           nargs=argparse.REMAINDER,
+                           help='program to trace with its arguments')
         self.options = None
 
     # noinspection PyProtectedMember,PyUnresolvedReferences
@@ -68,4 +125,12 @@ class CommandLineOptions(object):
         :return: command-line options
         """
         self.options = self.parser.parse_args()
+        # Skip the separator between the options and the program
+        if self.options.program and self.options.program[0] == '--':
+            self.options.program.pop(0)
+        if self.options.headless and not (self.options.program or
+                                          self.options.pid or
+                                          self.options.name):
+            self.parser.error('the program to trace or the processes to '
+                              'attach are required for the headless tracing')
         return self.options
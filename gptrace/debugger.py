@@ -0,0 +1,449 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+
+import errno
+import logging
+import os
+import select
+import signal
+import threading
+
+from ptrace import PtraceError
+from ptrace.binding import HAS_PTRACE_EVENTS
+from ptrace.binding.func import (ptrace,
+                                 ptrace_detach,
+                                 PTRACE_EVENT_EXEC,
+                                 THREAD_TRACE_FLAGS,
+                                 WPTRACEEVENT)
+from ptrace.linux_proc import (readProcesses,
+                               readProcessCmdline,
+                               readProcessStat,
+                               ProcError)
+from ptrace.ctypes_tools import formatAddress
+from ptrace.debugger import (DebuggerError,
+                             PtraceDebugger,
+                             PtraceProcess,
+                             ProcessError,
+                             ProcessEvent,
+                             ProcessExit,
+                             ProcessSignal)
+
+from gptrace.process_memory import (ProcessMemoryReader,
+                                    get_page_remainder,
+                                    is_process_vm_readv_available)
+from gptrace.seccomp_filter import (PTRACE_EVENT_SECCOMP,
+                                    PTRACE_O_TRACESECCOMP)
+
+PTRACE_SEIZE = 0x4206
+PTRACE_INTERRUPT = 0x4207
+PTRACE_LISTEN = 0x4208
+PTRACE_EVENT_STOP = 128
+# Signals stopping every thread of a process
+GROUP_STOP_SIGNALS = (signal.SIGSTOP,
+                      signal.SIGTSTP,
+                      signal.SIGTTIN,
+                      signal.SIGTTOU)
+
+
+class DebuggerWakeup(Exception):
+    """The wait for the next event was interrupted on request"""
+    pass
+
+
+class SeccompEvent(ProcessEvent):
+    def __init__(self, process):
+        """A syscall matching the seccomp filter is being entered"""
+        ProcessEvent.__init__(self, process, f'Seccomp stop of {process}')
+
+
+class StartEvent(ProcessEvent):
+    def __init__(self, process):
+        """The traced program has been started"""
+        ProcessEvent.__init__(self, process, f'Start of {process}')
+
+
+class AttachEvent(ProcessEvent):
+    def __init__(self, process):
+        """A running process has been attached"""
+        ProcessEvent.__init__(self, process, f'Attach of {process}')
+
+
+class InterruptEvent(ProcessEvent):
+    def __init__(self, process, signum):
+        """An attached process was stopped by an interrupt or by a signal
+        stopping every thread"""
+        ProcessEvent.__init__(self, process, f'Interrupt stop of {process}')
+        self.signum = signum
+
+    def is_group_stop(self):
+        """Check if the whole process is being stopped by a signal"""
+        return self.signum in GROUP_STOP_SIGNALS
+
+
+def is_signal_delivery(event):
+    """Check if the event is a signal being delivered to the process"""
+    return (isinstance(event, ProcessSignal) and
+            event.signum != signal.SIGTRAP | 0x80)
+
+
+def find_processes(name):
+    """Find the processes whose name or program matches the name"""
+    for pid in readProcesses():
+        try:
+            program = readProcessCmdline(pid, escape_stat=False)
+            if (readProcessStat(pid).program == name or
+                    (program and os.path.basename(program[0]) == name)):
+                yield pid
+        except ProcError:
+            # The process has exited
+            continue
+
+
+def list_threads(pid):
+    """Get the identifiers of every thread of a process"""
+    try:
+        return sorted(int(tid) for tid in os.listdir(f'/proc/{pid}/task'))
+    except OSError:
+        return []
+
+
+class TracerProcess(PtraceProcess):
+    def __init__(self, debugger, pid, is_attached, parent=None,
+                 is_thread=False):
+        """Traced process, optionally attached without stopping it"""
+        PtraceProcess.__init__(self, debugger, pid, is_attached,
+                               parent=parent, is_thread=is_thread)
+        self.seized = False
+        # Resources used by the process, available after its exit
+        self.rusage = None
+        # Read the memory from /proc/<pid>/mem or with process_vm_readv
+        self.use_memory_file = True
+        self.memory_fd = None
+        self.memory_reader = (ProcessMemoryReader(pid)
+                              if is_process_vm_readv_available() else None)
+
+    def processStatus(self, status):
+        """Handle the stops of the attached processes"""
+        if (os.WIFSTOPPED(status) and
+                WPTRACEEVENT(status) == PTRACE_EVENT_STOP):
+            self.is_stopped = True
+            return InterruptEvent(self, os.WSTOPSIG(status))
+        return PtraceProcess.processStatus(self, status)
+
+    def ptraceEvent(self, event):
+        """Handle the ptrace events unknown to python-ptrace"""
+        if event == PTRACE_EVENT_SECCOMP:
+            return SeccompEvent(self)
+        elif event == PTRACE_EVENT_EXEC:
+            self.close_memory()
+        return PtraceProcess.ptraceEvent(self, event)
+
+    def open_memory(self):
+        """Open the /proc/<pid>/mem file to read the process memory"""
+        try:
+            self.memory_fd = os.open(f'/proc/{self.pid}/mem',
+                                     os.O_RDONLY | os.O_CLOEXEC)
+        except OSError as error:
+            logging.info(f'Unable to open the memory of {self.pid}: {error}')
+            self.use_memory_file = False
+
+    def close_memory(self):
+        """Close the /proc/<pid>/mem file, which cannot be read anymore
+        after the process has executed another program"""
+        if self.memory_fd is not None:
+            os.close(self.memory_fd)
+            self.memory_fd = None
+
+    def read_memory(self, address, size):
+        """Read the process memory with a single copy, returning less data
+        when the range crosses an unreadable page"""
+        if self.use_memory_file:
+            if self.memory_fd is None:
+                self.open_memory()
+            if self.memory_fd is not None:
+                try:
+                    data = os.pread(self.memory_fd, size, address)
+                except OSError:
+                    # The address is checked again with process_vm_readv
+                    data = None
+                if data:
+                    return data
+                elif data is not None:
+                    # The kernel doesn't allow to read the private mappings
+                    logging.info(f'Unable to read the memory of {self.pid}')
+                    self.use_memory_file = False
+                    self.close_memory()
+        if self.memory_reader:
+            try:
+                return self.memory_reader.read(address, size)
+            except OSError as error:
+                if error.errno not in (errno.ENOSYS, errno.EPERM):
+                    raise ProcessError(self, f'readBytes('
+                                             f'{formatAddress(address)}, '
+                                             f'{size}) error: {error}')
+                logging.info(f'process_vm_readv is not available: {error}')
+                self.memory_reader = None
+        # Read the memory word by word
+        return self._readBytes(address, size)
+
+    def readBytes(self, address, size):
+        """Read size bytes from the process memory"""
+        data = self.read_memory(address, size) if size else b''
+        if len(data) < size:
+            raise ProcessError(self, f'readBytes({formatAddress(address)}, '
+                                     f'{size}) error: partial read')
+        return data
+
+    def readCString(self, address, max_size, chunk_length=None):
+        """Read a NUL terminated string of up to max_size bytes, returning
+        the string and if it was truncated. Each read stops at the page end,
+        so the unmapped pages after the string are never read"""
+        chunks = []
+        size = 0
+        while size <= max_size:
+            length = min(get_page_remainder(address), max_size + 1 - size)
+            try:
+                chunk = self.read_memory(address, length)
+            except PtraceError:
+                if not chunks:
+                    raise
+                # The string continues in an unreadable page
+                break
+            position = chunk.find(b'\0')
+            if position >= 0:
+                chunks.append(chunk[:position])
+                return b''.join(chunks), False
+            chunks.append(chunk)
+            size += length
+            address += length
+        return b''.join(chunks)[:max_size], True
+
+    def interrupt(self):
+        """Stop an attached process"""
+        ptrace(PTRACE_INTERRUPT, self.pid)
+
+    def listen(self):
+        """Restart an attached process leaving it stopped by a signal"""
+        ptrace(PTRACE_LISTEN, self.pid)
+        self.is_stopped = False
+
+
+class TracerDebugger(PtraceDebugger):
+    def __init__(self):
+        """Debugger creating TracerProcess objects for the traced processes"""
+        PtraceDebugger.__init__(self)
+        self.trace_seccomp = False
+        # Status of the processes stopped before being added
+        self.pending_statuses = {}
+        self.wakeup_requested = False
+        self.wakeup_fd = None
+        self.wakeup_pipe = None
+        self.previous_handler = None
+        if threading.current_thread() is threading.main_thread():
+            # Sleep on a pipe written by SIGCHLD or by a wakeup request
+            self.wakeup_pipe = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+            self.wakeup_fd = signal.set_wakeup_fd(self.wakeup_pipe[1])
+            self.previous_handler = signal.signal(signal.SIGCHLD,
+                                                  lambda signum, frame: None)
+
+    def traceSeccomp(self):
+        """Enable the seccomp stops for the filtered syscalls"""
+        self.trace_seccomp = True
+        self.options |= PTRACE_O_TRACESECCOMP
+
+    def addProcess(self, pid, is_attached, parent=None, is_thread=False):
+        """Add a new process using its identifier"""
+        if pid in self.dict:
+            raise KeyError(f'The process {pid} is already registered!')
+        process = TracerProcess(self, pid, is_attached,
+                                parent=parent, is_thread=is_thread)
+        if parent is not None and parent.seized:
+            # The children of the attached processes are left running
+            process.seized = True
+            process.was_attached = False
+        logging.info(f'Attach {process} to debugger')
+        self.dict[pid] = process
+        self.list.append(process)
+        try:
+            event = process.waitEvent()
+            if not isinstance(event, (ProcessSignal, InterruptEvent)):
+                raise event
+            if (isinstance(event, ProcessSignal) and
+                    event.signum not in (signal.SIGTRAP, signal.SIGSTOP)):
+                event.display()
+        except:   # noqa: E722
+            process.is_attached = False
+            process.detach()
+            raise
+        if HAS_PTRACE_EVENTS and self.options and not process.seized:
+            process.setoptions(self.options)
+        return process
+
+    def seizeProcesses(self, targets):
+        """Attach many running processes as (pid, is_thread) tuples, stopping
+        them only after every process was attached"""
+        processes = []
+        for pid, is_thread in targets:
+            if pid in self.dict:
+                continue
+            try:
+                ptrace(PTRACE_SEIZE, pid, 0, self.options)
+            except PtraceError as error:
+                logging.error(f'Unable to attach the process {pid}: {error}')
+                continue
+            process = TracerProcess(self, pid, True, is_thread=is_thread)
+            # Detach the process instead of killing it on quit
+            process.seized = True
+            process.was_attached = False
+            process.is_stopped = False
+            logging.info(f'Attach {process} to debugger')
+            self.dict[pid] = process
+            self.list.append(process)
+            processes.append(process)
+        for process in processes:
+            try:
+                process.interrupt()
+            except PtraceError:
+                # The process has already exited
+                pass
+        for process in processes:
+            self.waitInterrupt(process)
+
+    def waitInterrupt(self, process):
+        """Wait until an attached process gets stopped"""
+        while process.pid in self.dict:
+            event = process.waitEvent()
+            if is_signal_delivery(event):
+                # Deliver the signals received before the interrupt
+                process.cont(event.signum)
+            else:
+                break
+
+    def detachProcess(self, process):
+        """Detach an attached process, leaving it running"""
+        signum = 0
+        if not process.is_stopped:
+            try:
+                process.interrupt()
+                event = process.waitEvent()
+            except PtraceError:
+                return
+            if isinstance(event, ProcessExit):
+                return
+            if is_signal_delivery(event):
+                # Deliver the pending signal
+                signum = event.signum
+        logging.info(f'Detach {process}')
+        process.is_attached = False
+        try:
+            ptrace_detach(process.pid, signum)
+        except PtraceError as error:
+            logging.error(f'Unable to detach the process {process.pid}: '
+                          f'{error}')
+        self.deleteProcess(process)
+
+    def deleteProcess(self, process=None, pid=None):
+        """Remove a process, closing its memory file"""
+        process = process or self.dict.get(pid)
+        if process:
+            process.close_memory()
+            PtraceDebugger.deleteProcess(self, process)
+
+    def wakeup(self):
+        """Interrupt the wait for the next event from another thread"""
+        if self.wakeup_pipe:
+            self.wakeup_requested = True
+            os.write(self.wakeup_pipe[1], b'\0')
+
+    def _wait_event(self, wanted_pid, blocking=True):
+        """Wait for the next event from a process or from any process, using
+        a single waitpid() for every process instead of polling them"""
+        status = self.pending_statuses.pop(wanted_pid, None)
+        if status is not None:
+            return self.dict[wanted_pid].processStatus(status)
+        if wanted_pid is not None:
+            return self._wait_event_pid(wanted_pid, blocking)
+        for pid in self.pending_statuses:
+            if pid in self.dict:
+                return self.dict[pid].processStatus(
+                    self.pending_statuses.pop(pid))
+        flags = THREAD_TRACE_FLAGS
+        if not blocking or self.wakeup_pipe:
+            flags |= os.WNOHANG
+        while True:
+            try:
+                pid, status, rusage = os.wait4(-1, flags)
+            except ChildProcessError:
+                # Every traced process has gone
+                if not self.list:
+                    raise DebuggerError('No process to wait for')
+                return self.list[0].processTerminated()
+            if pid:
+                if pid in self.dict:
+                    if os.WIFEXITED(status) or os.WIFSIGNALED(status):
+                        self.dict[pid].rusage = rusage
+                    return self.dict[pid].processStatus(status)
+                # A new process was stopped before its parent reported it
+                self.pending_statuses[pid] = status
+                continue
+            if not blocking:
+                return None
+            select.select((self.wakeup_pipe[0], ), (), ())
+            try:
+                os.read(self.wakeup_pipe[0], 4096)
+            except BlockingIOError:
+                pass
+            if self.wakeup_requested:
+                self.wakeup_requested = False
+                raise DebuggerWakeup()
+
+    def _wait_event_pid(self, wanted_pid, blocking=True):
+        """Wait for the next event from a process, collecting its resources
+        usage when it terminates"""
+        process = self.dict.get(wanted_pid)
+        if process is None:
+            raise DebuggerError(f'Unknown PID: {wanted_pid}', pid=wanted_pid)
+        flags = 0 if blocking else os.WNOHANG
+        if process.is_thread:
+            flags |= THREAD_TRACE_FLAGS
+        try:
+            pid, status, rusage = os.wait4(wanted_pid, flags)
+        except ChildProcessError:
+            return process.processTerminated()
+        if not pid:
+            return None
+        if os.WIFEXITED(status) or os.WIFSIGNALED(status):
+            process.rusage = rusage
+        return process.processStatus(status)
+
+    def quit(self):
+        """Detach the attached processes and terminate the others"""
+        for process in reversed(list(self.list)):
+            if process.seized and process.running:
+                self.detachProcess(process)
+        PtraceDebugger.quit(self)
+        if self.wakeup_pipe:
+            # Restore the previous signals handling
+            signal.signal(signal.SIGCHLD, self.previous_handler)
+            signal.set_wakeup_fd(self.wakeup_fd)
+            os.close(self.wakeup_pipe[0])
+            os.close(self.wakeup_pipe[1])
+            self.wakeup_pipe = None
@@ -0,0 +1,123 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import logging
+
+from ptrace.func_call import FunctionCallOptions
+from ptrace.syscall import (FILENAME_ARGUMENTS,
+                            SOCKET_SYSCALL_NAMES,
+                            SYSCALL_NAMES,
+                            SYSCALL_PROTOTYPES)
+
+PROFILE_DEFAULT = 'default'
+PROFILE_FILE = 'file'
+PROFILE_SOCKET = 'socket'
+PROFILE_MEMORY = 'memory'
+PROFILE_PROCESS = 'process'
+
+# Strings length, arrays items and buffers capture for each profile
+DEFAULT_PROFILES = {
+    PROFILE_DEFAULT: (300, 20, True),
+    PROFILE_FILE: (300, 20, True),
+    PROFILE_SOCKET: (300, 20, False),
+    PROFILE_MEMORY: (300, 20, False),
+    PROFILE_PROCESS: (300, 64, True),
+}
+MEMORY_SYSCALLS = {
+    'brk', 'get_mempolicy', 'madvise', 'mbind', 'membarrier',
+    'migrate_pages', 'mincore', 'mlock', 'mlock2', 'mlockall', 'mmap',
+    'move_pages', 'mprotect', 'mremap', 'msync', 'munlock', 'munlockall',
+    'munmap', 'pkey_alloc', 'pkey_free', 'pkey_mprotect',
+    'process_vm_readv', 'process_vm_writev', 'remap_file_pages',
+    'set_mempolicy', 'shmat', 'shmctl', 'shmdt', 'shmget',
+}
+PROCESS_SYSCALLS = {
+    'clone', 'clone3', 'execve', 'execveat', 'exit', 'exit_group', 'fork',
+    'kill', 'pidfd_open', 'pidfd_send_signal', 'prctl', 'ptrace',
+    'rt_sigqueueinfo', 'rt_tgsigqueueinfo', 'setpgid', 'setsid',
+    'tgkill', 'tkill', 'vfork', 'wait4', 'waitid',
+}
+# Arguments pointing to the data transferred by the syscalls
+BUFFER_ARGUMENTS = {'_payload', 'buf', 'msgp', 'optval', 'value'}
+
+
+class DecodingProfile(FunctionCallOptions):
+    def __init__(self, string_max_length, max_array_count, capture_buffers,
+                 instr_pointer):
+        """Options to decode the syscalls arguments, reading the buffers
+        contents only if capture_buffers is set"""
+        FunctionCallOptions.__init__(self,
+                                     write_types=True,
+                                     write_argname=True,
+                                     replace_socketcall=False,
+                                     string_max_length=string_max_length,
+                                     write_address=False,
+                                     max_array_count=max_array_count)
+        self.capture_buffers = capture_buffers
+        self.instr_pointer = instr_pointer
+
+
+def get_category(syscall):
+    """Get the profile name of the syscall category"""
+    if syscall in PROCESS_SYSCALLS:
+        return PROFILE_PROCESS
+    elif syscall in MEMORY_SYSCALLS:
+        return PROFILE_MEMORY
+    elif syscall in SOCKET_SYSCALL_NAMES:
+        return PROFILE_SOCKET
+    arguments = SYSCALL_PROTOTYPES.get(syscall, ('', ()))[1]
+    if any(name in FILENAME_ARGUMENTS or name == 'fd'
+           for _, name in arguments):
+        return PROFILE_FILE
+    return PROFILE_DEFAULT
+
+
+def parse_profile(text):
+    """Parse the strings length, the arrays items and the buffers capture
+    from a comma separated text"""
+    string_max_length, max_array_count, capture_buffers = text.split(',')
+    return (int(string_max_length),
+            int(max_array_count),
+            capture_buffers.strip().lower() in ('1', 'yes', 'true'))
+
+
+class DecodingProfiles(object):
+    def __init__(self, profiles, instr_pointer):
+        """Select the decoding profile of each syscall, using the profile
+        named after the syscall or else the profile of its category.
+        The profiles are (strings length, arrays items, buffers capture)
+        tuples by syscall or category name"""
+        values = dict(DEFAULT_PROFILES)
+        values.update(profiles or {})
+        created = {name: DecodingProfile(*value, instr_pointer=instr_pointer)
+                   for name, value in values.items()}
+        self.default = created[PROFILE_DEFAULT]
+        self.syscalls = {}
+        for syscall in set(SYSCALL_NAMES.values()):
+            self.syscalls[syscall] = (created.get(syscall) or
+                                      created[get_category(syscall)])
+        for name in values:
+            if name not in DEFAULT_PROFILES and name not in self.syscalls:
+                logging.warning(f'Unknown syscall in the decoding '
+                                f'profiles: {name}')
+
+    def get_profile(self, syscall):
+        """Get the decoding profile of a syscall"""
+        return self.syscalls.get(syscall, self.default)
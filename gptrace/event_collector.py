@@ -0,0 +1,317 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import errno
+import logging
+import threading
+
+from ptrace.debugger.process_event import (NewProcessEvent,
+                                           ProcessExecution,
+                                           ProcessExit)
+from ptrace.signames import signalName
+from ptrace.syscall import FILENAME_ARGUMENTS
+
+from gptrace.debugger import AttachEvent, StartEvent
+
+from gptrace.event_queue import (EVENT_FILE,
+                                 EVENT_IO,
+                                 EVENT_NETWORK,
+                                 EVENT_PROCESS,
+                                 EVENT_PROCESS_NODE,
+                                 EVENT_SYSCALL)
+from gptrace.models.activity_item import ActivityItem
+from gptrace.models.file_item import FileItem
+from gptrace.models.io_item import IOItem
+from gptrace.models.network_item import NetworkItem
+from gptrace.models.process_item import ProcessItem
+from gptrace.models.process_node_item import ProcessNodeItem
+from gptrace.network_tracker import (ADDRESS_SYSCALLS,
+                                     SOCKET_PREFIX,
+                                     NetworkTracker)
+from gptrace.path_resolver import (AT_FDCWD,
+                                   DIRFD_ARGUMENTS,
+                                   PathResolver,
+                                   get_descriptor)
+from gptrace.session_clock import SessionClock
+from gptrace.stat_worker import StatWorker
+from gptrace.syscall_format import read_syscall_arguments
+
+# Syscalls whose files don't exist anymore after a successful call
+REMOVED_FILES = {
+    'rmdir': 'pathname',
+    'unlink': 'pathname',
+    'unlinkat': 'pathname',
+    'rename': 'oldname',
+    'renameat': 'oldname',
+    'renameat2': 'oldname',
+}
+# Syscalls whose filename arguments are not checked by a successful call
+UNCHECKED_FILES = {
+    'symlink': 'old',
+    'symlinkat': 'oldname',
+}
+# Syscalls transferring data with the index of the read and of the written
+# descriptor arguments
+IO_SYSCALLS = {
+    'read': (0, None),
+    'pread64': (0, None),
+    'readv': (0, None),
+    'preadv': (0, None),
+    'preadv2': (0, None),
+    'recvfrom': (0, None),
+    'recvmsg': (0, None),
+    'write': (None, 0),
+    'pwrite64': (None, 0),
+    'writev': (None, 0),
+    'pwritev': (None, 0),
+    'pwritev2': (None, 0),
+    'sendto': (None, 0),
+    'sendmsg': (None, 0),
+    'sendfile': (1, 0),
+    'sendfile64': (1, 0),
+    'splice': (0, 2),
+    'copy_file_range': (0, 2),
+    'tee': (0, 1),
+}
+# Nanoseconds between the updates of the I/O totals
+IO_UPDATE_INTERVAL = 500000000
+# Errors reporting a missing or an existing file
+MISSING_ERRORS = (errno.ENOENT, errno.ENOTDIR)
+EXISTING_ERRORS = (errno.EEXIST, )
+
+
+class EventCollector(object):
+    def __init__(self, syscalls, callback, clock=None):
+        """Convert the tracer events to model items, firing up the callback
+        with the event kind and the item for each of them"""
+        self.syscalls = syscalls
+        self.event_callback = callback
+        self.clock = clock or SessionClock()
+        # The stat worker adds the files from its own thread
+        self.lock = threading.Lock()
+        self.stat_worker = StatWorker(callback=self.add_file)
+        self.resolver = PathResolver(syscalls=syscalls)
+        self.network = NetworkTracker(resolver=self.resolver)
+        # Bytes read and written for each process and file
+        self.io = {}
+        self.io_changed = set()
+        self.io_timestamp = 0
+
+    def emit(self, kind, item):
+        """Fire up the callback for a new item"""
+        with self.lock:
+            self.event_callback(kind, item)
+
+    def ignore_syscall(self, syscall):
+        """Determine if to ignore a syscall before it's processed"""
+        return syscall.name not in self.syscalls
+
+    def add_syscall(self, syscall):
+        """Add the syscall and its filename arguments"""
+        timestamp = self.clock.get_timestamp()
+        # The syscall will be rendered only when shown
+        arguments = read_syscall_arguments(syscall)
+        # Check if the syscall has any filename or pathname argument
+        filenames = []
+        descriptor = AT_FDCWD
+        for argument_name, _, value, argument_text in arguments[1]:
+            if argument_name in DIRFD_ARGUMENTS:
+                # The directory descriptor precedes its filename
+                descriptor = get_descriptor(value)
+            elif (argument_name in FILENAME_ARGUMENTS and
+                    argument_text is not None and
+                    argument_text != "''..."):
+                file_path = argument_text[1:-1]
+                if (file_path and
+                        UNCHECKED_FILES.get(syscall.name) != argument_name):
+                    file_path = self.resolver.resolve(syscall.process.pid,
+                                                      file_path,
+                                                      descriptor)
+                filenames.append((argument_name, file_path))
+                descriptor = AT_FDCWD
+        path = filenames[0][1] if filenames else None
+        # The syscalls entered before the tracing have no duration
+        enter_time = getattr(syscall, 'enter_time', None)
+        exit_time = getattr(syscall, 'exit_time', None)
+        self.emit(EVENT_SYSCALL, ActivityItem(
+            timestamp=timestamp,
+            syscall=syscall.name,
+            arguments=arguments,
+            pid=syscall.process.pid,
+            ip=syscall.instr_pointer or 0,
+            duration=(exit_time - enter_time
+                      if enter_time is not None and exit_time is not None
+                      else None),
+            result=syscall.result,
+            path=path or None))
+        # The closed socket is known only before updating the descriptors
+        closed_socket = (self.network.get_closed_socket(syscall)
+                         if syscall.name == 'close' else None)
+        self.resolver.update(syscall, path)
+        if closed_socket:
+            self.network.remove_socket(closed_socket)
+        if syscall.name in ADDRESS_SYSCALLS:
+            self.network.add_address(syscall)
+        if syscall.name in IO_SYSCALLS and syscall.result:
+            self.add_io(syscall)
+        if ((self.io_changed or self.network.changed) and
+                timestamp - self.io_timestamp >= IO_UPDATE_INTERVAL):
+            self.update_io()
+            self.io_timestamp = timestamp
+        for argument_name, file_path in filenames:
+            existing = self.get_existing(syscall,
+                                         argument_name,
+                                         len(filenames))
+            if existing is None:
+                existing = self.stat_worker.get_cached(syscall.process.pid,
+                                                       file_path)
+            if existing is None:
+                # Check the file later without stopping the tracee
+                self.stat_worker.check(syscall.process.pid,
+                                       file_path,
+                                       timestamp)
+            else:
+                self.add_file(syscall.process.pid,
+                              file_path,
+                              existing,
+                              timestamp)
+
+    def get_existing(self, syscall, argument_name, count):
+        """Infer the file existence from the syscall result, returning
+        None when it's unknown"""
+        if syscall.result is None:
+            return None
+        elif syscall.result >= 0:
+            if REMOVED_FILES.get(syscall.name) == argument_name:
+                return False
+            elif UNCHECKED_FILES.get(syscall.name) == argument_name:
+                return None
+            return True
+        elif count == 1:
+            # The error refers to the only filename argument
+            if -syscall.result in MISSING_ERRORS:
+                return False
+            elif -syscall.result in EXISTING_ERRORS:
+                return True
+        return None
+
+    def add_file(self, pid, file_path, existing, timestamp):
+        """Add a file used by a process"""
+        self.emit(EVENT_FILE, FileItem(
+            pid=str(pid),
+            file_path=file_path,
+            existing=existing,
+            timestamp=timestamp))
+
+    def add_io(self, syscall):
+        """Account the bytes transferred by a syscall"""
+        if syscall.result < 0:
+            return
+        pid = syscall.process.pid
+        for position, index in enumerate(IO_SYSCALLS[syscall.name]):
+            if index is None or index >= len(syscall.arguments):
+                continue
+            file_path = self.resolver.get_file_path(
+                pid, syscall.arguments[index].value)
+            if file_path is None:
+                continue
+            if file_path.startswith(SOCKET_PREFIX):
+                self.network.add_transfer(syscall, file_path, position)
+            key = (pid, file_path)
+            totals = self.io.get(key)
+            if totals is None:
+                totals = [0, 0]
+                self.io[key] = totals
+            totals[position] += syscall.result
+            self.io_changed.add(key)
+
+    def update_io(self):
+        """Add the updated I/O and network totals"""
+        for pid, file_path in self.io_changed:
+            read, written = self.io[(pid, file_path)]
+            self.emit(EVENT_IO, IOItem(pid=str(pid),
+                                       file_path=file_path,
+                                       read=read,
+                                       written=written))
+        self.io_changed.clear()
+        for (pid, peer, local), (calls, sent, received) in (
+                self.network.get_changed()):
+            self.emit(EVENT_NETWORK, NetworkItem(pid=str(pid),
+                                                 peer=peer,
+                                                 local=local,
+                                                 calls=calls,
+                                                 sent=sent,
+                                                 received=received))
+
+    def handle_process_event(self, event):
+        """Follow the processes to resolve their paths and to build the
+        processes tree"""
+        process = event.process
+        parent = str(process.parent.pid) if process.parent else None
+        if isinstance(event, (NewProcessEvent, StartEvent, AttachEvent)):
+            if process.parent:
+                self.resolver.add_process(process.pid,
+                                          process.parent.pid,
+                                          process.is_thread)
+            self.emit(EVENT_PROCESS_NODE, ProcessNodeItem(
+                pid=str(process.pid),
+                parent=parent,
+                timestamp=self.clock.get_timestamp()))
+        elif isinstance(event, ProcessExecution):
+            self.resolver.execute(process.pid)
+        elif isinstance(event, ProcessExit):
+            self.resolver.remove_process(process.pid)
+            self.update_io()
+            for key in [key for key in self.io if key[0] == process.pid]:
+                del self.io[key]
+            self.network.remove_process(process.pid)
+            if event.signum:
+                status = signalName(event.signum)
+            elif event.exitcode is not None:
+                status = str(event.exitcode)
+            else:
+                status = '?'
+            rusage = process.rusage
+            self.emit(EVENT_PROCESS_NODE, ProcessNodeItem(
+                pid=str(process.pid),
+                parent=parent,
+                timestamp=self.clock.get_timestamp(),
+                status=status,
+                cpu_time=round((rusage.ru_utime + rusage.ru_stime) *
+                               1000000000) if rusage else 0,
+                max_rss=rusage.ru_maxrss if rusage else 0,
+                switches=(rusage.ru_nvcsw +
+                          rusage.ru_nivcsw) if rusage else 0))
+
+    def add_process(self, pid, information, value, timestamp=None):
+        """Add a process information"""
+        logging.info(f'added new process: {information}')
+        self.emit(EVENT_PROCESS, ProcessItem(
+            pid=str(pid),
+            timestamp=(self.clock.get_timestamp()
+                       if timestamp is None else timestamp),
+            information=information,
+            value=str(value).strip()))
+
+    def close(self):
+        """Wait for the pending files checks and add the last I/O
+        totals"""
+        self.stat_worker.close()
+        self.update_io()
@@ -0,0 +1,114 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+
+import pickle
+import struct
+
+EVENT_SYSCALL = 'syscall'
+EVENT_FILE = 'file'
+EVENT_PROCESS = 'process'
+EVENT_IO = 'io'
+EVENT_PROCESS_NODE = 'process node'
+EVENT_COUNT = 'count'
+EVENT_NETWORK = 'network'
+# Block of activities read from a trace file
+EVENT_ACTIVITIES = 'activities'
+
+# Size of each record in the shared memory ring
+RECORD_SIZE = 512
+# Number of records in the shared memory ring
+RECORDS_COUNT = 16384
+# Each record starts with its payload length and the continuation flag
+RECORD_HEADER = struct.Struct('<HB')
+RECORD_PAYLOAD_SIZE = RECORD_SIZE - RECORD_HEADER.size
+
+
+class EventRing(object):
+    def __init__(self, context, records=RECORDS_COUNT):
+        """Share the events produced by the tracer process with the main
+        loop using a ring of fixed-size records in shared memory"""
+        self.records = records
+        self.buffer = context.RawArray('B', RECORD_SIZE * records)
+        # Count the free records and the records ready to be read
+        self.free = context.Semaphore(records)
+        self.used = context.Semaphore(0)
+        self.view = memoryview(self.buffer).cast('B')
+        # Each process keeps its own position in the ring
+        self.index = 0
+
+    def __getstate__(self):
+        """Share the ring with the tracer process"""
+        return self.records, self.buffer, self.free, self.used
+
+    def __setstate__(self, state):
+        """Attach to the ring inherited from the main process"""
+        self.records, self.buffer, self.free, self.used = state
+        self.view = memoryview(self.buffer).cast('B')
+        self.index = 0
+
+    def __len__(self):
+        """Return the number of pending records"""
+        return self.used.get_value()
+
+    def append(self, kind, item):
+        """Append a new event to the ring, waiting while the ring is full"""
+        data = pickle.dumps((kind, item), pickle.HIGHEST_PROTOCOL)
+        # Larger events continue in the following records
+        for start in range(0, len(data), RECORD_PAYLOAD_SIZE):
+            chunk = data[start:start + RECORD_PAYLOAD_SIZE]
+            self.free.acquire()
+            offset = self.index * RECORD_SIZE
+            RECORD_HEADER.pack_into(self.view,
+                                    offset,
+                                    len(chunk),
+                                    start + RECORD_PAYLOAD_SIZE < len(data))
+            offset += RECORD_HEADER.size
+            self.view[offset:offset + len(chunk)] = chunk
+            self.index = (self.index + 1) % self.records
+            self.used.release()
+
+    def read_event(self):
+        """Read the data of the next event, releasing its records"""
+        chunks = []
+        while True:
+            offset = self.index * RECORD_SIZE
+            length, more = RECORD_HEADER.unpack_from(self.view, offset)
+            offset += RECORD_HEADER.size
+            chunks.append(bytes(self.view[offset:offset + length]))
+            self.index = (self.index + 1) % self.records
+            self.free.release()
+            if not more:
+                return b''.join(chunks)
+            # The tracer process publishes the continuation records
+            # right after the first one
+            self.used.acquire()
+
+    def get_batch(self, size):
+        """Extract up to size events from the ring"""
+        results = []
+        while len(results) < size and self.used.acquire(False):
+            results.append(pickle.loads(self.read_event()))
+        return results
+
+    def clear(self):
+        """Remove every pending event"""
+        while self.used.acquire(False):
+            self.read_event()
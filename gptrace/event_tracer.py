@@ -18,6 +18,8 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 ##
 
+import concurrent.futures
+import functools
 import logging
 from grp import getgrgid
 from pwd import getpwuid
@@ -32,22 +34,68 @@ from ptrace.os_tools import RUNNING_LINUX
 if RUNNING_LINUX:
     from ptrace.linux_proc import readProcessCmdline, readProcessLink, openProc
 
+from gptrace.debugger import AttachEvent, StartEvent
 from gptrace.localize import _
+from gptrace.session_clock import SessionClock
 
-UID = 'uid'
-GID = 'gid'
-EUID = 'euid'
-EGID = 'egid'
+# Number of users and groups names to keep in memory
+NAMES_CACHE_SIZE = 1024
+# Number of threads resolving the users and groups names
+LOOKUP_WORKERS = 4
+
+
+@functools.lru_cache(maxsize=NAMES_CACHE_SIZE)
+def get_user(uid):
+    """Get the password database entry for a user ID"""
+    try:
+        return getpwuid(uid)
+    except KeyError:
+        return None
+
+
+@functools.lru_cache(maxsize=NAMES_CACHE_SIZE)
+def get_group(gid):
+    """Get the group database entry for a group ID"""
+    try:
+        return getgrgid(gid)
+    except KeyError:
+        return None
+
+
+def read_process_snapshot(pid):
+    """Read the command line, the working directory, the real and the
+    effective user and group IDs of a process"""
+    cmdline = readProcessCmdline(pid)
+    cwd = readProcessLink(pid, 'cwd')
+    uids = gids = (None, None)
+    with openProc(f'{pid}/status') as status_file:
+        for line in status_file:
+            if line.startswith('Uid:'):
+                uids = tuple(int(value) for value in line[5:].split()[:2])
+            elif line.startswith('Gid:'):
+                gids = tuple(int(value) for value in line[5:].split()[:2])
+                # The following lines are not needed
+                break
+    return cmdline, cwd, uids, gids
 
 
 class EventTracer(object):
-    def __init__(self, callback):
+    def __init__(self, callback, process_callback=None, clock=None):
         """Handle events requests by firing up the callback each time new
-        information must be shown"""
+        information must be shown and the process callback for every
+        event"""
         self.event_callback = callback
+        self.process_callback = process_callback
+        self.clock = clock or SessionClock()
+        # The users and groups names are resolved later
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=LOOKUP_WORKERS,
+            thread_name_prefix='lookup')
 
     def handle_event(self, event):
         """Handle external events like new process execution or child close"""
+        if self.process_callback:
+            self.process_callback(event)
         if isinstance(event, NewProcessEvent):
             # Under Linux the new process phase first fork a new process with
             # the same command line of the starting process then changes its
@@ -57,6 +105,10 @@ class EventTracer(object):
             status = None
         elif isinstance(event, ProcessExecution):
             status = _('Process execution')
+        elif isinstance(event, StartEvent):
+            status = _('Process started')
+        elif isinstance(event, AttachEvent):
+            status = _('Process attached')
         elif isinstance(event, ProcessExit):
             status = _('Process exit')
         elif isinstance(event, ProcessSignal):
@@ -69,53 +121,55 @@ class EventTracer(object):
 
         if status:
             pid = event.process.pid
-            if RUNNING_LINUX and isinstance(event, ProcessExecution):
+            timestamp = self.clock.get_timestamp()
+            if RUNNING_LINUX and isinstance(event, (ProcessExecution,
+                                                    StartEvent,
+                                                    AttachEvent)):
+                # Read the process details while it's still stopped
+                cmdline, cwd, uids, gids = read_process_snapshot(pid)
                 self.event_callback(pid, _('Command line'),
-                                    ' '.join(
-                                        readProcessCmdline(event.process.pid)))
+                                    ' '.join(cmdline),
+                                    timestamp=timestamp)
                 self.event_callback(pid, _('Current working directory'),
-                                    readProcessLink(event.process.pid, 'cwd'))
+                                    cwd,
+                                    timestamp=timestamp)
                 # If the process has a parent PID include it in the details
                 if event.process.parent:
                     self.event_callback(pid, _('Parent PID'),
-                                        str(event.process.parent.pid))
-                # Add process details
-                details = self._get_process_status_details(event.process.pid)
-                if UID in details:
-                    self.event_callback(pid, _('User ID'), details[UID].pw_uid)
-                    self.event_callback(pid, _('User name'),
-                                        details[UID].pw_name)
-                    self.event_callback(pid, _('User real name'),
-                                        details[UID].pw_gecos)
-                if EUID in details:
-                    self.event_callback(pid, _('Effective user ID'),
-                                        details[EUID].pw_uid)
-                    self.event_callback(pid, _('Effective user name'),
-                                        details[EUID].pw_name)
-                    self.event_callback(pid, _('Effective user real name'),
-                                        details[EUID].pw_gecos)
-                if GID in details:
-                    self.event_callback(pid, _('Group ID'),
-                                        details[GID].gr_gid)
-                    self.event_callback(pid, _('Group name'),
-                                        details[GID].gr_name)
-                if EGID in details:
-                    self.event_callback(pid, _('Effective group ID'),
-                                        details[EGID].gr_gid)
-                    self.event_callback(pid, _('Effective group name'),
-                                        details[EGID].gr_name)
-                self.event_callback(pid, information=_('Status'), value=status)
-
-    def _get_process_status_details(self, pid):
-        """Get details from process status"""
-        dict_result = {}
-        status_file = openProc('%s/status' % pid)
-        for line in status_file:
-            if line.startswith('Uid:'):
-                dict_result[UID] = getpwuid(int(line[5:].split('\t')[0]))
-                dict_result[EUID] = getpwuid(int(line[5:].split('\t')[1]))
-            elif line.startswith('Gid:'):
-                dict_result[GID] = getgrgid(int(line[5:].split('\t')[0]))
-                dict_result[EGID] = getgrgid(int(line[5:].split('\t')[1]))
-        status_file.close()
-        return dict_result
+                                        str(event.process.parent.pid),
+                                        timestamp=timestamp)
+                self.executor.submit(self.add_users_details,
+                                     pid, timestamp, uids, gids)
+                self.event_callback(pid, information=_('Status'),
+                                    value=status,
+                                    timestamp=timestamp)
+
+    def add_users_details(self, pid, timestamp, uids, gids):
+        """Add the user and group details of a process"""
+        user, effective_user = (get_user(uid) if uid is not None else None
+                                for uid in uids)
+        group, effective_group = (get_group(gid) if gid is not None else None
+                                  for gid in gids)
+        details = []
+        if user:
+            details.extend(((_('User ID'), user.pw_uid),
+                            (_('User name'), user.pw_name),
+                            (_('User real name'), user.pw_gecos)))
+        if effective_user:
+            details.extend((
+                (_('Effective user ID'), effective_user.pw_uid),
+                (_('Effective user name'), effective_user.pw_name),
+                (_('Effective user real name'), effective_user.pw_gecos)))
+        if group:
+            details.extend(((_('Group ID'), group.gr_gid),
+                            (_('Group name'), group.gr_name)))
+        if effective_group:
+            details.extend((
+                (_('Effective group ID'), effective_group.gr_gid),
+                (_('Effective group name'), effective_group.gr_name)))
+        for information, value in details:
+            self.event_callback(pid, information, value, timestamp=timestamp)
+
+    def close(self):
+        """Wait for the pending lookups"""
+        self.executor.shutdown(wait=True)
@@ -85,3 +85,24 @@ def show_dialog_fileopen(parent, title):
         result = None
     dialog.destroy()
     return result
+
+
+def show_dialog_filesave(parent, title):
+    """Show a FileChooserDialog with save and cancel buttons"""
+    dialog = Gtk.FileChooserDialog(
+        parent=parent,
+        flags=Gtk.DialogFlags.MODAL,
+        type=Gtk.WindowType.TOPLEVEL,
+        action=Gtk.FileChooserAction.SAVE,
+        buttons=(Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL,
+                 Gtk.STOCK_SAVE, Gtk.ResponseType.OK)
+    )
+    dialog.set_do_overwrite_confirmation(True)
+    if title:
+        dialog.set_title(title)
+    if dialog.run() == Gtk.ResponseType.OK:
+        result = dialog.get_filename()
+    else:
+        result = None
+    dialog.destroy()
+    return result
@@ -0,0 +1,222 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import collections
+import logging
+import optparse
+import signal
+import sys
+
+from ptrace.ctypes_tools import formatAddress
+from ptrace.syscall import SYSCALL_NAMES
+
+from gptrace.event_collector import EventCollector
+from gptrace.event_queue import (EVENT_COUNT,
+                                 EVENT_FILE,
+                                 EVENT_IO,
+                                 EVENT_NETWORK,
+                                 EVENT_PROCESS,
+                                 EVENT_PROCESS_NODE,
+                                 EVENT_SYSCALL)
+from gptrace.event_tracer import EventTracer
+from gptrace.latency_histogram import LatencyHistogram
+from gptrace.session_clock import format_timestamp
+from gptrace.syscall_counter import SyscallCounter
+from gptrace.syscall_tracer import SyscallTracer
+from gptrace.trace_file import TraceWriter
+
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+# Escape the text values to keep a line for each event and a column for
+# each value
+ESCAPE_TABLE = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n'})
+
+
+class HeadlessTracer(object):
+    def __init__(self, options):
+        """Trace a program without any user interface, writing the events
+        to the standard output or to a file"""
+        self.options = options
+        self.output = None
+        self.recorder = None
+        self.counts = collections.Counter()
+        self.histograms = collections.defaultdict(LatencyHistogram)
+        self.files = collections.defaultdict(set)
+        if options.syscalls:
+            self.syscalls = set(options.syscalls.split(','))
+        else:
+            self.syscalls = set(SYSCALL_NAMES.values())
+        self.events_handlers = {
+            EVENT_SYSCALL: self.write_syscall,
+            EVENT_COUNT: self.write_count,
+            EVENT_FILE: self.write_file,
+            EVENT_PROCESS: self.write_process,
+            EVENT_IO: self.write_io,
+            EVENT_PROCESS_NODE: self.write_process_node,
+            EVENT_NETWORK: self.write_network,
+        }
+
+    def run(self):
+        """Trace the program until its exit"""
+        if self.options.output == '-':
+            self.output = open(sys.stdout.fileno(),
+                               mode='w',
+                               buffering=OUTPUT_BUFFER_SIZE,
+                               closefd=False)
+        else:
+            self.output = open(self.options.output,
+                               mode='w',
+                               buffering=OUTPUT_BUFFER_SIZE)
+        collector = EventCollector(syscalls=self.syscalls,
+                                   callback=self.handle_event)
+        if self.options.record:
+            self.recorder = TraceWriter(filename=self.options.record,
+                                        start_time=collector.clock.start_time)
+        event_tracer = EventTracer(
+            callback=collector.add_process,
+            process_callback=collector.handle_process_event,
+            clock=collector.clock)
+        debugger = SyscallTracer(
+            options=optparse.Values({
+                'fork': True,
+                'enter': False,
+                'show_ip': True,
+                'trace_exec': True,
+                'trace_clone': True,
+                'no_stdout': self.options.output == '-',
+                'pid': self.options.pid,
+                'process_names': self.options.name,
+                'threads': self.options.threads,
+                'show_pid': True,
+                'seccomp': self.options.seccomp,
+                'syscalls': self.syscalls,
+                'counts_only': self.options.counts_only,
+                'decoding': dict(self.options.decoding),
+            }),
+            program=self.options.program,
+            ignore_syscall_callback=collector.ignore_syscall,
+            syscall_callback=collector.add_syscall,
+            event_callback=event_tracer.handle_event,
+            quit_callback=self.write_counts,
+            counter=(SyscallCounter(syscalls=self.syscalls,
+                                    callback=collector.emit)
+                     if self.options.counts_only else None))
+        # Stop the tracing detaching the attached processes
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda signum, frame: self.stop(debugger))
+        debugger.main()
+        event_tracer.close()
+        collector.close()
+        self.output.close()
+        if self.recorder:
+            self.recorder.close()
+
+    def stop(self, debugger):
+        """Interrupt the tracing"""
+        logging.info('tracing interrupted')
+        debugger.stop()
+
+    def handle_event(self, kind, item):
+        """Write a traced event to the output"""
+        self.events_handlers[kind](item)
+        if self.recorder:
+            self.recorder.write(kind, item)
+
+    def write_syscall(self, item):
+        """Write a syscall activity"""
+        self.counts[item.syscall] += 1
+        if item.duration is None:
+            duration = ''
+        else:
+            self.histograms[item.syscall].add(item.duration)
+            duration = format_timestamp(item.duration)
+        result = '' if item.result is None else item.result
+        self.output.write(f'syscall\t{format_timestamp(item.timestamp)}\t'
+                          f'{item.pid}\t'
+                          f'{item.syscall}\t{escape(item.format)}\t'
+                          f'{formatAddress(item.ip)}\t{duration}\t'
+                          f'{result}\n')
+
+    def write_count(self, item):
+        """Store the count of a syscall counted without decoding it"""
+        self.counts[item.syscall] = item.count
+        if item.histogram is not None:
+            self.histograms[item.syscall] = item.histogram
+
+    def write_file(self, item):
+        """Write a file path the first time it's used by a process"""
+        if item.file_path and item.file_path not in self.files[item.pid]:
+            self.files[item.pid].add(item.file_path)
+            self.output.write(f'file\t{item.pid}\t{int(item.existing)}\t'
+                              f'{escape(item.file_path)}\n')
+
+    def write_process(self, item):
+        """Write a process information"""
+        self.output.write(f'process\t{format_timestamp(item.timestamp)}\t'
+                          f'{item.pid}\t'
+                          f'{escape(item.information)}\t'
+                          f'{escape(item.value)}\n')
+
+    def write_io(self, item):
+        """Write the bytes read and written by a process on a file"""
+        self.output.write(f'io\t{item.pid}\t{item.read}\t{item.written}\t'
+                          f'{escape(item.file_path)}\n')
+
+    def write_network(self, item):
+        """Write the calls and the bytes exchanged by a process with a
+        peer"""
+        self.output.write(f'network\t{item.pid}\t{item.calls}\t'
+                          f'{item.sent}\t{item.received}\t'
+                          f'{escape(item.peer)}\t'
+                          f'{escape(item.local or "")}\n')
+
+    def write_process_node(self, item):
+        """Write the start or the exit of a process"""
+        if item.status is None:
+            self.output.write(f'start\t{format_timestamp(item.timestamp)}\t'
+                              f'{item.pid}\t{item.parent or ""}\n')
+        else:
+            self.output.write(f'exit\t{format_timestamp(item.timestamp)}\t'
+                              f'{item.pid}\t{item.status}\t'
+                              f'{format_timestamp(item.cpu_time)}\t'
+                              f'{item.max_rss}\t{item.switches}\n')
+
+    def write_counts(self):
+        """Write the count and the durations of the called syscalls"""
+        for syscall, count in sorted(self.counts.items()):
+            histogram = self.histograms.get(syscall)
+            if histogram is None or not histogram.count:
+                # The syscalls never completed have no durations
+                durations = '\t'.join('-' * 6)
+            else:
+                durations = '\t'.join(
+                    format_timestamp(duration) for duration in (
+                        histogram.total,
+                        histogram.get_mean(),
+                        histogram.maximum,
+                        *histogram.get_percentiles(0.5, 0.99, 0.999)))
+            self.output.write(f'count\t{syscall}\t{count}\t{durations}\n')
+        # Avoid to write the counts twice on quit
+        self.counts.clear()
+        self.histograms.clear()
+
+
+def escape(value):
+    """Escape the backslashes, tabs and newlines of a text value"""
+    return str(value).translate(ESCAPE_TABLE)
@@ -0,0 +1,102 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import array
+
+# Each power of two is split in 2 ** HISTOGRAM_SUB_BITS linear buckets,
+# giving a relative error below 1 / 2 ** HISTOGRAM_SUB_BITS
+HISTOGRAM_SUB_BITS = 4
+HISTOGRAM_SUB_BUCKETS = 1 << HISTOGRAM_SUB_BITS
+
+
+def get_bucket(value):
+    """Get the bucket index of a value"""
+    if value < HISTOGRAM_SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - HISTOGRAM_SUB_BITS - 1
+    return (((shift + 1) << HISTOGRAM_SUB_BITS) +
+            (value >> shift) - HISTOGRAM_SUB_BUCKETS)
+
+
+def get_bucket_value(index):
+    """Get the middle value of a bucket"""
+    if index < HISTOGRAM_SUB_BUCKETS * 2:
+        return index
+    shift = (index >> HISTOGRAM_SUB_BITS) - 1
+    mantissa = (index & (HISTOGRAM_SUB_BUCKETS - 1)) + HISTOGRAM_SUB_BUCKETS
+    return (mantissa << shift) + (1 << shift >> 1)
+
+
+class LatencyHistogram(object):
+    def __init__(self):
+        """Log-linear histogram of the durations in nanoseconds, whose
+        size grows only with the largest value"""
+        self.count = 0
+        self.total = 0
+        self.maximum = 0
+        self.buckets = array.array('Q')
+
+    def add(self, value):
+        """Add a duration"""
+        index = get_bucket(value)
+        if index >= len(self.buckets):
+            self.buckets.extend([0] * (index + 1 - len(self.buckets)))
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.maximum:
+            self.maximum = value
+
+    def merge(self, histogram):
+        """Add the durations of another histogram"""
+        if len(histogram.buckets) > len(self.buckets):
+            self.buckets.extend(
+                [0] * (len(histogram.buckets) - len(self.buckets)))
+        for index, count in enumerate(histogram.buckets):
+            if count:
+                self.buckets[index] += count
+        self.count += histogram.count
+        self.total += histogram.total
+        self.maximum = max(self.maximum, histogram.maximum)
+
+    def get_mean(self):
+        """Get the mean duration"""
+        return self.total // self.count if self.count else 0
+
+    def get_percentiles(self, *percentiles):
+        """Get the durations of the requested ascending percentiles in a
+        single pass over the buckets"""
+        results = []
+        targets = iter(percentiles)
+        target = next(targets, None)
+        cumulative = 0
+        maximum_bucket = get_bucket(self.maximum)
+        for index, count in enumerate(self.buckets):
+            cumulative += count
+            while target is not None and cumulative >= target * self.count:
+                # The bucket of the maximum duration reports the maximum
+                # itself and no other bucket value can exceed it
+                results.append(self.maximum
+                               if index == maximum_bucket
+                               else min(get_bucket_value(index),
+                                        self.maximum))
+                target = next(targets, None)
+        results.extend([0] * (len(percentiles) - len(results)))
+        return results
@@ -20,8 +20,6 @@
 
 import logging
 
-import gptrace.requires                                            # noqa: F401
-from gptrace.app import Application
 from gptrace.command_line_options import CommandLineOptions
 from gptrace.constants import (DIR_DATA,
                                DIR_DOCS,
@@ -55,6 +53,13 @@ def main():
     logging.debug(f'DIR_DATA={str(DIR_DATA)}')
     logging.debug(f'DIR_UI={str(DIR_UI)}')
     logging.debug(f'DIR_SETTINGS={str(DIR_SETTINGS)}')
-    # Start the application
-    app = Application(options=options)
-    app.run(None)
+    if options.headless:
+        # Trace without loading any GTK+ module
+        from gptrace.headless import HeadlessTracer
+        HeadlessTracer(options=options).run()
+    else:
+        # Start the application
+        import gptrace.requires                                    # noqa: F401
+        from gptrace.app import Application
+        app = Application(options=options)
+        app.run(None)
@@ -81,9 +81,10 @@ class ModelAbstract(object):
 
     def dump(self):
         """Extract the model data to a dict object"""
-        pass
+        return {key: tuple(self.model[treeiter])
+                for key, treeiter in self.rows.items()}
 
     def load(self, items):
         """Load the model data from a dict object"""
-        for key in sorted(items.iterkeys()):
+        for key in sorted(items.keys()):
             self.add_data(items[key])
@@ -18,30 +18,47 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 ##
 
+from ptrace.ctypes_tools import formatAddress
+
+from gptrace.syscall_format import format_result, format_syscall
+
 from .abstract import ModelAbstract
+from .activities_store import ActivitiesStore
 
 
 class ModelActivities(ModelAbstract):
-    COL_TIMESTAMP = 0
-    COL_TIME = 1
-    COL_SYSCALL = 2
-    COL_FORMAT = 3
-    COL_PID = 3
-    COL_IP = 4
+    COL_TIMESTAMP = ActivitiesStore.COL_TIMESTAMP
+    COL_SYSCALL = ActivitiesStore.COL_SYSCALL
+    COL_FORMAT = ActivitiesStore.COL_FORMAT
+    COL_PID = ActivitiesStore.COL_PID
+    COL_IP = ActivitiesStore.COL_IP
+    COL_RESULT = ActivitiesStore.COL_RESULT
 
     def add_data(self, item):
-        """Add a new row to the model if it doesn't exist"""
+        """Add a new row to the model"""
         super(self.__class__, self).add_data(item)
-        new_row = self.model.append((
-            item.timestamp,
-            item.time,
-            item.syscall,
-            item.format,
-            item.pid,
-            item.ip
-        ))
-        self.rows[len(self.rows)] = new_row
+        # The rows are never looked up by key
+        self.model.append(timestamp=item.timestamp,
+                          syscall=item.syscall,
+                          arguments=item.arguments,
+                          pid=item.pid,
+                          ip=item.ip,
+                          result=item.result,
+                          path=item.path)
 
     def get_syscall(self, treeiter):
         """Get the syscall of a row"""
-        return self.model[treeiter][self.COL_SYSCALL]
+        return self.model.get_syscall(self.model.get_index(treeiter))
+
+    def get_format(self, model, treeiter):
+        """Render the syscall with its arguments for a row of a model"""
+        return format_syscall(model[treeiter][self.COL_SYSCALL],
+                              model[treeiter][self.COL_FORMAT])
+
+    def get_ip(self, model, treeiter):
+        """Render the instruction pointer for a row of a model"""
+        return formatAddress(model[treeiter][self.COL_IP])
+
+    def get_result(self, model, treeiter):
+        """Render the syscall result for a row of a model"""
+        return format_result(model[treeiter][self.COL_RESULT])
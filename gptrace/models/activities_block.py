@@ -0,0 +1,123 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import array
+import collections
+import marshal
+
+from gptrace.latency_histogram import LatencyHistogram
+
+from .activity_item import ActivityItem
+from .errors import MAX_ERRNO
+
+# Result of the syscalls which never returned
+NO_RESULT = -1 << 63
+# Duration of the syscalls entered before the tracing
+NO_DURATION = -1
+
+
+class ActivitiesBlock(object):
+    def __init__(self, strings):
+        """Consecutive activities stored by column, with the syscalls and
+        the paths referring to a strings table, zero being for no path"""
+        self.strings = strings
+        self.timestamps = array.array('q')
+        self.pids = array.array('i')
+        self.ips = array.array('Q')
+        self.durations = array.array('q')
+        self.results = array.array('q')
+        self.syscalls = array.array('I')
+        self.paths = array.array('I')
+        # The serialized arguments are stored in a single buffer
+        self.offsets = array.array('I')
+        self.arguments = bytearray()
+        # Durations of the activities for each syscall identifier
+        self.histograms = {}
+
+    def __len__(self):
+        """Return the number of activities"""
+        return len(self.timestamps)
+
+    def __iter__(self):
+        """Iterate the activities as ActivityItem objects"""
+        return map(self.get_item, range(len(self)))
+
+    def append(self, item, syscall, path):
+        """Append an activity with its syscall and path identifiers"""
+        self.timestamps.append(item.timestamp)
+        self.pids.append(item.pid)
+        self.ips.append(item.ip)
+        self.results.append(NO_RESULT if item.result is None
+                            else item.result)
+        self.syscalls.append(syscall)
+        self.paths.append(path)
+        self.offsets.append(len(self.arguments))
+        self.arguments += marshal.dumps(item.arguments)
+        if item.duration is None:
+            self.durations.append(NO_DURATION)
+        else:
+            self.durations.append(item.duration)
+            histogram = self.histograms.get(syscall)
+            if histogram is None:
+                histogram = LatencyHistogram()
+                self.histograms[syscall] = histogram
+            histogram.add(item.duration)
+
+    def get_arguments(self, index):
+        """Get the raw syscall arguments of an activity"""
+        end = (self.offsets[index + 1] if index + 1 < len(self.offsets)
+               else len(self.arguments))
+        return marshal.loads(self.arguments[self.offsets[index]:end])
+
+    def get_item(self, index, with_arguments=True):
+        """Get an activity as an ActivityItem"""
+        result = self.results[index]
+        duration = self.durations[index]
+        path = self.paths[index]
+        return ActivityItem(
+            timestamp=self.timestamps[index],
+            syscall=self.strings[self.syscalls[index]],
+            arguments=self.get_arguments(index) if with_arguments else None,
+            pid=self.pids[index],
+            ip=self.ips[index],
+            duration=None if duration == NO_DURATION else duration,
+            result=None if result == NO_RESULT else result,
+            path=self.strings[path - 1] if path else None)
+
+    def get_counts(self):
+        """Get the count and the durations of each syscall"""
+        return [(self.strings[syscall], count, self.histograms.get(syscall))
+                for syscall, count
+                in collections.Counter(self.syscalls).items()]
+
+    def get_errors(self):
+        """Get the failed activities, without their arguments"""
+        return [self.get_item(index, with_arguments=False)
+                for index, result in enumerate(self.results)
+                if -MAX_ERRNO <= result < 0]
+
+    def clear(self):
+        """Remove every activity"""
+        for values in (self.timestamps, self.pids, self.ips, self.durations,
+                       self.results, self.syscalls, self.paths,
+                       self.offsets):
+            del values[:]
+        self.arguments.clear()
+        self.histograms.clear()
@@ -0,0 +1,423 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+
+import array
+import itertools
+import marshal
+import os
+import struct
+import tempfile
+
+from gi.repository import GObject
+from gi.repository import Gtk
+
+from .activities_block import NO_RESULT
+from .posting_lists import PostingLists
+
+# Rows spilled to the segment file with their arguments offset and size
+SEGMENT_ROW = struct.Struct('<qHiQqIQI')
+# Minimum number of rows and bytes to spill at once
+SPILL_ROWS = 4096
+SPILL_SIZE = 1024 * 1024
+
+
+class ActivitiesStore(GObject.GObject, Gtk.TreeModel):
+    COL_TIMESTAMP = 0
+    COL_SYSCALL = 1
+    COL_FORMAT = 2
+    COL_PID = 3
+    COL_IP = 4
+    COL_RESULT = 5
+    COLUMN_TYPES = (GObject.TYPE_INT64,
+                    GObject.TYPE_STRING,
+                    GObject.TYPE_PYOBJECT,
+                    GObject.TYPE_INT,
+                    GObject.TYPE_UINT64,
+                    GObject.TYPE_PYOBJECT)
+
+    def __init__(self):
+        """List model storing the activities in typed arrays by column"""
+        GObject.GObject.__init__(self)
+        self.stamp = id(self) & 0x7fffffff
+        self.timestamps = array.array('q')
+        self.pids = array.array('i')
+        self.ips = array.array('Q')
+        self.results = array.array('q')
+        # The syscall names are stored by their interned identifier
+        self.syscalls = array.array('H')
+        self.syscalls_names = []
+        self.syscalls_ids = {}
+        # Rows indexes for each syscall identifier and for each PID,
+        # spilled with the rows
+        self.syscalls_rows = PostingLists()
+        self.pids_rows = PostingLists()
+        # The paths are interned the same way, zero is for no path
+        self.paths = array.array('I')
+        self.paths_names = [None]
+        self.paths_ids = {None: 0}
+        # The serialized arguments are stored in a single buffer
+        self.arguments = bytearray()
+        self.arguments_offsets = array.array('Q')
+        # The oldest rows are spilled to the segment files
+        self.retention_rows = 0
+        self.retention_size = 0
+        self.spilled = 0
+        self.spilled_size = 0
+        self.segment_rows = None
+        self.segment_arguments = None
+        self.cached_index = None
+        self.cached_row = None
+
+    def __len__(self):
+        """Return the number of rows"""
+        return self.spilled + len(self.timestamps)
+
+    def set_retention(self, rows, size):
+        """Set the maximum number of rows and bytes to keep in memory,
+        zero for no limit, the interned names are always kept"""
+        self.retention_rows = rows
+        self.retention_size = size
+        self.check_retention()
+
+    def get_memory_size(self):
+        """Get the size of the rows kept in memory"""
+        return (len(self.timestamps) * SEGMENT_ROW.size +
+                len(self.arguments))
+
+    def get_syscall_id_for_name(self, syscall):
+        """Get the identifier of a syscall name, interning it"""
+        syscall_id = self.syscalls_ids.get(syscall)
+        if syscall_id is None:
+            syscall_id = len(self.syscalls_names)
+            self.syscalls_ids[syscall] = syscall_id
+            self.syscalls_names.append(syscall)
+        return syscall_id
+
+    def get_path_id_for_name(self, path):
+        """Get the identifier of a path, interning it"""
+        path_id = self.paths_ids.get(path)
+        if path_id is None:
+            path_id = len(self.paths_names)
+            self.paths_ids[path] = path_id
+            self.paths_names.append(path)
+        return path_id
+
+    def append(self, timestamp, syscall, arguments, pid, ip, result=None,
+               path=None):
+        """Append a new row"""
+        syscall_id = self.get_syscall_id_for_name(syscall)
+        path_id = self.get_path_id_for_name(path)
+        self.timestamps.append(timestamp)
+        self.syscalls.append(syscall_id)
+        self.pids.append(pid)
+        self.ips.append(ip)
+        self.results.append(NO_RESULT if result is None else result)
+        self.paths.append(path_id)
+        # The offsets continue from the spilled arguments
+        self.arguments_offsets.append(self.spilled_size + len(self.arguments))
+        self.arguments += marshal.dumps(arguments)
+        index = len(self) - 1
+        self.syscalls_rows.append(syscall_id, index)
+        self.pids_rows.append(pid, index)
+        self.row_inserted(Gtk.TreePath((index, )), self.create_iter(index))
+        self.check_retention()
+
+    def extend(self, activities):
+        """Append a block of activities without notifying the views, which
+        must be attached to the model after the load"""
+        start = len(self)
+        # Convert the strings identifiers of the block to the model ones
+        strings = activities.strings
+        syscalls = {syscall: self.get_syscall_id_for_name(strings[syscall])
+                    for syscall in set(activities.syscalls)}
+        paths = {path: self.get_path_id_for_name(
+                     strings[path - 1] if path else None)
+                 for path in set(activities.paths)}
+        self.syscalls.extend(map(syscalls.__getitem__, activities.syscalls))
+        self.paths.extend(map(paths.__getitem__, activities.paths))
+        self.timestamps.extend(activities.timestamps)
+        self.pids.extend(activities.pids)
+        self.ips.extend(activities.ips)
+        self.results.extend(activities.results)
+        # The offsets continue from the spilled arguments
+        offset = self.spilled_size + len(self.arguments)
+        self.arguments_offsets.extend(
+            [offset + value for value in activities.offsets])
+        self.arguments += activities.arguments
+        # Add the rows to the indexes by syscall and by PID
+        syscalls_appends = {
+            syscall_id: self.syscalls_rows.get_appender(syscall_id)
+            for syscall_id in syscalls.values()}
+        for index, syscall_id in zip(itertools.count(start),
+                                     self.syscalls[start - self.spilled:]):
+            syscalls_appends[syscall_id](index)
+        pids_appends = {pid: self.pids_rows.get_appender(pid)
+                        for pid in set(activities.pids)}
+        for index, pid in zip(itertools.count(start), activities.pids):
+            pids_appends[pid](index)
+        self.check_retention()
+
+    def check_retention(self):
+        """Spill the oldest rows exceeding the retention limits"""
+        rows = len(self.timestamps)
+        count = 0
+        if self.retention_rows and rows - self.retention_rows >= SPILL_ROWS:
+            count = rows - self.retention_rows
+        if self.retention_size:
+            size = self.get_memory_size()
+            if size - self.retention_size >= SPILL_SIZE:
+                # Estimate the rows to spill from their average size
+                count = max(count,
+                            (size - self.retention_size) * rows // size + 1)
+        if count:
+            self.spill(min(count, rows))
+
+    def spill(self, count):
+        """Move the oldest rows from memory to the segment files"""
+        if not self.segment_rows:
+            self.segment_rows = tempfile.TemporaryFile(prefix='gptrace-')
+            self.segment_arguments = tempfile.TemporaryFile(prefix='gptrace-')
+        if count < len(self.arguments_offsets):
+            size = self.arguments_offsets[count] - self.spilled_size
+        else:
+            size = len(self.arguments)
+        records = bytearray()
+        for index in range(count):
+            if index + 1 < len(self.arguments_offsets):
+                end = self.arguments_offsets[index + 1]
+            else:
+                end = self.spilled_size + len(self.arguments)
+            records += SEGMENT_ROW.pack(self.timestamps[index],
+                                        self.syscalls[index],
+                                        self.pids[index],
+                                        self.ips[index],
+                                        self.results[index],
+                                        self.paths[index],
+                                        self.arguments_offsets[index],
+                                        end - self.arguments_offsets[index])
+        self.segment_rows.write(records)
+        self.segment_rows.flush()
+        self.segment_arguments.write(self.arguments[:size])
+        self.segment_arguments.flush()
+        del self.timestamps[:count]
+        del self.syscalls[:count]
+        del self.pids[:count]
+        del self.ips[:count]
+        del self.results[:count]
+        del self.paths[:count]
+        del self.arguments_offsets[:count]
+        del self.arguments[:size]
+        self.spilled += count
+        self.spilled_size += size
+        self.syscalls_rows.spill()
+        self.pids_rows.spill()
+
+    def clear(self):
+        """Remove every row"""
+        for index in range(len(self) - 1, -1, -1):
+            self.row_deleted(Gtk.TreePath((index, )))
+        del self.timestamps[:]
+        del self.syscalls[:]
+        del self.pids[:]
+        del self.ips[:]
+        del self.results[:]
+        del self.paths[:]
+        del self.arguments_offsets[:]
+        self.arguments.clear()
+        self.syscalls_rows.clear()
+        self.pids_rows.clear()
+        if self.segment_rows:
+            # Closing the temporary files deletes them
+            self.segment_rows.close()
+            self.segment_arguments.close()
+            self.segment_rows = None
+            self.segment_arguments = None
+        self.spilled = 0
+        self.spilled_size = 0
+        self.cached_index = None
+
+    def create_iter(self, index):
+        """Create a TreeIter for a row index"""
+        treeiter = Gtk.TreeIter()
+        treeiter.stamp = self.stamp
+        # Zero would be a NULL pointer
+        treeiter.user_data = index + 1
+        return treeiter
+
+    def refresh_rows(self, indexes):
+        """Notify the changes of some rows to check them again"""
+        for index in indexes:
+            self.row_changed(Gtk.TreePath((index, )),
+                             self.create_iter(index))
+
+    def get_index(self, treeiter):
+        """Get the row index of a TreeIter"""
+        return treeiter.user_data - 1
+
+    def read_spilled(self, index):
+        """Read a row from the segment files"""
+        if index != self.cached_index:
+            self.cached_row = SEGMENT_ROW.unpack(
+                os.pread(self.segment_rows.fileno(),
+                         SEGMENT_ROW.size,
+                         index * SEGMENT_ROW.size))
+            self.cached_index = index
+        return self.cached_row
+
+    def get_timestamp(self, index):
+        """Get the timestamp of a row"""
+        if index < self.spilled:
+            return self.read_spilled(index)[0]
+        return self.timestamps[index - self.spilled]
+
+    def get_syscall_id(self, index):
+        """Get the syscall identifier of a row"""
+        if index < self.spilled:
+            return self.read_spilled(index)[1]
+        return self.syscalls[index - self.spilled]
+
+    def get_syscall(self, index):
+        """Get the syscall name of a row"""
+        return self.syscalls_names[self.get_syscall_id(index)]
+
+    def get_pid(self, index):
+        """Get the PID of a row"""
+        if index < self.spilled:
+            return self.read_spilled(index)[2]
+        return self.pids[index - self.spilled]
+
+    def get_ip(self, index):
+        """Get the instruction pointer of a row"""
+        if index < self.spilled:
+            return self.read_spilled(index)[3]
+        return self.ips[index - self.spilled]
+
+    def get_result(self, index):
+        """Get the syscall result of a row, None if it never returned"""
+        if index < self.spilled:
+            result = self.read_spilled(index)[4]
+        else:
+            result = self.results[index - self.spilled]
+        return None if result == NO_RESULT else result
+
+    def get_path_id(self, index):
+        """Get the path identifier of a row"""
+        if index < self.spilled:
+            return self.read_spilled(index)[5]
+        return self.paths[index - self.spilled]
+
+    def get_path(self, index):
+        """Get the first path used by the syscall of a row"""
+        return self.paths_names[self.get_path_id(index)]
+
+    def get_arguments(self, index):
+        """Get the raw syscall arguments of a row"""
+        if index < self.spilled:
+            offset, size = self.read_spilled(index)[6:]
+            return marshal.loads(os.pread(self.segment_arguments.fileno(),
+                                          size,
+                                          offset))
+        index -= self.spilled
+        start = self.arguments_offsets[index] - self.spilled_size
+        if index + 1 < len(self.arguments_offsets):
+            end = self.arguments_offsets[index + 1] - self.spilled_size
+        else:
+            end = len(self.arguments)
+        return marshal.loads(self.arguments[start:end])
+
+    def do_get_flags(self):
+        """The rows are a flat list and their iters are always valid"""
+        return Gtk.TreeModelFlags.LIST_ONLY | Gtk.TreeModelFlags.ITERS_PERSIST
+
+    def do_get_n_columns(self):
+        """Return the number of columns"""
+        return len(self.COLUMN_TYPES)
+
+    def do_get_column_type(self, column):
+        """Return the type of a column"""
+        return self.COLUMN_TYPES[column]
+
+    def do_get_iter(self, path):
+        """Get the TreeIter for a TreePath"""
+        index = path.get_indices()[0]
+        if index < len(self):
+            return True, self.create_iter(index)
+        return False, None
+
+    def do_get_path(self, treeiter):
+        """Get the TreePath for a TreeIter"""
+        return Gtk.TreePath((self.get_index(treeiter), ))
+
+    def do_get_value(self, treeiter, column):
+        """Get the value of a row column, only for the requested rows"""
+        index = self.get_index(treeiter)
+        if column == self.COL_TIMESTAMP:
+            return self.get_timestamp(index)
+        elif column == self.COL_SYSCALL:
+            return self.get_syscall(index)
+        elif column == self.COL_FORMAT:
+            return self.get_arguments(index)
+        elif column == self.COL_PID:
+            return self.get_pid(index)
+        elif column == self.COL_IP:
+            return self.get_ip(index)
+        elif column == self.COL_RESULT:
+            return self.get_result(index)
+
+    def do_iter_next(self, treeiter):
+        """Move the TreeIter to the next row"""
+        index = self.get_index(treeiter) + 1
+        if index < len(self):
+            treeiter.user_data = index + 1
+            return True, treeiter
+        return False, None
+
+    def do_iter_previous(self, treeiter):
+        """Move the TreeIter to the previous row"""
+        index = self.get_index(treeiter) - 1
+        if index >= 0:
+            treeiter.user_data = index + 1
+            return True, treeiter
+        return False, None
+
+    def do_iter_has_child(self, treeiter):
+        """The rows have no children"""
+        return False
+
+    def do_iter_children(self, parent):
+        """Get the first row for the root"""
+        if parent is None and len(self):
+            return True, self.create_iter(0)
+        return False, None
+
+    def do_iter_n_children(self, treeiter):
+        """Get the number of rows for the root"""
+        return len(self) if treeiter is None else 0
+
+    def do_iter_nth_child(self, parent, index):
+        """Get a row for the root"""
+        if parent is None and index < len(self):
+            return True, self.create_iter(index)
+        return False, None
+
+    def do_iter_parent(self, child):
+        """The rows have no parent"""
+        return False, None
@@ -18,11 +18,22 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 ##
 
+from gptrace.syscall_format import format_syscall
+
+
 class ActivityItem(object):
-    def __init__(self, timestamp, time, syscall, format, pid, ip):
+    def __init__(self, timestamp, syscall, arguments, pid, ip, duration=None,
+                 result=None, path=None):
         self.timestamp = timestamp
-        self.time = time
         self.syscall = syscall
-        self.format = format
+        self.arguments = arguments
         self.pid = pid
         self.ip = ip
+        self.duration = duration
+        self.result = result
+        self.path = path
+
+    @property
+    def format(self):
+        """Render the syscall with its arguments"""
+        return format_syscall(self.syscall, self.arguments)
@@ -19,7 +19,8 @@
 ##
 
 class CountItem(object):
-    def __init__(self, syscall, count, visibility):
+    def __init__(self, syscall, count, visibility, histogram=None):
         self.syscall = syscall
         self.count = count
         self.visibility = visibility
+        self.histogram = histogram
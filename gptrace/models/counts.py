@@ -18,6 +18,8 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 ##
 
+from gptrace.latency_histogram import LatencyHistogram
+
 from .abstract import ModelAbstract
 
 
@@ -25,6 +27,18 @@ class ModelCounts(ModelAbstract):
     COL_SYSCALL = 0
     COL_COUNT = 1
     COL_VISIBILITY = 2
+    COL_TOTAL = 3
+    COL_MEAN = 4
+    COL_MAX = 5
+    COL_P50 = 6
+    COL_P99 = 7
+    COL_P999 = 8
+
+    def __init__(self, model):
+        super(self.__class__, self).__init__(model)
+        # The durations of each syscall
+        self.histograms = {}
+        self.changed = set()
 
     def add_data(self, item):
         """Add a new row to the model if it doesn't exist"""
@@ -33,19 +47,81 @@ class ModelCounts(ModelAbstract):
             new_row = self.model.append((
                 item.syscall,
                 item.count,
-                item.visibility
+                item.visibility,
+                0, 0, 0, 0, 0, 0
             ))
             self.rows[item.syscall] = new_row
 
-    def increment_count(self, syscall):
-        """Increment the count by 1 for the requested syscall"""
+    def increment_count(self, syscall, duration=None):
+        """Increment the count by 1 for the requested syscall and add its
+        duration"""
         treeiter = self.get_iter(syscall)
         self.model[treeiter][self.COL_COUNT] = (
                 self.model[treeiter][self.COL_COUNT] + 1)
         self.model[treeiter][self.COL_VISIBILITY] = True
+        if duration is not None:
+            histogram = self.histograms.get(syscall)
+            if histogram is None:
+                histogram = LatencyHistogram()
+                self.histograms[syscall] = histogram
+            histogram.add(duration)
+            self.changed.add(syscall)
+
+    def add_counts(self, syscall, count, histogram=None):
+        """Increment the count of a syscall and add its durations"""
+        treeiter = self.get_iter(syscall)
+        self.model.set(treeiter,
+                       (self.COL_COUNT, self.COL_VISIBILITY),
+                       (self.model[treeiter][self.COL_COUNT] + count, True))
+        if histogram is not None:
+            current = self.histograms.get(syscall)
+            if current is None:
+                current = LatencyHistogram()
+                self.histograms[syscall] = current
+            current.merge(histogram)
+            self.changed.add(syscall)
+
+    def set_count(self, item):
+        """Set the count and the durations of a syscall counted without
+        decoding it"""
+        treeiter = self.get_iter(item.syscall)
+        self.model.set(treeiter,
+                       (self.COL_COUNT, self.COL_VISIBILITY),
+                       (item.count, True))
+        if item.histogram is not None:
+            self.histograms[item.syscall] = item.histogram
+            self.changed.add(item.syscall)
+
+    def update_durations(self):
+        """Show the durations of the syscalls changed since the last
+        update"""
+        for syscall in self.changed:
+            histogram = self.histograms[syscall]
+            self.model.set(self.get_iter(syscall),
+                           (self.COL_TOTAL,
+                            self.COL_MEAN,
+                            self.COL_MAX,
+                            self.COL_P50,
+                            self.COL_P99,
+                            self.COL_P999),
+                           (histogram.total,
+                            histogram.get_mean(),
+                            histogram.maximum,
+                            *histogram.get_percentiles(0.5, 0.99, 0.999)))
+        self.changed.clear()
 
     def clear_values(self):
-        """Set the count of all items to zero"""
+        """Set the count and the durations of all items to zero"""
         for treeiter in self.rows.values():
-            self.model[treeiter][self.COL_COUNT] = 0
-            self.model[treeiter][self.COL_VISIBILITY] = False
+            self.model.set(treeiter,
+                           (self.COL_COUNT,
+                            self.COL_VISIBILITY,
+                            self.COL_TOTAL,
+                            self.COL_MEAN,
+                            self.COL_MAX,
+                            self.COL_P50,
+                            self.COL_P99,
+                            self.COL_P999),
+                           (0, False, 0, 0, 0, 0, 0, 0))
+        self.histograms.clear()
+        self.changed.clear()
@@ -0,0 +1,130 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import errno
+import os
+
+from .abstract import ModelAbstract
+
+# Results from -1 to -4095 are the errors returned by the kernel
+MAX_ERRNO = 4095
+
+
+def is_error(result):
+    """Check if a syscall result is an error"""
+    return result is not None and -MAX_ERRNO <= result < 0
+
+
+class ModelErrors(ModelAbstract):
+    COL_SYSCALL = 0
+    COL_ERROR = 1
+    COL_TARGET = 2
+    COL_COUNT = 3
+    COL_FIRST = 4
+    COL_LAST = 5
+    COL_DESCRIPTION = 6
+
+    def __init__(self, model):
+        super(self.__class__, self).__init__(model)
+        # Count, first and last timestamp for each syscall and error, and
+        # for each of them by path or by PID
+        self.errors = {}
+        self.paths = {}
+        self.pids = {}
+        self.by_pid = False
+        self.changed = set()
+
+    def add_data(self, item):
+        """Account a failed syscall, the rows are updated later"""
+        super(self.__class__, self).add_data(item)
+        key = (item.syscall, -item.result)
+        self.account(self.errors, key, item.timestamp)
+        # The failures without any path are grouped by their PID
+        self.account(self.paths,
+                     (*key, item.path or item.pid),
+                     item.timestamp,
+                     not self.by_pid)
+        self.account(self.pids,
+                     (*key, item.pid),
+                     item.timestamp,
+                     self.by_pid)
+
+    def account(self, totals, key, timestamp, shown=True):
+        """Increment the count and the last timestamp of a key"""
+        values = totals.get(key)
+        if values is None:
+            totals[key] = [1, timestamp, timestamp]
+        else:
+            values[0] += 1
+            values[2] = timestamp
+        if shown:
+            self.changed.add(key)
+
+    def update_errors(self):
+        """Show the errors changed since the last update"""
+        # The errors rows are added before their paths or PIDs rows
+        for key in sorted(self.changed, key=len):
+            if len(key) == 2:
+                values = self.errors[key]
+            else:
+                values = (self.pids if self.by_pid else self.paths)[key]
+            treeiter = self.rows.get(key)
+            if treeiter is None:
+                self.rows[key] = self.model.append(
+                    self.rows.get(key[:2]),
+                    self.create_row(key, values))
+            else:
+                self.model.set(treeiter,
+                               (self.COL_COUNT, self.COL_LAST),
+                               (values[0], values[2]))
+        self.changed.clear()
+
+    def create_row(self, key, values):
+        """Create the values of a new row"""
+        if len(key) == 2:
+            syscall, code = key
+            return (syscall,
+                    errno.errorcode.get(code, str(code)),
+                    None,
+                    *values,
+                    os.strerror(code))
+        target = key[2]
+        return (None,
+                None,
+                f'PID {target}' if isinstance(target, int) else target,
+                *values,
+                None)
+
+    def set_by_pid(self, by_pid):
+        """Show the errors by PID or by path, rebuilding the rows"""
+        self.by_pid = by_pid
+        super(self.__class__, self).clear()
+        self.changed.clear()
+        self.changed.update(self.errors)
+        self.changed.update(self.pids if by_pid else self.paths)
+        self.update_errors()
+
+    def clear(self):
+        """Clear the model and the errors totals"""
+        self.errors.clear()
+        self.paths.clear()
+        self.pids.clear()
+        self.changed.clear()
+        return super(self.__class__, self).clear()
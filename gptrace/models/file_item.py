@@ -19,7 +19,8 @@
 ##
 
 class FileItem(object):
-    def __init__(self, pid, file_path, existing):
+    def __init__(self, pid, file_path, existing, timestamp):
         self.pid = pid
         self.file_path = file_path
         self.existing = existing
+        self.timestamp = timestamp
@@ -19,43 +19,72 @@
 ##
 
 from .abstract import ModelAbstract
+from .file_index_item import FileIndexItem
 
 
 class ModelFiles(ModelAbstract):
     COL_PID = 0
     COL_FILEPATH = 1
     COL_EXISTING = 2
+    COL_READ = 3
+    COL_WRITTEN = 4
 
     def __init__(self, model):
         super(self.__class__, self).__init__(model)
-        # Store the files in a list for each process
+        # Store the files rows for each process
         self.processes = {}
+        # Index the processes using each file
+        self.paths = {}
 
     def add_data(self, item):
         """Add a new row to the model if it doesn't exist"""
         super(self.__class__, self).add_data(item)
-        if item.pid not in self.rows:
-            # Add a new process
-            process_row = self.model.append(None, (
-                item.pid,
-                None,
-                True
-            ))
-            self.rows[item.pid] = process_row
-            # Create a new list for the files for the current process
-            self.processes[item.pid] = []
-        else:
-            # Get the existing process iter
-            process_row = self.rows[item.pid]
+        if item.file_path:
+            index = self.paths.get(item.file_path)
+            if index is None:
+                index = FileIndexItem(timestamp=item.timestamp)
+                self.paths[item.file_path] = index
+            index.pids.add(item.pid)
+            index.count += 1
+        process_row = self.get_process_row(item.pid)
         # Add the file under the process if not already existing
         if item.file_path and item.file_path not in self.processes[item.pid]:
-            self.model.append(process_row, (
-                None,
-                item.file_path,
-                item.existing))
-            self.processes[item.pid].append(item.file_path)
+            self.processes[item.pid][item.file_path] = self.model.append(
+                process_row, (None, item.file_path, item.existing, 0, 0))
+
+    def add_io(self, item):
+        """Update the bytes read and written for a file and its process"""
+        process_row = self.get_process_row(item.pid)
+        file_row = self.processes[item.pid].get(item.file_path)
+        if file_row is None:
+            # The descriptor was opened before the tracing or isn't a file
+            file_row = self.model.append(
+                process_row, (None, item.file_path, True, 0, 0))
+            self.processes[item.pid][item.file_path] = file_row
+        # The items contain the totals, the process gets the difference
+        for column, value in ((self.COL_READ, item.read),
+                              (self.COL_WRITTEN, item.written)):
+            difference = value - self.model[file_row][column]
+            if difference:
+                self.model[file_row][column] = value
+                self.model[process_row][column] += difference
+
+    def get_process_row(self, pid):
+        """Get the row of a process, adding it if it doesn't exist"""
+        process_row = self.rows.get(pid)
+        if process_row is None:
+            process_row = self.model.append(None, (pid, None, True, 0, 0))
+            self.rows[pid] = process_row
+            self.processes[pid] = {}
+        return process_row
+
+    def get_file_index(self, file_path):
+        """Get the processes, the first use and the accesses count for
+        a file or None if it was never used"""
+        return self.paths.get(file_path)
 
     def clear(self):
         """Clear the model"""
         self.processes.clear()
+        self.paths.clear()
         return super(self.__class__, self).clear()
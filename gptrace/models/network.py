@@ -0,0 +1,64 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+from .abstract import ModelAbstract
+
+
+class ModelNetwork(ModelAbstract):
+    COL_PEER = 0
+    COL_LOCAL = 1
+    COL_PID = 2
+    COL_CALLS = 3
+    COL_SENT = 4
+    COL_RECEIVED = 5
+
+    def __init__(self, model):
+        super(self.__class__, self).__init__(model)
+        # Store the processes rows for each connection
+        self.processes = {}
+
+    def add_data(self, item):
+        """Update the totals of a connection and of its process"""
+        super(self.__class__, self).add_data(item)
+        key = (item.peer, item.local)
+        connection_row = self.rows.get(key)
+        if connection_row is None:
+            connection_row = self.model.append(
+                None, (item.peer, item.local, None, 0, 0, 0))
+            self.rows[key] = connection_row
+            self.processes[key] = {}
+        process_row = self.processes[key].get(item.pid)
+        if process_row is None:
+            process_row = self.model.append(
+                connection_row, (None, None, item.pid, 0, 0, 0))
+            self.processes[key][item.pid] = process_row
+        # The items contain the totals, the connection gets the difference
+        for column, value in ((self.COL_CALLS, item.calls),
+                              (self.COL_SENT, item.sent),
+                              (self.COL_RECEIVED, item.received)):
+            difference = value - self.model[process_row][column]
+            if difference:
+                self.model[process_row][column] = value
+                self.model[connection_row][column] += difference
+
+    def clear(self):
+        """Clear the model"""
+        self.processes.clear()
+        return super(self.__class__, self).clear()
@@ -18,19 +18,11 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 ##
 
-from threading import Thread
-
-from gi.repository import GObject
-from gi.repository import Gdk
-
-
-class DaemonThread(Thread):
-    def __init__(self, target, args=()):
-        GObject.threads_init()
-        Gdk.threads_init()
-        super(self.__class__, self).__init__(target=target, args=args)
-        self.daemon = True
-        self.cancelled = False
-
-    def cancel(self):
-        self.cancelled = True
+class NetworkItem(object):
+    def __init__(self, pid, peer, local, calls, sent, received):
+        self.pid = pid
+        self.peer = peer
+        self.local = local
+        self.calls = calls
+        self.sent = sent
+        self.received = received
@@ -0,0 +1,99 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import array
+import os
+import tempfile
+
+
+class PostingLists(object):
+    def __init__(self):
+        """Rows indexes grouped by key, whose older part can be spilled
+        to a segment file to keep only the latest ones in memory"""
+        self.rows = {}
+        # Offsets and counts of the spilled parts of each key
+        self.spilled = {}
+        self.counts = {}
+        self.segment = None
+        self.segment_size = 0
+
+    def __iter__(self):
+        """Iterate over the keys"""
+        return iter(self.counts)
+
+    def __contains__(self, key):
+        """Check if a key has any row"""
+        return key in self.counts
+
+    def get_appender(self, key):
+        """Get the function to append a row index to a key"""
+        rows = self.rows.get(key)
+        if rows is None:
+            rows = array.array('I')
+            self.rows[key] = rows
+            self.counts.setdefault(key, 0)
+        return rows.append
+
+    def append(self, key, index):
+        """Append a row index to a key"""
+        self.get_appender(key)(index)
+
+    def get_count(self, key):
+        """Get the number of rows of a key"""
+        rows = self.rows.get(key)
+        return self.counts.get(key, 0) + (len(rows) if rows else 0)
+
+    def get_rows(self, key):
+        """Get the rows indexes of a key, reading the spilled ones"""
+        result = array.array('I')
+        for offset, count in self.spilled.get(key, ()):
+            result.frombytes(os.pread(self.segment.fileno(),
+                                      count * result.itemsize,
+                                      offset))
+        result.extend(self.rows.get(key, ()))
+        return result
+
+    def spill(self):
+        """Move the rows indexes in memory to the segment file"""
+        if not self.segment:
+            self.segment = tempfile.TemporaryFile(prefix='gptrace-')
+        data = bytearray()
+        for key, rows in self.rows.items():
+            if rows:
+                self.spilled.setdefault(key, []).append(
+                    (self.segment_size + len(data), len(rows)))
+                self.counts[key] += len(rows)
+                data += rows.tobytes()
+                # The arrays are kept, their appenders can be still in use
+                del rows[:]
+        self.segment.write(data)
+        self.segment.flush()
+        self.segment_size += len(data)
+
+    def clear(self):
+        """Remove every key"""
+        self.rows.clear()
+        self.spilled.clear()
+        self.counts.clear()
+        if self.segment:
+            # Closing the temporary file deletes it
+            self.segment.close()
+            self.segment = None
+        self.segment_size = 0
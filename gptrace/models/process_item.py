@@ -19,9 +19,8 @@
 ##
 
 class ProcessItem(object):
-    def __init__(self, pid, timestamp, time, information, value):
+    def __init__(self, pid, timestamp, information, value):
         self.pid = pid
         self.timestamp = timestamp
-        self.time = time
         self.information = information
         self.value = value
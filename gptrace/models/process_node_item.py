@@ -0,0 +1,30 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+class ProcessNodeItem(object):
+    def __init__(self, pid, parent, timestamp, status=None, cpu_time=0,
+                 max_rss=0, switches=0):
+        self.pid = pid
+        self.parent = parent
+        self.timestamp = timestamp
+        self.status = status
+        self.cpu_time = cpu_time
+        self.max_rss = max_rss
+        self.switches = switches
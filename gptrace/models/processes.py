@@ -24,9 +24,13 @@ from .abstract import ModelAbstract
 class ModelProcesses(ModelAbstract):
     COL_PID = 0
     COL_TIMESTAMP = 1
-    COL_TIME = 2
-    COL_INFORMATION = 3
-    COL_VALUE = 4
+    COL_INFORMATION = 2
+    COL_VALUE = 3
+    COL_END = 4
+    COL_STATUS = 5
+    COL_CPU_TIME = 6
+    COL_MAX_RSS = 7
+    COL_SWITCHES = 8
 
     def __init__(self, model):
         super(self.__class__, self).__init__(model)
@@ -36,22 +40,44 @@ class ModelProcesses(ModelAbstract):
     def add_data(self, item):
         """Add a new row to the model if it doesn't exist"""
         super(self.__class__, self).add_data(item)
-        if item.pid not in self.rows:
+        process_row = self.rows.get(item.pid)
+        if process_row is None:
             # Add a new process
-            process_row = self.model.append(None, (
+            self.rows[item.pid] = self.model.append(None, (
                 item.pid,
                 item.timestamp,
-                item.time,
                 item.information,
-                item.value))
-            self.rows[item.pid] = process_row
+                item.value,
+                0, None, 0, 0, 0))
+        elif self.model[process_row][self.COL_INFORMATION] is None:
+            # Show the first information in the process row
+            self.model.set(process_row,
+                           self.COL_INFORMATION, item.information,
+                           self.COL_VALUE, item.value)
         else:
-            # Get the existing process iter
-            process_row = self.rows[item.pid]
             # Add the information under the process
             self.model.append(process_row, (
                 item.pid,
                 item.timestamp,
-                item.time,
                 item.information,
-                item.value))
+                item.value,
+                0, None, 0, 0, 0))
+
+    def add_node(self, item):
+        """Add a process under its parent or update it after its exit"""
+        process_row = self.rows.get(item.pid)
+        if process_row is None:
+            process_row = self.model.append(self.rows.get(item.parent), (
+                item.pid,
+                item.timestamp,
+                None,
+                None,
+                0, None, 0, 0, 0))
+            self.rows[item.pid] = process_row
+        if item.status is not None:
+            self.model.set(process_row,
+                           self.COL_END, item.timestamp,
+                           self.COL_STATUS, item.status,
+                           self.COL_CPU_TIME, item.cpu_time,
+                           self.COL_MAX_RSS, item.max_rss,
+                           self.COL_SWITCHES, item.switches)
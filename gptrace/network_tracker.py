@@ -0,0 +1,217 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import errno
+import os
+import socket
+import struct
+
+from ptrace.error import PtraceError
+
+# Paths of the sockets in the descriptors table
+SOCKET_PREFIX = 'socket:'
+# Socket addresses structures following the address family
+SOCKADDR_FAMILY = struct.Struct('=H')
+SOCKADDR_IN = struct.Struct('!H4s')
+SOCKADDR_IN6 = struct.Struct('!HI16s')
+SOCKADDR_NL = struct.Struct('=HII')
+SOCKADDR_LENGTH = struct.Struct('=i')
+SOCKADDR_MAX_SIZE = 128
+# Syscalls with a socket address, with the indexes of the address and of
+# its length, the length being a pointer for the addresses set by them
+ADDRESS_SYSCALLS = {
+    'connect': (1, 2, False),
+    'bind': (1, 2, False),
+    'getsockname': (1, 2, True),
+    'accept': (1, 2, True),
+    'accept4': (1, 2, True),
+    'sendto': (4, 5, False),
+    'recvfrom': (4, 5, True),
+}
+
+
+def format_sockaddr(data, with_port=True):
+    """Render a socket address or None for the unsupported families"""
+    if len(data) < SOCKADDR_FAMILY.size:
+        return None
+    family, = SOCKADDR_FAMILY.unpack_from(data)
+    if (family == socket.AF_INET and
+            len(data) >= SOCKADDR_FAMILY.size + SOCKADDR_IN.size):
+        port, address = SOCKADDR_IN.unpack_from(data, SOCKADDR_FAMILY.size)
+        host = socket.inet_ntop(socket.AF_INET, address)
+        return f'{host}:{port}' if with_port else host
+    elif (family == socket.AF_INET6 and
+            len(data) >= SOCKADDR_FAMILY.size + SOCKADDR_IN6.size):
+        port, _, address = SOCKADDR_IN6.unpack_from(data,
+                                                    SOCKADDR_FAMILY.size)
+        host = socket.inet_ntop(socket.AF_INET6, address)
+        return f'[{host}]:{port}' if with_port else host
+    elif family == socket.AF_UNIX:
+        path = data[SOCKADDR_FAMILY.size:]
+        if path[:1] == b'\0':
+            # Abstract socket name
+            return '@' + os.fsdecode(path[1:].rstrip(b'\0'))
+        return os.fsdecode(path.split(b'\0', 1)[0]) or None
+    elif (family == socket.AF_NETLINK and
+            len(data) >= SOCKADDR_FAMILY.size + SOCKADDR_NL.size):
+        _, pid, _ = SOCKADDR_NL.unpack_from(data, SOCKADDR_FAMILY.size)
+        return f'netlink:{pid}'
+    return None
+
+
+class NetworkTracker(object):
+    def __init__(self, resolver):
+        """Track the endpoints of the sockets, identified by their path in
+        the descriptors table, and account the calls and the bytes
+        exchanged by each process with each peer"""
+        self.resolver = resolver
+        self.peers = {}
+        self.locals = {}
+        # Calls, sent and received bytes by process, peer and local address
+        self.totals = {}
+        self.changed = set()
+
+    def read_address(self, syscall, with_port=True):
+        """Read the socket address argument of a syscall, None if it's
+        missing or unreadable"""
+        address_index, length_index, filled = ADDRESS_SYSCALLS[syscall.name]
+        address = syscall.arguments[address_index].value
+        length = syscall.arguments[length_index].value
+        if not address or not length:
+            return None
+        process = syscall.process
+        try:
+            if filled:
+                length, = SOCKADDR_LENGTH.unpack(
+                    process.readBytes(length, SOCKADDR_LENGTH.size))
+            length &= 0xffffffff
+            if not length:
+                return None
+            return format_sockaddr(
+                process.readBytes(address, min(length, SOCKADDR_MAX_SIZE)),
+                with_port)
+        except PtraceError:
+            return None
+
+    def add_address(self, syscall):
+        """Update the endpoints of the sockets connected, bound, queried
+        or accepted by a syscall"""
+        name = syscall.name
+        result = syscall.result
+        if name in ('sendto', 'recvfrom') or result is None:
+            return
+        elif result < 0 and not (name == 'connect' and
+                                 result == -errno.EINPROGRESS):
+            return
+        pid = syscall.process.pid
+        socket_path = self.resolver.get_file_path(
+            pid, syscall.arguments[0].value)
+        if not socket_path or not socket_path.startswith(SOCKET_PREFIX):
+            return
+        if name in ('bind', 'getsockname'):
+            # The sockets bound to port zero get their port from the kernel
+            address = self.read_address(syscall)
+            if address:
+                self.locals[socket_path] = address
+        elif name == 'connect':
+            address = self.read_address(syscall)
+            if address:
+                self.peers[socket_path] = address
+                self.account(pid, socket_path, address)
+        else:
+            # The ports of the accepted clients are ephemeral
+            address = self.read_address(syscall, with_port=False)
+            accepted_path = self.resolver.get_file_path(pid, result)
+            if (address and accepted_path and
+                    accepted_path.startswith(SOCKET_PREFIX)):
+                self.peers[accepted_path] = address
+                local = self.locals.get(socket_path)
+                if local:
+                    self.locals[accepted_path] = local
+                self.account(pid, accepted_path, address)
+
+    def add_transfer(self, syscall, socket_path, position):
+        """Account the bytes read or written by a syscall on a socket"""
+        address = None
+        if syscall.name in ADDRESS_SYSCALLS:
+            # The datagrams can have their own address
+            address = self.read_address(syscall)
+        address = address or self.peers.get(socket_path)
+        if address:
+            self.account(syscall.process.pid,
+                         socket_path,
+                         address,
+                         syscall.result,
+                         position)
+
+    def account(self, pid, socket_path, address, size=0, position=None):
+        """Increment the calls and the bytes exchanged by a process with a
+        peer"""
+        key = (pid, address, self.locals.get(socket_path))
+        totals = self.totals.get(key)
+        if totals is None:
+            totals = [0, 0, 0]
+            self.totals[key] = totals
+        totals[0] += 1
+        if position is not None:
+            # The bytes read are received and the written ones are sent
+            totals[2 - position] += size
+        self.changed.add(key)
+
+    def get_changed(self):
+        """Get and forget the totals changed since the last call"""
+        changed = [(key, self.totals[key]) for key in self.changed]
+        self.changed.clear()
+        return changed
+
+    def get_closed_socket(self, syscall):
+        """Get the path of a known socket closed by a syscall"""
+        if syscall.result != 0 or not (self.peers or self.locals):
+            return None
+        socket_path = self.resolver.get_file_path(syscall.process.pid,
+                                                  syscall.arguments[0].value)
+        if socket_path in self.peers or socket_path in self.locals:
+            return socket_path
+        return None
+
+    def remove_socket(self, socket_path):
+        """Forget the endpoints of a closed socket, unless it's still open
+        in any descriptors table"""
+        if (self.resolver.track_descriptors and
+                socket_path in self.resolver.get_open_paths()):
+            return
+        self.peers.pop(socket_path, None)
+        self.locals.pop(socket_path, None)
+
+    def remove_process(self, pid):
+        """Forget the totals of a terminated process and the endpoints of
+        the sockets no longer open"""
+        for key in [key for key in self.totals if key[0] == pid]:
+            del self.totals[key]
+            self.changed.discard(key)
+        # Without the descriptors tables the sockets are forgotten only
+        # when closed
+        if self.resolver.track_descriptors and (self.peers or self.locals):
+            open_paths = self.resolver.get_open_paths()
+            for endpoints in (self.peers, self.locals):
+                for socket_path in [socket_path
+                                    for socket_path in endpoints
+                                    if socket_path not in open_paths]:
+                    del endpoints[socket_path]
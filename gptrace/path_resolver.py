@@ -0,0 +1,282 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import functools
+import logging
+import os.path
+
+from ptrace.linux_proc import ProcError, readProcessLink, readProcessProc
+
+AT_FDCWD = -100
+O_CLOEXEC = 0o2000000
+MFD_CLOEXEC = 1
+FD_CLOEXEC = 1
+F_DUPFD = 0
+F_SETFD = 2
+F_DUPFD_CLOEXEC = 1030
+CLOSE_RANGE_CLOEXEC = 4
+# Arguments with the directory descriptor of the following filename
+DIRFD_ARGUMENTS = ('dfd', 'dirfd', 'olddfd', 'newdfd')
+# Syscalls returning a new file descriptor for their filename argument
+# with the index of the argument containing the flags
+OPEN_SYSCALLS = {
+    'creat': None,
+    'open': 1,
+    'openat': 2,
+    'openat2': None,
+}
+# Syscalls returning a new file descriptor with the index of the argument
+# containing the close-on-exec flag and the flag value
+NEW_DESCRIPTOR_SYSCALLS = {
+    'accept': None,
+    'accept4': (3, O_CLOEXEC),
+    'epoll_create': None,
+    'epoll_create1': (0, O_CLOEXEC),
+    'eventfd': None,
+    'eventfd2': (1, O_CLOEXEC),
+    'inotify_init': None,
+    'inotify_init1': (0, O_CLOEXEC),
+    'memfd_create': (1, MFD_CLOEXEC),
+    'signalfd': None,
+    'signalfd4': (3, O_CLOEXEC),
+    'socket': (1, O_CLOEXEC),
+    'timerfd_create': (1, O_CLOEXEC),
+}
+# Syscalls changing the working directory
+CHDIR_SYSCALLS = ('chdir', 'fchdir')
+# Syscalls replacing the descriptors, without them the descriptors table
+# cannot be kept up to date
+REPLACE_SYSCALLS = {'close', 'close_range', 'dup2', 'dup3'}
+# Number of normalized paths to keep in memory
+PATHS_CACHE_SIZE = 16384
+
+
+@functools.lru_cache(maxsize=PATHS_CACHE_SIZE)
+def join_path(base, file_path):
+    """Get the normalized absolute path of a file"""
+    return os.path.normpath(os.path.join(base, file_path))
+
+
+def get_descriptor(value):
+    """Convert an argument value to a signed file descriptor"""
+    value &= 0xffffffff
+    return value - 0x100000000 if value & 0x80000000 else value
+
+
+class PathResolver(object):
+    def __init__(self, syscalls):
+        """Resolve the relative paths for each process using its working
+        directory and its descriptors table, both shared by the threads
+        of the same thread group"""
+        # Thread group of each process and number of its known members
+        self.groups = {}
+        self.members = {}
+        self.cwds = {}
+        # Each descriptor has its path and the close-on-exec flag, None
+        # for the values still unknown
+        self.descriptors = {}
+        self.track_descriptors = REPLACE_SYSCALLS.issubset(syscalls)
+        if not self.track_descriptors:
+            logging.info('descriptors table disabled for the missing '
+                         'syscalls')
+
+    def read_link(self, pid, name):
+        """Read a link from the process directory or None if unavailable"""
+        try:
+            return readProcessLink(pid, name)
+        except ProcError:
+            return None
+
+    def read_thread_group(self, pid):
+        """Read the thread group of a process or its pid if unavailable"""
+        try:
+            status = readProcessProc(pid, 'status')
+        except ProcError:
+            return pid
+        for line in status.splitlines():
+            if line.startswith('Tgid:'):
+                return int(line[5:])
+        return pid
+
+    def join_group(self, pid, group):
+        """Add a process to a thread group"""
+        self.groups[pid] = group
+        self.members[group] = self.members.get(group, 0) + 1
+
+    def get_group(self, pid):
+        """Get the thread group of a process, the key of its working
+        directory and of its descriptors table"""
+        group = self.groups.get(pid)
+        if group is None:
+            # Processes started or threads attached outside the tracing
+            group = self.read_thread_group(pid)
+            self.join_group(pid, group)
+        return group
+
+    def get_cwd(self, pid):
+        """Get the working directory of a process"""
+        group = self.get_group(pid)
+        cwd = self.cwds.get(group)
+        if cwd is None:
+            cwd = self.read_link(pid, 'cwd')
+            if cwd is not None:
+                self.cwds[group] = cwd
+        return cwd
+
+    def get_descriptor_path(self, pid, descriptor):
+        """Get the path of a file descriptor"""
+        if descriptor == AT_FDCWD:
+            return self.get_cwd(pid)
+        elif not self.track_descriptors:
+            return self.read_link(pid, f'fd/{descriptor}')
+        descriptors = self.descriptors.setdefault(self.get_group(pid), {})
+        file_path, cloexec = descriptors.get(descriptor, (None, None))
+        if file_path is None:
+            file_path = self.read_link(pid, f'fd/{descriptor}')
+            if file_path is not None:
+                descriptors[descriptor] = (file_path, cloexec)
+        return file_path
+
+    def resolve(self, pid, file_path, descriptor=AT_FDCWD):
+        """Get the absolute path of a file used by a process, relative to
+        the directory descriptor"""
+        if file_path.startswith('/'):
+            return join_path('/', file_path)
+        base = self.get_descriptor_path(pid, descriptor)
+        if base is None or not base.startswith('/'):
+            # Unknown directory, keep the path as is
+            return file_path
+        return join_path(base, file_path)
+
+    def update(self, syscall, file_path):
+        """Update the process state after a syscall, using the resolved
+        path of its filename argument"""
+        if syscall.result is None or syscall.result < 0:
+            return
+        pid = syscall.process.pid
+        name = syscall.name
+        if name in CHDIR_SYSCALLS:
+            # The kernel already resolved the new working directory
+            self.cwds.pop(self.get_group(pid), None)
+            self.get_cwd(pid)
+            return
+        elif not self.track_descriptors:
+            return
+        values = [argument.value for argument in syscall.arguments]
+        descriptors = self.descriptors.setdefault(self.get_group(pid), {})
+        if name in OPEN_SYSCALLS:
+            index = OPEN_SYSCALLS[name]
+            if index is not None:
+                cloexec = bool(values[index] & O_CLOEXEC)
+            else:
+                # The openat2 flags are inside a structure
+                cloexec = False if name == 'creat' else None
+            descriptors[syscall.result] = (
+                file_path if file_path and file_path.startswith('/') else None,
+                cloexec)
+        elif name in NEW_DESCRIPTOR_SYSCALLS:
+            # The path of the other descriptors is read when needed
+            index, flag = NEW_DESCRIPTOR_SYSCALLS[name] or (None, None)
+            descriptors[syscall.result] = (
+                None,
+                bool(values[index] & flag)
+                if index is not None and index < len(values) else False)
+        elif name == 'close':
+            descriptors.pop(get_descriptor(values[0]), None)
+        elif name == 'close_range' and len(values) >= 3:
+            # Without its prototype the syscall has every raw argument
+            first = get_descriptor(values[0])
+            last = values[1] & 0xffffffff
+            for descriptor in [descriptor
+                               for descriptor in descriptors
+                               if first <= descriptor <= last]:
+                if values[2] & CLOSE_RANGE_CLOEXEC:
+                    descriptors[descriptor] = (
+                        descriptors[descriptor][0], True)
+                else:
+                    del descriptors[descriptor]
+        elif name == 'dup':
+            self.duplicate(pid, get_descriptor(values[0]), syscall.result,
+                           False)
+        elif name in ('dup2', 'dup3'):
+            self.duplicate(pid, get_descriptor(values[0]), syscall.result,
+                           name == 'dup3' and bool(values[2] & O_CLOEXEC))
+        elif name == 'fcntl':
+            descriptor = get_descriptor(values[0])
+            command = values[1] & 0xffffffff
+            if command in (F_DUPFD, F_DUPFD_CLOEXEC):
+                self.duplicate(pid, descriptor, syscall.result,
+                               command == F_DUPFD_CLOEXEC)
+            elif command == F_SETFD and descriptor in descriptors:
+                descriptors[descriptor] = (descriptors[descriptor][0],
+                                           bool(values[2] & FD_CLOEXEC))
+
+    def duplicate(self, pid, descriptor, new_descriptor, cloexec):
+        """Copy a descriptor to a new one with its close-on-exec flag"""
+        descriptors = self.descriptors[self.get_group(pid)]
+        if descriptor == new_descriptor:
+            return
+        descriptors[new_descriptor] = (
+            descriptors.get(descriptor, (None, None))[0], cloexec)
+
+    def get_file_path(self, pid, descriptor):
+        """Get the path of a descriptor used for the I/O"""
+        return self.get_descriptor_path(pid, get_descriptor(descriptor))
+
+    def add_process(self, pid, parent_pid, is_thread=False):
+        """Share the working directory and the descriptors with the other
+        threads or inherit them from the parent process"""
+        parent_group = self.get_group(parent_pid)
+        if is_thread:
+            self.join_group(pid, parent_group)
+            return
+        self.join_group(pid, pid)
+        if parent_group in self.cwds:
+            self.cwds[pid] = self.cwds[parent_group]
+        if parent_group in self.descriptors:
+            self.descriptors[pid] = self.descriptors[parent_group].copy()
+
+    def execute(self, pid):
+        """Remove the descriptors closed by the program execution, the
+        ones with an unknown flag will be read again"""
+        group = self.get_group(pid)
+        if group in self.descriptors:
+            self.descriptors[group] = {
+                descriptor: value
+                for descriptor, value in self.descriptors[group].items()
+                if value[1] is False}
+
+    def get_open_paths(self):
+        """Get the paths of the known descriptors of every process"""
+        return {value[0]
+                for descriptors in self.descriptors.values()
+                for value in descriptors.values()}
+
+    def remove_process(self, pid):
+        """Forget a terminated process and the state of its thread group
+        after its last thread"""
+        group = self.groups.pop(pid, None)
+        if group is None:
+            return
+        self.members[group] -= 1
+        if not self.members[group]:
+            del self.members[group]
+            self.cwds.pop(group, None)
+            self.descriptors.pop(group, None)
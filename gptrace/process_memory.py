@@ -0,0 +1,81 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import ctypes
+import mmap
+import os
+
+PAGE_SIZE = mmap.PAGESIZE
+
+
+class IOVec(ctypes.Structure):
+    _fields_ = (('iov_base', ctypes.c_void_p),
+                ('iov_len', ctypes.c_size_t))
+
+
+_libc = ctypes.CDLL(None, use_errno=True)
+_process_vm_readv = getattr(_libc, 'process_vm_readv', None)
+
+
+def is_process_vm_readv_available():
+    """Check if the C library exposes the process_vm_readv syscall"""
+    return _process_vm_readv is not None
+
+
+def get_page_remainder(address):
+    """Get the number of bytes from the address to its page end"""
+    return PAGE_SIZE - address % PAGE_SIZE
+
+
+class ProcessMemoryReader(object):
+    def __init__(self, pid):
+        """Copy the memory of another process with process_vm_readv,
+        reusing the same local buffer for every read"""
+        self.pid = pid
+        self.buffer = None
+        self.view = None
+        self.local = IOVec()
+        self.remote = IOVec()
+        self.local_pointer = ctypes.byref(self.local)
+        self.remote_pointer = ctypes.byref(self.remote)
+        self.allocate(PAGE_SIZE)
+
+    def allocate(self, size):
+        """Allocate the local buffer for the reads up to size bytes"""
+        self.buffer = ctypes.create_string_buffer(size)
+        self.view = memoryview(self.buffer)
+        self.local.iov_base = ctypes.addressof(self.buffer)
+
+    def read(self, address, size):
+        """Read the memory in a single syscall, returning less data when
+        the range crosses an unreadable page"""
+        if size > len(self.buffer):
+            self.allocate(size)
+        self.local.iov_len = size
+        self.remote.iov_base = address
+        self.remote.iov_len = size
+        result = _process_vm_readv(self.pid,
+                                   self.local_pointer, 1,
+                                   self.remote_pointer, 1,
+                                   0)
+        if result < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        return bytes(self.view[:result])
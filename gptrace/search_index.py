@@ -0,0 +1,119 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import bisect
+import re
+
+from gptrace.models.posting_lists import PostingLists
+from gptrace.syscall_format import format_result, render_syscall
+
+# Words indexed from the rendered syscalls
+WORD_PATTERN = re.compile(r'\w+')
+# Addresses are different for almost every row and are not indexed
+ADDRESS_PATTERN = re.compile(r'0x[0-9a-f]{8,}$')
+# Number of rows indexed at once, well below a millisecond
+INDEX_BATCH_SIZE = 16
+# Average words of a row used to estimate the index size to keep in memory
+INDEX_SPILL_WORDS = 10
+
+
+class SearchIndex(object):
+    def __init__(self, store):
+        """Index the words of the rendered syscalls of an activities store
+        in small batches, searching the rows with the words starting with
+        the searched words"""
+        self.store = store
+        # Rows indexes for each indexed word, spilled like the rows while
+        # the words are always kept in memory
+        self.rows = PostingLists()
+        self.memory_count = 0
+        self.sorted_words = []
+        # The rows are indexed in order, the following ones are pending
+        self.count = 0
+
+    def has_pending(self):
+        """Check if some rows of the store are not indexed yet"""
+        return self.count < len(self.store)
+
+    def index_rows(self, limit=INDEX_BATCH_SIZE):
+        """Index the next pending rows, returning True if other rows are
+        still pending"""
+        store = self.store
+        stop = min(len(store), self.count + limit)
+        for index in range(self.count, stop):
+            self.add_words(index, self.get_words(store.get_syscall(index),
+                                                 store.get_arguments(index),
+                                                 store.get_result(index)))
+        self.count = stop
+        # Keep in memory about as many rows as the store does
+        if (store.spilled and
+                self.memory_count > len(store.timestamps) * INDEX_SPILL_WORDS):
+            self.rows.spill()
+            self.memory_count = 0
+        return self.has_pending()
+
+    def get_words(self, syscall, arguments, result):
+        """Get the distinct words of a rendered syscall and its result"""
+        text = f'{render_syscall(syscall, arguments)} {format_result(result)}'
+        return {word for word in WORD_PATTERN.findall(text.lower())
+                if not ADDRESS_PATTERN.match(word)}
+
+    def add_words(self, index, words):
+        """Add the words of a row to the index"""
+        for word in words:
+            if word not in self.rows:
+                # The words will be sorted again by the next search
+                self.sorted_words = None
+            self.rows.append(word, index)
+        self.memory_count += len(words)
+
+    def search(self, text):
+        """Get the sorted indexes of the rows with all the words in the
+        text, each one being the start of a word in the row"""
+        words = set(WORD_PATTERN.findall(text.lower()))
+        if not words:
+            return []
+        if self.sorted_words is None:
+            self.sorted_words = sorted(self.rows)
+        result = None
+        # The longest words usually match the fewest rows
+        for word in sorted(words, key=len, reverse=True):
+            matches = set()
+            position = bisect.bisect_left(self.sorted_words, word)
+            while (position < len(self.sorted_words) and
+                   self.sorted_words[position].startswith(word)):
+                rows = self.rows.get_rows(self.sorted_words[position])
+                if result is None:
+                    matches.update(rows)
+                else:
+                    matches.update(index for index in rows
+                                   if index in result)
+                position += 1
+            result = matches
+            if not result:
+                break
+        return sorted(result)
+
+    def clear(self):
+        """Remove every indexed row"""
+        self.rows.clear()
+        self.memory_count = 0
+        self.sorted_words = []
+        self.count = 0
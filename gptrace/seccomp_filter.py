@@ -0,0 +1,160 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import ctypes
+import os
+import platform
+import re
+import signal
+import sys
+
+from ptrace.binding import ptrace_traceme
+from ptrace.cpu_info import CPU_AARCH64, CPU_ARM32, CPU_I386, CPU_X86_64
+from ptrace.os_tools import RUNNING_LINUX
+from ptrace.syscall import SYSCALL_NAMES
+
+PTRACE_O_TRACESECCOMP = 0x00000080
+PTRACE_EVENT_SECCOMP = 7
+
+PR_SET_SECCOMP = 22
+PR_SET_NO_NEW_PRIVS = 38
+SECCOMP_MODE_FILTER = 2
+SECCOMP_RET_TRACE = 0x7ff00000
+SECCOMP_RET_ALLOW = 0x7fff0000
+# Without no_new_privs only the processes with CAP_SYS_ADMIN can install
+# a seccomp filter
+CAP_SYS_ADMIN = 21
+
+# BPF instructions used by the filter
+BPF_LD_W_ABS = 0x20
+BPF_JMP_JEQ_K = 0x15
+BPF_RET_K = 0x06
+# Offsets of the fields in the seccomp_data structure
+SECCOMP_DATA_NR = 0
+SECCOMP_DATA_ARCH = 4
+
+if CPU_X86_64:
+    AUDIT_ARCH = 0xc000003e
+elif CPU_I386:
+    AUDIT_ARCH = 0x40000003
+elif CPU_AARCH64:
+    AUDIT_ARCH = 0xc00000b7
+elif CPU_ARM32:
+    AUDIT_ARCH = 0x40000028
+else:
+    AUDIT_ARCH = None
+
+# Seccomp stops are reported between syscall enter and exit since Linux 4.8
+MINIMUM_KERNEL_VERSION = (4, 8)
+
+
+class SockFilter(ctypes.Structure):
+    _fields_ = (('code', ctypes.c_ushort),
+                ('jt', ctypes.c_ubyte),
+                ('jf', ctypes.c_ubyte),
+                ('k', ctypes.c_uint))
+
+
+class SockFilterProgram(ctypes.Structure):
+    _fields_ = (('len', ctypes.c_ushort),
+                ('filter', ctypes.POINTER(SockFilter)))
+
+
+def is_seccomp_available():
+    """Check if the running kernel can filter the syscalls using seccomp"""
+    if not RUNNING_LINUX or AUDIT_ARCH is None:
+        return False
+    match = re.match(r'(\d+)\.(\d+)', platform.release())
+    if not match or tuple(map(int, match.groups())) < MINIMUM_KERNEL_VERSION:
+        return False
+    try:
+        with open('/proc/self/status') as status_file:
+            return any(line.startswith('Seccomp:') for line in status_file)
+    except OSError:
+        return False
+
+
+def has_sys_admin():
+    """Check if the current process has the CAP_SYS_ADMIN capability"""
+    try:
+        with open('/proc/self/status') as status_file:
+            for line in status_file:
+                if line.startswith('CapEff:'):
+                    return bool(int(line[7:], 16) & (1 << CAP_SYS_ADMIN))
+    except OSError:
+        pass
+    return False
+
+
+def build_filter(syscalls):
+    """Build the BPF program to trace only the requested syscalls"""
+    numbers = sorted(number
+                     for number, name in SYSCALL_NAMES.items()
+                     if name in syscalls)
+    instructions = [
+        # Allow every syscall from a different architecture
+        SockFilter(BPF_LD_W_ABS, 0, 0, SECCOMP_DATA_ARCH),
+        SockFilter(BPF_JMP_JEQ_K, 1, 0, AUDIT_ARCH),
+        SockFilter(BPF_RET_K, 0, 0, SECCOMP_RET_ALLOW),
+        SockFilter(BPF_LD_W_ABS, 0, 0, SECCOMP_DATA_NR),
+    ]
+    for number in numbers:
+        # Stop in the tracer only for the matching syscalls
+        instructions.append(SockFilter(BPF_JMP_JEQ_K, 0, 1, number))
+        instructions.append(SockFilter(BPF_RET_K, 0, 0, SECCOMP_RET_TRACE))
+    instructions.append(SockFilter(BPF_RET_K, 0, 0, SECCOMP_RET_ALLOW))
+    return (SockFilter * len(instructions))(*instructions)
+
+
+def install_filter(syscalls):
+    """Install the seccomp filter for the current process"""
+    libc = ctypes.CDLL(None, use_errno=True)
+    instructions = build_filter(syscalls)
+    program = SockFilterProgram(len(instructions), instructions)
+    # The no_new_privs flag prevents the setuid and the file capabilities
+    # programs from gaining their privileges, avoid it when possible
+    if (not has_sys_admin() and
+            libc.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0) != 0):
+        raise OSError(ctypes.get_errno(), 'Unable to set no_new_privs')
+    if libc.prctl(PR_SET_SECCOMP, SECCOMP_MODE_FILTER,
+                  ctypes.byref(program), 0, 0) != 0:
+        raise OSError(ctypes.get_errno(), 'Unable to install the filter')
+
+
+def create_child(arguments, no_stdout, syscalls):
+    """Create a traced child process with the seccomp filter installed"""
+    pid = os.fork()
+    if pid:
+        return pid
+    try:
+        if no_stdout:
+            null = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(null, 1)
+            os.dup2(null, 2)
+            os.close(null)
+        ptrace_traceme()
+        # Stop until the debugger has set the ptrace options, otherwise the
+        # filtered syscalls would fail with ENOSYS
+        os.kill(os.getpid(), signal.SIGSTOP)
+        install_filter(syscalls)
+        os.execvp(arguments[0], arguments)
+    except Exception as error:
+        sys.stderr.write(f'Unable to start {arguments[0]}: {error}\n')
+    os._exit(255)
@@ -0,0 +1,57 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+
+import datetime
+import time
+
+
+class SessionClock(object):
+    def __init__(self, start_time=None):
+        """Anchor the monotonic clock to the wall clock time of the session
+        start, so the events carry only the nanoseconds since the start"""
+        self.start_monotonic = time.monotonic_ns()
+        self.start_time = start_time or datetime.datetime.now()
+
+    def get_timestamp(self):
+        """Get the nanoseconds elapsed since the session start"""
+        return time.monotonic_ns() - self.start_monotonic
+
+    def format_time(self, timestamp):
+        """Render the wall clock time of a session timestamp"""
+        return (self.start_time +
+                datetime.timedelta(microseconds=timestamp // 1000)
+                ).strftime('%H:%M:%S.%f')
+
+
+def format_timestamp(timestamp):
+    """Render a session timestamp in seconds"""
+    return f'{timestamp / 1000000000:.6f}'
+
+
+def format_duration(duration):
+    """Render a duration in nanoseconds with the most suitable unit"""
+    if duration < 1000:
+        return f'{duration} ns'
+    elif duration < 1000000:
+        return f'{duration / 1000:.1f} µs'
+    elif duration < 1000000000:
+        return f'{duration / 1000000:.1f} ms'
+    return f'{duration / 1000000000:.3f} s'
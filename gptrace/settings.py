@@ -21,6 +21,8 @@
 import configparser
 import logging
 
+from gptrace.decoding_profiles import parse_profile
+
 POSITION_LEFT = 'left'
 POSITION_TOP = 'top'
 SIZE_WIDTH = 'width'
@@ -33,16 +35,49 @@ SECTION_ACTIVITIES = 'activities'
 SECTION_COUNTS = 'counts'
 SECTION_FILES = 'files'
 SECTION_PROCESSES = 'processes'
+SECTION_ERRORS = 'errors'
+SECTION_NETWORK = 'network'
+SECTION_DECODING = 'decoding'
 
 PREFERENCES_AUTO_CLEAR = 'autoclear'
 DEFAULT_VALUES[PREFERENCES_AUTO_CLEAR] = (SECTION_APPLICATION, True)
 
+PREFERENCES_REFRESH_RATE = 'refresh rate'
+DEFAULT_VALUES[PREFERENCES_REFRESH_RATE] = (SECTION_APPLICATION, 30)
+
+PREFERENCES_BATCH_SIZE = 'batch size'
+DEFAULT_VALUES[PREFERENCES_BATCH_SIZE] = (SECTION_APPLICATION, 5000)
+
+PREFERENCES_RETENTION_ROWS = 'retention rows'
+DEFAULT_VALUES[PREFERENCES_RETENTION_ROWS] = (SECTION_APPLICATION, 0)
+
+PREFERENCES_RETENTION_SIZE = 'retention size'
+DEFAULT_VALUES[PREFERENCES_RETENTION_SIZE] = (SECTION_APPLICATION, 0)
+
+PREFERENCES_SECCOMP = 'seccomp filter'
+DEFAULT_VALUES[PREFERENCES_SECCOMP] = (SECTION_APPLICATION, False)
+
+PREFERENCES_COUNTS_ONLY = 'counts only'
+DEFAULT_VALUES[PREFERENCES_COUNTS_ONLY] = (SECTION_APPLICATION, False)
+
+PREFERENCES_RECORD_TRACE = 'record trace'
+DEFAULT_VALUES[PREFERENCES_RECORD_TRACE] = (SECTION_APPLICATION, False)
+
+PREFERENCES_ATTACH = 'attach processes'
+DEFAULT_VALUES[PREFERENCES_ATTACH] = (SECTION_APPLICATION, False)
+
+PREFERENCES_ATTACH_THREADS = 'attach threads'
+DEFAULT_VALUES[PREFERENCES_ATTACH_THREADS] = (SECTION_APPLICATION, False)
+
 PREFERENCES_COUNT_CALLED = 'only called'
 DEFAULT_VALUES[PREFERENCES_COUNT_CALLED] = (SECTION_COUNTS, False)
 
 PREFERENCES_FILES_EXISTING = 'only existing'
 DEFAULT_VALUES[PREFERENCES_FILES_EXISTING] = (SECTION_FILES, False)
 
+PREFERENCES_ERRORS_BY_PID = 'by pid'
+DEFAULT_VALUES[PREFERENCES_ERRORS_BY_PID] = (SECTION_ERRORS, False)
+
 
 class Settings(object):
     def __init__(self, filename, case_sensitive):
@@ -184,6 +219,18 @@ class Settings(object):
         self.config.set(SECTION_APPLICATION, 'selected syscalls',
                         ','.join(model.syscalls))
 
+    def get_decoding_profiles(self):
+        """Get the decoding profiles by syscall or category name"""
+        results = {}
+        if self.config.has_section(SECTION_DECODING):
+            for name, value in self.config.items(SECTION_DECODING):
+                try:
+                    results[name] = parse_profile(value)
+                except ValueError:
+                    logging.warning(f'Invalid decoding profile {name}: '
+                                    f'{value}')
+        return results
+
     def get_visible_columns(self, section):
         """Get the visible column list"""
         results = None
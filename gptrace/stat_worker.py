@@ -0,0 +1,99 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+
+import os.path
+import queue
+import threading
+import time
+
+# Seconds before a cached file status gets checked again
+STAT_CACHE_TTL = 5
+# Number of cached files before the expired entries get removed
+STAT_CACHE_SIZE = 16384
+
+
+class StatWorker(object):
+    def __init__(self, callback, ttl=STAT_CACHE_TTL):
+        """Check the files existence in a background thread, firing up the
+        callback with the pid, the file path, its existence and the
+        timestamp of the request"""
+        self.callback = callback
+        self.ttl = ttl
+        self.cache = {}
+        self.requests = queue.Queue()
+        self.thread = None
+
+    def get_cached(self, pid, file_path):
+        """Get the cached existence of a file or None if unknown"""
+        cached = self.cache.get(self.get_full_path(pid, file_path))
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        return None
+
+    def check(self, pid, file_path, timestamp):
+        """Request to check the existence of a file"""
+        if not self.thread:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        self.requests.put((pid, file_path, timestamp))
+
+    def run(self):
+        """Process the requests until the worker is closed"""
+        while True:
+            request = self.requests.get()
+            if request is None:
+                break
+            pid, file_path, timestamp = request
+            self.callback(pid,
+                          file_path,
+                          self.exists(pid, file_path),
+                          timestamp)
+
+    def exists(self, pid, file_path):
+        """Check the existence of a file using the cache"""
+        full_path = self.get_full_path(pid, file_path)
+        now = time.monotonic()
+        cached = self.cache.get(full_path)
+        if cached and cached[1] > now:
+            return cached[0]
+        if len(self.cache) >= STAT_CACHE_SIZE:
+            self.cache = {key: value
+                          for key, value in self.cache.items()
+                          if value[1] > now}
+            if len(self.cache) >= STAT_CACHE_SIZE:
+                self.cache.clear()
+        existing = os.path.exists(full_path)
+        self.cache[full_path] = (existing, now + self.ttl)
+        return existing
+
+    def get_full_path(self, pid, file_path):
+        """Get the path of a file relative to the process working
+        directory"""
+        if os.path.isabs(file_path):
+            return file_path
+        return os.path.join(f'/proc/{pid}/cwd', file_path)
+
+    def close(self):
+        """Wait for the pending requests and stop the worker"""
+        if self.thread:
+            self.requests.put(None)
+            self.thread.join()
+            self.thread = None
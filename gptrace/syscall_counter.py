@@ -0,0 +1,102 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import array
+import time
+
+from ptrace.syscall import SYSCALL_NAMES
+
+from gptrace.event_queue import EVENT_COUNT
+from gptrace.latency_histogram import LatencyHistogram
+from gptrace.models.count_item import CountItem
+
+# Nanoseconds between the updates of the counts
+COUNT_UPDATE_INTERVAL = 500000000
+# Number of syscall numbers in the preallocated arrays
+SYSCALL_NUMBERS = max(SYSCALL_NAMES) + 1
+
+
+class SyscallCounter(object):
+    def __init__(self, syscalls, callback):
+        """Aggregate the syscall numbers and durations without decoding
+        the syscalls, firing up the callback with the updated counts"""
+        self.event_callback = callback
+        # Every array is indexed by the syscall number
+        self.selected = None
+        self.set_syscalls(syscalls)
+        self.counts = array.array('Q', bytes(8 * SYSCALL_NUMBERS))
+        self.histograms = [None] * SYSCALL_NUMBERS
+        self.changed = bytearray(SYSCALL_NUMBERS)
+        # Syscall number and enter time of each process inside a syscall
+        self.numbers = {}
+        self.enter_times = {}
+        self.update_time = time.monotonic_ns()
+
+    def set_syscalls(self, syscalls):
+        """Select the syscalls to count"""
+        selected = bytearray(SYSCALL_NUMBERS)
+        for number, name in SYSCALL_NAMES.items():
+            if name in syscalls:
+                selected[number] = 1
+        self.selected = selected
+
+    def enter(self, pid, number):
+        """A process is entering a syscall"""
+        self.numbers[pid] = number
+        self.enter_times[pid] = time.monotonic_ns()
+
+    def exit(self, pid):
+        """A process has exited its syscall"""
+        timestamp = time.monotonic_ns()
+        number = self.numbers.pop(pid, -1)
+        enter_time = self.enter_times.pop(pid, None)
+        if 0 <= number < SYSCALL_NUMBERS and self.selected[number]:
+            self.counts[number] += 1
+            if enter_time is not None:
+                histogram = self.histograms[number]
+                if histogram is None:
+                    histogram = LatencyHistogram()
+                    self.histograms[number] = histogram
+                histogram.add(timestamp - enter_time)
+            self.changed[number] = 1
+        if timestamp - self.update_time >= COUNT_UPDATE_INTERVAL:
+            self.update()
+
+    def remove_process(self, pid):
+        """A process has exited, counting its syscall without a return"""
+        number = self.numbers.pop(pid, -1)
+        self.enter_times.pop(pid, None)
+        if 0 <= number < SYSCALL_NUMBERS and self.selected[number]:
+            self.counts[number] += 1
+            self.changed[number] = 1
+
+    def update(self):
+        """Fire up the callback with the counts changed since the last
+        update"""
+        self.update_time = time.monotonic_ns()
+        number = self.changed.find(1)
+        while number >= 0:
+            self.changed[number] = 0
+            self.event_callback(EVENT_COUNT, CountItem(
+                syscall=SYSCALL_NAMES[number],
+                count=self.counts[number],
+                visibility=True,
+                histogram=self.histograms[number]))
+            number = self.changed.find(1, number + 1)
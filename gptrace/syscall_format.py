@@ -0,0 +1,105 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import errno
+import functools
+
+from ptrace.ctypes_tools import formatAddress
+from ptrace.func_call import FunctionCall, FunctionCallOptions
+from ptrace.syscall import SyscallArgument
+
+from gptrace.decoding_profiles import BUFFER_ARGUMENTS
+
+# Number of rendered syscalls to keep in memory
+FORMAT_CACHE_SIZE = 4096
+
+FORMAT_OPTIONS = FunctionCallOptions(
+    write_types=True,
+    write_argname=True,
+    replace_socketcall=False,
+    string_max_length=300,
+    write_address=False,
+    max_array_count=20,
+)
+
+
+def needs_process_memory(argument):
+    """Check if the argument text must be read from the traced process"""
+    return (not argument.type or
+            not argument.name or
+            '*' in argument.type or
+            '[' in argument.type or
+            argument.text is not None)
+
+
+def read_argument_text(argument, capture_buffers):
+    """Read the argument text from the traced process memory, showing
+    only the address of the buffers when they are not captured"""
+    if (not capture_buffers and
+            argument.text is None and
+            argument.name in BUFFER_ARGUMENTS):
+        return formatAddress(argument.value)
+    return argument.getText()
+
+
+def read_syscall_arguments(syscall):
+    """
+    Extract the raw arguments from a syscall, reading only the values
+    which require the traced process memory
+    """
+    capture_buffers = getattr(syscall.options, 'capture_buffers', True)
+    return (syscall.restype,
+            tuple((argument.name,
+                   argument.type,
+                   argument.value,
+                   read_argument_text(argument, capture_buffers)
+                   if needs_process_memory(argument)
+                   else None)
+                  for argument in syscall.arguments))
+
+
+def render_syscall(name, arguments):
+    """Render the syscall with its raw arguments"""
+    restype, values = arguments
+    function = FunctionCall(name, FORMAT_OPTIONS, SyscallArgument)
+    function.restype = restype
+    function.process = None
+    for argument_name, argument_type, value, text in values:
+        function.addArgument(value=value,
+                             name=argument_name,
+                             type=argument_type)
+        function.arguments[-1].text = text
+    return function.format()
+
+
+@functools.lru_cache(maxsize=FORMAT_CACHE_SIZE)
+def format_syscall(name, arguments):
+    """Render the syscall with its raw arguments, caching the latest ones
+    shown"""
+    return render_syscall(name, arguments)
+
+
+def format_result(result):
+    """Render a syscall result with the name of its error"""
+    if result is None:
+        return ''
+    elif result < 0 and -result in errno.errorcode:
+        return f'{result} {errno.errorcode[-result]}'
+    return str(result)
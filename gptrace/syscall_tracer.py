@@ -19,21 +19,34 @@
 ##
 
 import logging
+import os
+import time
 
 from ptrace import PtraceError
-from ptrace.debugger import (PtraceDebugger,
-                             Application,
+from ptrace.debugger import (Application,
                              ProcessExit,
                              ProcessSignal,
                              NewProcessEvent,
                              ProcessExecution,
                              ChildError)
-from ptrace.func_call import FunctionCallOptions
+from ptrace.syscall.ptrace_syscall import SYSCALL_REGISTER
+
+from gptrace.decoding_profiles import DecodingProfiles
+from gptrace.debugger import (find_processes,
+                              list_threads,
+                              AttachEvent,
+                              DebuggerWakeup,
+                              InterruptEvent,
+                              SeccompEvent,
+                              StartEvent,
+                              TracerDebugger)
+from gptrace.seccomp_filter import create_child, is_seccomp_available
 
 
 class SyscallTracer(Application):
     def __init__(self, options, program, ignore_syscall_callback,
-                 syscall_callback, event_callback, quit_callback):
+                 syscall_callback, event_callback, quit_callback,
+                 counter=None):
         logging.info(f'Starting debug for: {program}')
         Application.__init__(self)
         # Parse self.options
@@ -41,51 +54,146 @@ class SyscallTracer(Application):
         self.program = program
         self.debugger = None
         self.syscall_options = None
+        self.profiles = None
+        self.use_seccomp = False
+        self.stop_requested = False
         self.processOptions()
         self.ignore_syscall_callback = ignore_syscall_callback
         self.syscall_callback = syscall_callback
         self.event_callback = event_callback
         self.quit_callback = quit_callback
+        # Count the syscalls without decoding them
+        self.counter = counter
 
     def run_debugger(self):
         """Create debugger and traced process"""
         logging.info('Started debugger')
         self.setupDebugger()
-        process = self.createProcess()
-        if not process:
-            return
+        attach = bool(self.options.pid or self.options.process_names)
+        if self.options.seccomp:
+            if attach:
+                logging.warning('Seccomp filtering is not available for the '
+                                'attached processes, every syscall will be '
+                                'traced')
+            elif is_seccomp_available():
+                # Stop only for the selected syscalls
+                self.use_seccomp = True
+                self.debugger.traceSeccomp()
+            else:
+                logging.warning('Seccomp filtering is not available, '
+                                'every syscall will be traced')
+        if attach:
+            processes = self.attach_processes()
+            if not processes:
+                logging.error('No process to attach')
+                return
+        else:
+            process = self.createProcess()
+            if not process:
+                return
+            self.event_callback(StartEvent(process))
+            processes = [process]
+
+        self.profiles = DecodingProfiles(
+            profiles=getattr(self.options, 'decoding', None),
+            instr_pointer=self.options.show_ip)
+        self.syscall_options = self.profiles.default
+        self.syscall_trace(processes)
+
+    def get_attach_targets(self):
+        """Get the (pid, is_thread) tuples of the processes to attach"""
+        pids = list(self.options.pid or [])
+        for name in self.options.process_names or []:
+            pids.extend(find_processes(name))
+        targets = []
+        # Skip the duplicated processes and the tracer itself
+        for pid in dict.fromkeys(pids):
+            if pid != os.getpid():
+                targets.append((pid, False))
+                if self.options.threads:
+                    targets.extend((tid, True)
+                                   for tid in list_threads(pid)
+                                   if tid != pid)
+        return targets
 
-        self.syscall_options = FunctionCallOptions(
-            write_types=True,
-            write_argname=True,
-            replace_socketcall=False,
-            string_max_length=300,
-            write_address=False,
-            max_array_count=20,
-        )
-        self.syscall_options.instr_pointer = self.options.show_ip
-        self.syscall_trace(process)
+    def attach_processes(self):
+        """Attach the running processes"""
+        targets = self.get_attach_targets()
+        while targets:
+            self.debugger.seizeProcesses(targets)
+            # Attach the threads created during the attach
+            targets = [(pid, is_thread)
+                       for pid, is_thread in self.get_attach_targets()
+                       if is_thread and pid not in self.debugger.dict]
+        for process in self.debugger.list:
+            if not process.is_thread:
+                self.event_callback(AttachEvent(process))
+        return list(self.debugger.list)
+
+    def createChild(self, arguments, env=None):
+        """Create the traced process, filtering its syscalls if requested"""
+        if self.use_seccomp:
+            return create_child(arguments,
+                                self.options.no_stdout,
+                                self.options.syscalls)
+        return Application.createChild(self, arguments, env)
+
+    def resume(self, process, signum=0):
+        """Restart a stopped process until its next traced event"""
+        if (self.use_seccomp and
+                process.syscall_state.next_event != 'exit'):
+            # The seccomp filter will stop the process at the next
+            # selected syscall
+            process.cont(signum)
+        else:
+            # Break at next syscall
+            process.syscall(signum)
 
     def display_syscall(self, syscall):
         self.syscall_callback(syscall)
 
     def syscall(self, process):
+        if self.counter:
+            self.count_syscall(process)
+            return
         state = process.syscall_state
+        entering = state.next_event == 'enter'
+        # The syscall duration excludes the decoding of its arguments
+        timestamp = time.monotonic_ns()
         syscall = state.event(self.syscall_options)
+        if syscall and not entering:
+            syscall.exit_time = timestamp
         if syscall and (syscall.result is not None or self.options.enter):
             self.display_syscall(syscall)
-        # Break at next syscall
-        process.syscall()
+        if syscall and entering:
+            syscall.enter_time = time.monotonic_ns()
+        self.resume(process)
 
-    def syscall_trace(self, process):
+    def count_syscall(self, process):
+        """Count the syscall reading only its number from the registers"""
+        state = process.syscall_state
+        if state.next_event == 'enter':
+            self.counter.enter(process.pid,
+                               process.getreg(SYSCALL_REGISTER))
+            state.next_event = 'exit'
+        else:
+            self.counter.exit(process.pid)
+            state.next_event = 'enter'
+        self.resume(process)
+
+    def syscall_trace(self, processes):
         # First query to break at next syscall
-        self.process_prepare(process)
+        for process in processes:
+            self.process_prepare(process)
 
         while True:
             # No more process? Exit
             if not self.debugger:
                 logging.debug('The debugger has exited')
                 break
+            if self.stop_requested:
+                logging.debug('The debugger was stopped')
+                break
             # Wait until next syscall enter
             try:
                 event = self.debugger.waitSyscall()
@@ -94,22 +202,34 @@ class SyscallTracer(Application):
                 logging.debug('A process has exited')
                 self.process_exited(event)
                 continue
+            except SeccompEvent as event:
+                # A selected syscall is being entered
+                process = event.process
+            except InterruptEvent as event:
+                if event.is_group_stop():
+                    # Leave the attached process stopped by the signal
+                    event.process.listen()
+                else:
+                    self.resume(event.process)
+                continue
+            except DebuggerWakeup:
+                continue
             except ProcessSignal as event:
                 self.event_callback(event)
                 # event.display()
-                process.syscall(event.signum)
+                self.resume(event.process, event.signum)
                 continue
             except NewProcessEvent as event:
                 logging.debug('A new process is spawned')
                 self.event_callback(event)
                 process = event.process
                 self.process_prepare(process)
-                process.parent.syscall()
+                self.resume(process.parent)
                 continue
             except ProcessExecution as event:
                 self.event_callback(event)
                 process = event.process
-                process.syscall()
+                self.resume(process)
                 continue
             except IndexError as error:
                 logging.error(f'IndexError: {error}')
@@ -119,19 +239,29 @@ class SyscallTracer(Application):
             self.syscall(process)
 
     def process_prepare(self, process):
-        process.syscall()
-        process.syscall_state.ignore_callback = self.ignore_syscall_callback
+        self.resume(process)
+        process.syscall_state.ignore_callback = self.prepare_syscall
+
+    def prepare_syscall(self, syscall):
+        """Select the decoding profile of a syscall being entered, returning
+        True to ignore the syscall"""
+        if self.ignore_syscall_callback(syscall):
+            return True
+        syscall.options = self.profiles.get_profile(syscall.name)
+        return False
 
     def process_exited(self, event):
         # Display syscall which has not exited
         state = event.process.syscall_state
-        if (state.next_event == "exit") and (
+        if self.counter:
+            self.counter.remove_process(event.process.pid)
+        elif (state.next_event == "exit") and (
                 not self.options.enter) and state.syscall:
             self.display_syscall(state.syscall)
         self.event_callback(event)
 
     def main(self):
-        self.debugger = PtraceDebugger()
+        self.debugger = TracerDebugger()
         try:
             self.run_debugger()
         except ChildError as event:
@@ -142,8 +272,16 @@ class SyscallTracer(Application):
             self._handle_exceptions_during_quit(error, 'main')
         if self.debugger:
             self.debugger.quit()
+        if self.counter:
+            self.counter.update()
         self.quit_callback()
 
+    def stop(self):
+        """Stop the tracing from another thread"""
+        self.stop_requested = True
+        if self.debugger:
+            self.debugger.wakeup()
+
     def quit(self):
         try:
             self.debugger.quit()
@@ -0,0 +1,489 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import datetime
+import os
+import sys
+import zlib
+
+from gptrace.event_queue import (EVENT_ACTIVITIES,
+                                 EVENT_COUNT,
+                                 EVENT_FILE,
+                                 EVENT_IO,
+                                 EVENT_NETWORK,
+                                 EVENT_PROCESS,
+                                 EVENT_PROCESS_NODE,
+                                 EVENT_SYSCALL)
+from gptrace.latency_histogram import LatencyHistogram
+from gptrace.models.activities_block import ActivitiesBlock
+from gptrace.models.count_item import CountItem
+from gptrace.models.file_item import FileItem
+from gptrace.models.io_item import IOItem
+from gptrace.models.network_item import NetworkItem
+from gptrace.models.process_item import ProcessItem
+from gptrace.models.process_node_item import ProcessNodeItem
+
+TRACE_FILE_MAGIC = b'GPTRACE\0'
+TRACE_FILE_VERSION = 12
+# Size of the uncompressed records before a block gets written
+BLOCK_SIZE = 1024 * 1024
+
+RECORD_STRING = 0
+RECORD_ACTIVITIES = 1
+RECORD_FILE = 2
+RECORD_PROCESS = 3
+RECORD_IO = 4
+RECORD_PROCESS_NODE = 5
+RECORD_COUNT = 6
+RECORD_NETWORK = 7
+# The activities are stored by column as little endian arrays
+ACTIVITIES_COLUMNS = ('timestamps', 'pids', 'ips', 'durations', 'results',
+                      'syscalls', 'paths', 'offsets')
+ACTIVITY_SIZE = 48
+BIG_ENDIAN = sys.byteorder == 'big'
+
+
+class TraceFileError(Exception):
+    pass
+
+
+def write_varint(buffer, value):
+    """Append an unsigned integer to the buffer using 7 bits per byte"""
+    while value > 0x7f:
+        buffer.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def write_signed(buffer, value):
+    """Append a signed integer to the buffer using the zigzag encoding"""
+    write_varint(buffer, (value << 1) ^ (value >> 63))
+
+
+def read_varint(data, position):
+    """Read an unsigned integer returning its value and the next position"""
+    result = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+
+def read_file_varint(file):
+    """Read an unsigned integer from a file, None at the end of the file"""
+    result = 0
+    shift = 0
+    while True:
+        byte = file.read(1)
+        if not byte:
+            return None
+        result |= (byte[0] & 0x7f) << shift
+        if byte[0] < 0x80:
+            return result
+        shift += 7
+
+
+def read_signed(data, position):
+    """Read a zigzag encoded integer returning its value and the next
+    position"""
+    value, position = read_varint(data, position)
+    return (value >> 1) ^ -(value & 1), position
+
+
+def write_histogram(buffer, histogram):
+    """Append a latency histogram"""
+    write_varint(buffer, histogram.count)
+    write_varint(buffer, histogram.total)
+    write_varint(buffer, histogram.maximum)
+    write_varint(buffer, len(histogram.buckets))
+    for count in histogram.buckets:
+        write_varint(buffer, count)
+
+
+def read_histogram(data, position):
+    """Read a latency histogram returning it and the next position"""
+    histogram = LatencyHistogram()
+    histogram.count, position = read_varint(data, position)
+    histogram.total, position = read_varint(data, position)
+    histogram.maximum, position = read_varint(data, position)
+    length, position = read_varint(data, position)
+    for _ in range(length):
+        value, position = read_varint(data, position)
+        histogram.buckets.append(value)
+    return histogram, position
+
+
+class TraceWriter(object):
+    def __init__(self, filename, start_time):
+        """Record the traced events to an append-only binary file"""
+        self.file = open(filename, 'wb')
+        self.start_time = start_time
+        self.strings = {}
+        self.buffer = bytearray()
+        # The activities are written by column when the block is complete
+        self.activities = ActivitiesBlock(strings=None)
+        self.last_timestamp = 0
+        # Write the file header with the session start time in microseconds
+        header = bytearray(TRACE_FILE_MAGIC)
+        header.append(TRACE_FILE_VERSION)
+        write_varint(header, round(start_time.timestamp() * 1000000))
+        self.file.write(header)
+        self.events_handlers = {
+            EVENT_SYSCALL: self.write_syscall,
+            EVENT_COUNT: self.write_count,
+            EVENT_FILE: self.write_file,
+            EVENT_PROCESS: self.write_process,
+            EVENT_IO: self.write_io,
+            EVENT_PROCESS_NODE: self.write_process_node,
+            EVENT_NETWORK: self.write_network,
+        }
+
+    def write(self, kind, item):
+        """Record a traced event"""
+        self.events_handlers[kind](item)
+        if (len(self.buffer) +
+                len(self.activities) * ACTIVITY_SIZE +
+                len(self.activities.arguments) >= BLOCK_SIZE):
+            self.flush()
+
+    def write_string(self, value):
+        """Append a length-prefixed string"""
+        data = value.encode('utf-8', 'replace')
+        write_varint(self.buffer, len(data))
+        self.buffer += data
+
+    def intern(self, value):
+        """Get the identifier of an interned string, defining it the first
+        time it's used"""
+        identifier = self.strings.get(value)
+        if identifier is None:
+            identifier = len(self.strings)
+            self.strings[value] = identifier
+            self.buffer.append(RECORD_STRING)
+            self.write_string(value)
+        return identifier
+
+    def intern_optional(self, value):
+        """Get the identifier of an interned string or None, using zero
+        for the missing values"""
+        return 0 if value is None else self.intern(value) + 1
+
+    def write_timestamp(self, timestamp):
+        """Append the timestamp as the zigzag encoded delta in nanoseconds
+        from the previous one"""
+        write_signed(self.buffer, timestamp - self.last_timestamp)
+        self.last_timestamp = timestamp
+
+    def write_syscall(self, item):
+        """Record a syscall activity"""
+        # The interned string definitions must precede the activities
+        self.activities.append(item,
+                               self.intern(item.syscall),
+                               self.intern_optional(item.path))
+
+    def write_activities(self):
+        """Record the pending activities by column"""
+        activities = self.activities
+        self.buffer.append(RECORD_ACTIVITIES)
+        write_varint(self.buffer, len(activities))
+        write_varint(self.buffer, len(activities.arguments))
+        for name in ACTIVITIES_COLUMNS:
+            values = getattr(activities, name)
+            if BIG_ENDIAN:
+                values = values[:]
+                values.byteswap()
+            self.buffer += values.tobytes()
+        self.buffer += activities.arguments
+        write_varint(self.buffer, len(activities.histograms))
+        for syscall, histogram in activities.histograms.items():
+            write_varint(self.buffer, syscall)
+            write_histogram(self.buffer, histogram)
+        activities.clear()
+
+    def write_count(self, item):
+        """Record the count and the durations of a syscall counted without
+        decoding it"""
+        syscall = self.intern(item.syscall)
+        self.buffer.append(RECORD_COUNT)
+        write_varint(self.buffer, syscall)
+        write_varint(self.buffer, item.count)
+        histogram = item.histogram
+        if histogram is None:
+            self.buffer.append(0)
+        else:
+            self.buffer.append(1)
+            write_histogram(self.buffer, histogram)
+
+    def write_file(self, item):
+        """Record a file used by a process"""
+        self.buffer.append(RECORD_FILE)
+        write_varint(self.buffer, int(item.pid))
+        self.write_timestamp(item.timestamp)
+        self.buffer.append(1 if item.existing else 0)
+        self.write_string(item.file_path)
+
+    def write_process(self, item):
+        """Record a process information"""
+        information = self.intern(item.information)
+        self.buffer.append(RECORD_PROCESS)
+        write_varint(self.buffer, int(item.pid))
+        self.write_timestamp(item.timestamp)
+        write_varint(self.buffer, information)
+        self.write_string(item.value)
+
+    def write_io(self, item):
+        """Record the I/O totals of a file used by a process"""
+        self.buffer.append(RECORD_IO)
+        write_varint(self.buffer, int(item.pid))
+        write_varint(self.buffer, item.read)
+        write_varint(self.buffer, item.written)
+        self.write_string(item.file_path)
+
+    def write_network(self, item):
+        """Record the network totals of a connection used by a process"""
+        peer = self.intern(item.peer)
+        local = self.intern_optional(item.local)
+        self.buffer.append(RECORD_NETWORK)
+        write_varint(self.buffer, int(item.pid))
+        write_varint(self.buffer, item.calls)
+        write_varint(self.buffer, item.sent)
+        write_varint(self.buffer, item.received)
+        write_varint(self.buffer, peer)
+        write_varint(self.buffer, local)
+
+    def write_process_node(self, item):
+        """Record the start or the exit of a process"""
+        self.buffer.append(RECORD_PROCESS_NODE)
+        write_varint(self.buffer, int(item.pid))
+        # Zero is for the processes without a traced parent
+        write_varint(self.buffer, int(item.parent) if item.parent else 0)
+        self.write_timestamp(item.timestamp)
+        if item.status is None:
+            self.buffer.append(0)
+        else:
+            self.buffer.append(1)
+            self.write_string(item.status)
+            write_varint(self.buffer, item.cpu_time)
+            write_varint(self.buffer, item.max_rss)
+            write_varint(self.buffer, item.switches)
+
+    def flush(self):
+        """Write the pending records as a compressed block"""
+        if self.activities:
+            self.write_activities()
+        if self.buffer:
+            data = zlib.compress(self.buffer, 1)
+            header = bytearray()
+            write_varint(header, len(data))
+            self.file.write(header)
+            self.file.write(data)
+            self.file.flush()
+            self.buffer.clear()
+
+    def close(self):
+        """Write the pending records and close the file"""
+        self.flush()
+        self.file.close()
+
+
+class TraceReader(object):
+    def __init__(self, filename):
+        """Read the events from a recorded trace file"""
+        self.filename = filename
+        self.start_time = None
+        self.strings = []
+        self.last_timestamp = 0
+
+    def __iter__(self):
+        """Iterate the recorded events as (kind, item) tuples, reading a
+        block at once"""
+        with open(self.filename, 'rb') as file:
+            header = file.read(len(TRACE_FILE_MAGIC) + 1)
+            if header != TRACE_FILE_MAGIC + bytes((TRACE_FILE_VERSION, )):
+                raise TraceFileError(f'{self.filename} is not a valid trace '
+                                     f'file')
+            self.strings = []
+            self.last_timestamp = 0
+            start_time = read_file_varint(file)
+            try:
+                self.start_time = datetime.datetime.fromtimestamp(
+                    start_time / 1000000)
+            except (TypeError, ValueError, OverflowError, OSError) as error:
+                raise TraceFileError(f'Invalid start time in '
+                                     f'{self.filename}: {error}')
+            while True:
+                size = read_file_varint(file)
+                if (size is None or
+                        size > os.fstat(file.fileno()).st_size - file.tell()):
+                    # Incomplete block from an interrupted recording
+                    break
+                block = file.read(size)
+                try:
+                    block = zlib.decompress(block)
+                except zlib.error as error:
+                    raise TraceFileError(f'Corrupted block in '
+                                         f'{self.filename}: {error}')
+                try:
+                    yield from self.read_block(block)
+                except (IndexError, ValueError) as error:
+                    # Corrupted records, including the invalid strings
+                    raise TraceFileError(f'Corrupted records in '
+                                         f'{self.filename}: {error}')
+
+    def read_block(self, data):
+        """Iterate the events contained in an uncompressed block"""
+        # The strings and the timestamps continue across the blocks
+        strings = self.strings
+        position = 0
+        size = len(data)
+        while position < size:
+            record = data[position]
+            position += 1
+            if record == RECORD_STRING:
+                length, position = read_varint(data, position)
+                strings.append(
+                    data[position:position + length].decode('utf-8'))
+                position += length
+            elif record == RECORD_ACTIVITIES:
+                count, position = read_varint(data, position)
+                length, position = read_varint(data, position)
+                activities = ActivitiesBlock(strings=strings)
+                # Load the columns in bulk
+                for name in ACTIVITIES_COLUMNS:
+                    values = getattr(activities, name)
+                    end = position + count * values.itemsize
+                    if end > size:
+                        raise TraceFileError(f'Truncated activities in '
+                                             f'{self.filename}')
+                    values.frombytes(data[position:end])
+                    if BIG_ENDIAN:
+                        values.byteswap()
+                    position = end
+                activities.arguments = data[position:position + length]
+                position += length
+                histograms, position = read_varint(data, position)
+                for _ in range(histograms):
+                    syscall, position = read_varint(data, position)
+                    activities.histograms[syscall], position = (
+                        read_histogram(data, position))
+                # The strings and the arguments are used only later
+                if (position > size or
+                        max(activities.histograms, default=-1) >= len(strings)
+                        or count and (
+                            max(activities.syscalls) >= len(strings) or
+                            max(activities.paths) > len(strings) or
+                            max(activities.offsets) > len(
+                                activities.arguments))):
+                    raise TraceFileError(f'Invalid activities in '
+                                         f'{self.filename}')
+                yield EVENT_ACTIVITIES, activities
+            elif record == RECORD_FILE:
+                pid, position = read_varint(data, position)
+                timestamp, position = self.read_timestamp(data, position)
+                existing = bool(data[position])
+                length, position = read_varint(data, position + 1)
+                yield EVENT_FILE, FileItem(
+                    pid=str(pid),
+                    file_path=data[position:position + length].decode(
+                        'utf-8'),
+                    existing=existing,
+                    timestamp=timestamp)
+                position += length
+            elif record == RECORD_PROCESS:
+                pid, position = read_varint(data, position)
+                timestamp, position = self.read_timestamp(data, position)
+                information, position = read_varint(data, position)
+                length, position = read_varint(data, position)
+                yield EVENT_PROCESS, ProcessItem(
+                    pid=str(pid),
+                    timestamp=timestamp,
+                    information=strings[information],
+                    value=data[position:position + length].decode('utf-8'))
+                position += length
+            elif record == RECORD_IO:
+                pid, position = read_varint(data, position)
+                read, position = read_varint(data, position)
+                written, position = read_varint(data, position)
+                length, position = read_varint(data, position)
+                yield EVENT_IO, IOItem(
+                    pid=str(pid),
+                    file_path=data[position:position + length].decode(
+                        'utf-8'),
+                    read=read,
+                    written=written)
+                position += length
+            elif record == RECORD_NETWORK:
+                pid, position = read_varint(data, position)
+                calls, position = read_varint(data, position)
+                sent, position = read_varint(data, position)
+                received, position = read_varint(data, position)
+                peer, position = read_varint(data, position)
+                local, position = read_varint(data, position)
+                yield EVENT_NETWORK, NetworkItem(
+                    pid=str(pid),
+                    peer=strings[peer],
+                    local=strings[local - 1] if local else None,
+                    calls=calls,
+                    sent=sent,
+                    received=received)
+            elif record == RECORD_PROCESS_NODE:
+                pid, position = read_varint(data, position)
+                parent, position = read_varint(data, position)
+                timestamp, position = self.read_timestamp(data, position)
+                item = ProcessNodeItem(pid=str(pid),
+                                       parent=str(parent) if parent else None,
+                                       timestamp=timestamp)
+                if data[position]:
+                    length, position = read_varint(data, position + 1)
+                    item.status = data[position:position + length].decode(
+                        'utf-8')
+                    position += length
+                    item.cpu_time, position = read_varint(data, position)
+                    item.max_rss, position = read_varint(data, position)
+                    item.switches, position = read_varint(data, position)
+                else:
+                    position += 1
+                yield EVENT_PROCESS_NODE, item
+            elif record == RECORD_COUNT:
+                syscall, position = read_varint(data, position)
+                count, position = read_varint(data, position)
+                item = CountItem(syscall=strings[syscall],
+                                 count=count,
+                                 visibility=True)
+                if data[position]:
+                    item.histogram, position = read_histogram(data,
+                                                              position + 1)
+                else:
+                    position += 1
+                yield EVENT_COUNT, item
+            else:
+                raise TraceFileError(f'Unknown record {record} '
+                                     f'in {self.filename}')
+
+    def read_timestamp(self, data, position):
+        """Read a zigzag encoded timestamp delta, returning the timestamp
+        in nanoseconds and the next position"""
+        delta, position = read_signed(data, position)
+        self.last_timestamp += delta
+        return self.last_timestamp, position
@@ -0,0 +1,240 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+
+import logging
+import multiprocessing
+import queue
+import threading
+
+from gptrace.event_collector import EventCollector
+from gptrace.event_queue import EventRing
+from gptrace.event_tracer import EventTracer
+from gptrace.syscall_counter import SyscallCounter
+from gptrace.syscall_tracer import SyscallTracer
+from gptrace.trace_file import TraceWriter
+
+COMMAND_START = 'start'
+COMMAND_STOP = 'stop'
+COMMAND_SYSCALLS = 'syscalls'
+COMMAND_QUIT = 'quit'
+MESSAGE_FINISHED = 'finished'
+
+# Seconds to wait for the tracer process to quit before killing it
+QUIT_TIMEOUT = 5
+
+
+class TracerService(object):
+    def __init__(self):
+        """Run the tracer in a dedicated process, which publishes the events
+        in a shared memory ring and receives the commands from a control
+        channel"""
+        # The tracer process must not inherit the GTK+ main loop
+        context = multiprocessing.get_context('spawn')
+        self.events = EventRing(context)
+        self.connection, connection = context.Pipe()
+        self.process = context.Process(
+            target=run_tracer_worker,
+            args=(self.events,
+                  connection,
+                  logging.getLogger().getEffectiveLevel()),
+            daemon=True)
+        self.process.start()
+        connection.close()
+        self.running = False
+        self.exited = False
+        # Messages for the commands failed for the tracer process exit
+        self.messages = []
+
+    def send(self, command, arguments):
+        """Send a command to the tracer process"""
+        try:
+            self.connection.send((command, arguments))
+        except (OSError, EOFError):
+            self.set_exited()
+
+    def set_exited(self):
+        """The tracer process has died, finishing the running trace"""
+        logging.error('the tracer process has exited unexpectedly')
+        self.exited = True
+        if self.running:
+            self.running = False
+            self.messages.append(MESSAGE_FINISHED)
+
+    def start(self, program, options, clock):
+        """Start to trace a program"""
+        self.running = True
+        self.send(COMMAND_START, (program, options, clock))
+
+    def stop(self):
+        """Stop the running trace"""
+        self.send(COMMAND_STOP, None)
+
+    def set_syscalls(self, syscalls):
+        """Change the syscalls selected for the running trace"""
+        self.send(COMMAND_SYSCALLS, syscalls)
+
+    def get_messages(self):
+        """Get the messages sent by the tracer process"""
+        messages = self.messages
+        self.messages = []
+        try:
+            while self.connection.poll():
+                message = self.connection.recv()
+                if message == MESSAGE_FINISHED:
+                    self.running = False
+                messages.append(message)
+        except (OSError, EOFError):
+            self.set_exited()
+            messages.extend(self.messages)
+            self.messages = []
+        return messages
+
+    def quit(self):
+        """Stop the running trace and close the tracer process"""
+        try:
+            self.connection.send((COMMAND_QUIT, None))
+        except OSError:
+            pass
+        for _ in range(QUIT_TIMEOUT * 10):
+            if not self.process.is_alive():
+                break
+            # Consume the pending events to unblock the tracer process
+            self.events.clear()
+            self.process.join(0.1)
+        else:
+            logging.warning('killing the tracer process')
+            self.process.kill()
+        self.connection.close()
+        self.running = False
+
+
+class TracerWorker(object):
+    def __init__(self, events, connection):
+        """Trace the programs requested from the control channel"""
+        self.events = events
+        self.connection = connection
+        self.commands = queue.Queue()
+        self.tracer = None
+        self.recorder = None
+        # The syscalls selection can change during the trace
+        self.syscalls = None
+        self.collector = None
+        self.counter = None
+
+    def run(self):
+        """Process the start commands until the quit command"""
+        threading.Thread(target=self.read_commands, daemon=True).start()
+        for program, options, clock in iter(self.commands.get, None):
+            self.trace(program, options, clock)
+            self.connection.send(MESSAGE_FINISHED)
+
+    def read_commands(self):
+        """Read the commands from the control channel"""
+        while True:
+            try:
+                command, arguments = self.connection.recv()
+            except EOFError:
+                # The main process has exited
+                command, arguments = COMMAND_QUIT, None
+            if command == COMMAND_START:
+                self.syscalls = arguments[1].syscalls
+                self.commands.put(arguments)
+            elif command == COMMAND_SYSCALLS:
+                self.set_syscalls(arguments)
+            elif command in (COMMAND_STOP, COMMAND_QUIT):
+                tracer = self.tracer
+                if tracer:
+                    logging.info('stop the debugger')
+                    tracer.stop()
+                if command == COMMAND_QUIT:
+                    self.commands.put(None)
+                    break
+
+    def trace(self, program, options, clock):
+        """Debug the requested program to trace the syscalls"""
+        logging.info(f'starting debug for program: {program}')
+        record = getattr(options, 'record', None)
+        if record:
+            # Record the trace here to not slow down the main loop
+            try:
+                self.recorder = TraceWriter(filename=record,
+                                            start_time=clock.start_time)
+            except OSError as error:
+                logging.error(f'Unable to record the trace {record}: '
+                              f'{error}')
+        collector = EventCollector(syscalls=self.syscalls,
+                                   callback=self.publish,
+                                   clock=clock)
+        event_tracer = EventTracer(
+            callback=collector.add_process,
+            process_callback=collector.handle_process_event,
+            clock=collector.clock)
+        counter = (SyscallCounter(syscalls=self.syscalls,
+                                  callback=collector.emit)
+                   if options.counts_only else None)
+        self.collector = collector
+        self.counter = counter
+        # Apply the selection changed while preparing the trace
+        self.set_syscalls(self.syscalls)
+        self.tracer = SyscallTracer(
+            options=options,
+            program=program,
+            ignore_syscall_callback=collector.ignore_syscall,
+            syscall_callback=collector.add_syscall,
+            event_callback=event_tracer.handle_event,
+            quit_callback=self.do_quit_callback,
+            counter=counter)
+        self.tracer.main()
+        self.tracer = None
+        self.collector = None
+        self.counter = None
+        event_tracer.close()
+        collector.close()
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+
+    def set_syscalls(self, syscalls):
+        """Change the syscalls selected for the running trace, the seccomp
+        filter still stops only for the syscalls selected at the start"""
+        self.syscalls = syscalls
+        collector = self.collector
+        if collector:
+            collector.syscalls = syscalls
+        counter = self.counter
+        if counter:
+            counter.set_syscalls(syscalls)
+
+    def publish(self, kind, item):
+        """Publish an event to the main process, recording it"""
+        if self.recorder:
+            self.recorder.write(kind, item)
+        self.events.append(kind, item)
+
+    def do_quit_callback(self):
+        """The debugger is quitting"""
+        logging.debug('the debugger is quitting')
+
+
+def run_tracer_worker(events, connection, log_level):
+    """Entry point of the tracer process"""
+    logging.basicConfig(level=log_level)
+    TracerWorker(events=events, connection=connection).run()
@@ -18,54 +18,85 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 ##
 
-import datetime
+import bisect
+import itertools
 import logging
 import optparse
-import os.path
 import shlex
 import typing
 
-from gi.repository import GObject
+from gi.repository import GLib
 from gi.repository import Gdk
 from gi.repository import Gtk
-from ptrace.ctypes_tools import formatAddress
 from ptrace.syscall import (SYSCALL_NAMES,
                             SYSCALL_PROTOTYPES,
                             FILENAME_ARGUMENTS,
                             SOCKET_SYSCALL_NAMES)
 
+from gptrace.activities_filter import (FilterError,
+                                       compile_terms,
+                                       get_changed_rows,
+                                       parse_filter)
 from gptrace.constants import APP_NAME, FILE_ICON, FILE_SETTINGS
-from gptrace.daemon_thread import DaemonThread
-from gptrace.event_tracer import EventTracer
+from gptrace.event_queue import (EVENT_ACTIVITIES,
+                                 EVENT_COUNT,
+                                 EVENT_FILE,
+                                 EVENT_IO,
+                                 EVENT_NETWORK,
+                                 EVENT_PROCESS,
+                                 EVENT_PROCESS_NODE,
+                                 EVENT_SYSCALL)
 from gptrace.functions import (find_button_from_gtktreeviewcolumn,
                                process_events,
-                               show_dialog_fileopen)
+                               show_dialog_fileopen,
+                               show_dialog_filesave)
 from gptrace.localize import _
-from gptrace.models.activity_item import ActivityItem
 from gptrace.models.activities import ModelActivities
+from gptrace.models.activities_store import ActivitiesStore
 from gptrace.models.count_item import CountItem
 from gptrace.models.counts import ModelCounts
-from gptrace.models.file_item import FileItem
+from gptrace.models.errors import ModelErrors, is_error
 from gptrace.models.files import ModelFiles
-from gptrace.models.process_item import ProcessItem
+from gptrace.models.network import ModelNetwork
 from gptrace.models.processes import ModelProcesses
 from gptrace.models.selected_syscall_item import SelectedSyscallItem
 from gptrace.models.selected_syscalls import ModelSelectedSyscalls
+from gptrace.search_index import SearchIndex
+from gptrace.session_clock import (format_duration,
+                                   format_timestamp,
+                                   SessionClock)
 from gptrace.settings import (Settings,
+                              PREFERENCES_ATTACH,
+                              PREFERENCES_ATTACH_THREADS,
                               PREFERENCES_AUTO_CLEAR,
+                              PREFERENCES_BATCH_SIZE,
                               PREFERENCES_COUNT_CALLED,
+                              PREFERENCES_COUNTS_ONLY,
+                              PREFERENCES_ERRORS_BY_PID,
                               PREFERENCES_FILES_EXISTING,
+                              PREFERENCES_RECORD_TRACE,
+                              PREFERENCES_REFRESH_RATE,
+                              PREFERENCES_RETENTION_ROWS,
+                              PREFERENCES_RETENTION_SIZE,
+                              PREFERENCES_SECCOMP,
                               SECTION_ACTIVITIES,
                               SECTION_COUNTS,
+                              SECTION_ERRORS,
                               SECTION_FILES,
+                              SECTION_NETWORK,
                               SECTION_PROCESSES)
-from gptrace.syscall_tracer import SyscallTracer
+from gptrace.trace_file import TraceFileError, TraceReader
+from gptrace.tracer_service import MESSAGE_FINISHED, TracerService
 from gptrace.ui.about import UIAbout
 from gptrace.ui.base import UIBase
 from gptrace.ui.column_headers_visibility import ColumnHeadersVisibility
 from gptrace.ui.shortcuts import UIShortcuts
 
 SECTION_WINDOW_NAME = 'main window'
+# Microseconds of trace loading for each main loop iteration
+TRACE_LOAD_SLICE = 50000
+# Microseconds of search indexing for each idle main loop iteration
+SEARCH_INDEX_SLICE = 5000
 
 
 class UIMain(UIBase):
@@ -78,24 +109,48 @@ class UIMain(UIBase):
         self.options = options
         self.column_headers: typing.Optional[ColumnHeadersVisibility] = None
         self.label_syscalls_text = None
-        self.thread_loader = None
-        self.debugger = None
-        self.debug_start_time = None
-        self.filtered_items = []
+        self.activities_filter = None
+        self.activities_terms = []
+        self.activities_filter_tooltip = None
+        self.search_hits = []
+        self.search_count = 0
+        # The tracer runs in its own process to not compete with the UI
+        self.tracer_service = TracerService()
+        self.events_queue = self.tracer_service.events
+        self.events_handlers = {}
+        self.events_timer_id = None
+        self.search_index_id = None
+        # The trace files are loaded in slices when the main loop is idle
+        self.trace_loader_id = None
+        self.trace_events = None
+        self.trace_views = None
+        self.statusbar_context_id = None
+        self.session_clock = SessionClock()
         # Load settings
         self.settings = Settings(filename=FILE_SETTINGS,
                                  case_sensitive=True)
         self.settings.load_preferences()
         self.settings_map = {}
-        # Load UI
-        self.load_ui()
-        # Prepare the models
-        self.model_activities = ModelActivities(self.ui.model_activities)
+        # Prepare the models, used by the UI cell data functions
+        self.model_activities = ModelActivities(ActivitiesStore())
+        # Keep only the latest activities in memory, size is in megabytes
+        self.model_activities.model.set_retention(
+            rows=self.settings.get_preference(PREFERENCES_RETENTION_ROWS),
+            size=self.settings.get_preference(
+                PREFERENCES_RETENTION_SIZE) * 1024 * 1024)
+        self.filter_activities = self.do_create_activities_filter()
+        # The rendered activities are indexed for the search when idle
+        self.search_index = SearchIndex(store=self.model_activities.model)
+        self.ui.treeview_activities.set_model(self.filter_activities)
         self.model_selected_syscalls = ModelSelectedSyscalls(
             self.ui.model_selected_syscalls)
         self.model_counts = ModelCounts(self.ui.model_counts)
         self.model_files = ModelFiles(self.ui.model_files)
         self.model_processes = ModelProcesses(self.ui.model_processes)
+        self.model_errors = ModelErrors(self.ui.model_errors)
+        self.model_network = ModelNetwork(self.ui.model_network)
+        # Load UI
+        self.load_ui()
         # Complete initialization
         self.startup()
 
@@ -110,7 +165,9 @@ class UIMain(UIBase):
         self.set_buttons_icons(buttons=[self.ui.button_start,
                                         self.ui.button_stop,
                                         self.ui.button_about,
-                                        self.ui.button_options])
+                                        self.ui.button_options,
+                                        self.ui.button_search_previous,
+                                        self.ui.button_search_next])
         # Set buttons with always show image
         for button in [self.ui.button_start, self.ui.button_stop]:
             button.set_always_show_image(True)
@@ -137,19 +194,37 @@ class UIMain(UIBase):
                         ('column_activities_pid',
                          'menuitem_columns_activities_pid'),
                         ('column_activities_ip',
-                         'menuitem_columns_activities_ip')
+                         'menuitem_columns_activities_ip'),
+                        ('column_activities_result',
+                         'menuitem_columns_activities_result')
                 )),
                 ('menu_columns_counts', SECTION_COUNTS, (
                         ('column_counts_syscall',
                          'menuitem_columns_counts_syscall'),
                         ('column_counts_count',
                          'menuitem_columns_counts_count'),
+                        ('column_counts_total',
+                         'menuitem_columns_counts_total'),
+                        ('column_counts_mean',
+                         'menuitem_columns_counts_mean'),
+                        ('column_counts_max',
+                         'menuitem_columns_counts_max'),
+                        ('column_counts_p50',
+                         'menuitem_columns_counts_p50'),
+                        ('column_counts_p99',
+                         'menuitem_columns_counts_p99'),
+                        ('column_counts_p999',
+                         'menuitem_columns_counts_p999'),
                 )),
                 ('menu_columns_files', SECTION_FILES, (
                         ('column_files_pid',
                          'menuitem_columns_files_pid'),
                         ('column_files_existing',
                          'menuitem_columns_files_existing'),
+                        ('column_files_read',
+                         'menuitem_columns_files_read'),
+                        ('column_files_written',
+                         'menuitem_columns_files_written'),
                         ('column_files_path',
                          'menuitem_columns_files_path'),
                 )),
@@ -160,9 +235,47 @@ class UIMain(UIBase):
                          'menuitem_columns_processes_timestamp'),
                         ('column_processes_time',
                          'menuitem_columns_processes_time'),
+                        ('column_processes_duration',
+                         'menuitem_columns_processes_duration'),
+                        ('column_processes_status',
+                         'menuitem_columns_processes_status'),
+                        ('column_processes_cpu_time',
+                         'menuitem_columns_processes_cpu_time'),
+                        ('column_processes_max_rss',
+                         'menuitem_columns_processes_max_rss'),
+                        ('column_processes_switches',
+                         'menuitem_columns_processes_switches'),
                         ('column_processes_information',
                          'menuitem_columns_processes_information'),
                 )),
+                ('menu_columns_errors', SECTION_ERRORS, (
+                        ('column_errors_syscall',
+                         'menuitem_columns_errors_syscall'),
+                        ('column_errors_error',
+                         'menuitem_columns_errors_error'),
+                        ('column_errors_target',
+                         'menuitem_columns_errors_target'),
+                        ('column_errors_count',
+                         'menuitem_columns_errors_count'),
+                        ('column_errors_first',
+                         'menuitem_columns_errors_first'),
+                        ('column_errors_last',
+                         'menuitem_columns_errors_last'),
+                )),
+                ('menu_columns_network', SECTION_NETWORK, (
+                        ('column_network_peer',
+                         'menuitem_columns_network_peer'),
+                        ('column_network_local',
+                         'menuitem_columns_network_local'),
+                        ('column_network_pid',
+                         'menuitem_columns_network_pid'),
+                        ('column_network_calls',
+                         'menuitem_columns_network_calls'),
+                        ('column_network_sent',
+                         'menuitem_columns_network_sent'),
+                        ('column_network_received',
+                         'menuitem_columns_network_received'),
+                )),
         ):
             for column, menuitem in items:
                 self.column_headers.add_columns_to_section(section=section,
@@ -172,6 +285,109 @@ class UIMain(UIBase):
         # Set cellrenderers alignment
         self.ui.cell_activities_timestamp.set_property('xalign', 1.0)
         self.ui.cell_activities_time.set_property('xalign', 1.0)
+        self.ui.cell_files_read.set_property('xalign', 1.0)
+        self.ui.cell_files_written.set_property('xalign', 1.0)
+        self.ui.cell_errors_count.set_property('xalign', 1.0)
+        self.ui.cell_network_calls.set_property('xalign', 1.0)
+        self.ui.cell_network_sent.set_property('xalign', 1.0)
+        self.ui.cell_network_received.set_property('xalign', 1.0)
+        # Render the times only for the visible rows
+        for column, cell, model in (
+                (self.ui.column_activities_timestamp,
+                 self.ui.cell_activities_timestamp,
+                 self.model_activities),
+                (self.ui.column_processes_timestamp,
+                 self.ui.cell_processes_timestamp,
+                 self.model_processes)):
+            column.set_cell_data_func(cell,
+                                      self.do_render_timestamp,
+                                      model.COL_TIMESTAMP)
+        for column, cell, data in (
+                (self.ui.column_errors_first,
+                 self.ui.cell_errors_first,
+                 self.model_errors.COL_FIRST),
+                (self.ui.column_errors_last,
+                 self.ui.cell_errors_last,
+                 self.model_errors.COL_LAST)):
+            column.set_cell_data_func(cell, self.do_render_timestamp, data)
+        for column, cell, model in (
+                (self.ui.column_activities_time,
+                 self.ui.cell_activities_time,
+                 self.model_activities),
+                (self.ui.column_processes_time,
+                 self.ui.cell_processes_time,
+                 self.model_processes)):
+            column.set_cell_data_func(cell,
+                                      self.do_render_time,
+                                      model.COL_TIMESTAMP)
+        for column, cell, data in (
+                (self.ui.column_files_read,
+                 self.ui.cell_files_read,
+                 self.model_files.COL_READ),
+                (self.ui.column_files_written,
+                 self.ui.cell_files_written,
+                 self.model_files.COL_WRITTEN),
+                (self.ui.column_network_sent,
+                 self.ui.cell_network_sent,
+                 self.model_network.COL_SENT),
+                (self.ui.column_network_received,
+                 self.ui.cell_network_received,
+                 self.model_network.COL_RECEIVED)):
+            column.set_cell_data_func(cell, self.do_render_size, data)
+        # Render the syscalls durations
+        for column, cell, data in (
+                (self.ui.column_counts_total,
+                 self.ui.cell_counts_total,
+                 self.model_counts.COL_TOTAL),
+                (self.ui.column_counts_mean,
+                 self.ui.cell_counts_mean,
+                 self.model_counts.COL_MEAN),
+                (self.ui.column_counts_max,
+                 self.ui.cell_counts_max,
+                 self.model_counts.COL_MAX),
+                (self.ui.column_counts_p50,
+                 self.ui.cell_counts_p50,
+                 self.model_counts.COL_P50),
+                (self.ui.column_counts_p99,
+                 self.ui.cell_counts_p99,
+                 self.model_counts.COL_P99),
+                (self.ui.column_counts_p999,
+                 self.ui.cell_counts_p999,
+                 self.model_counts.COL_P999)):
+            cell.set_property('xalign', 1.0)
+            column.set_cell_data_func(cell, self.do_render_duration_value,
+                                      data)
+        # Render the lifetime and the resources usage of the processes
+        self.ui.column_processes_duration.set_cell_data_func(
+            self.ui.cell_processes_duration, self.do_render_duration)
+        for column, cell, data in (
+                (self.ui.column_processes_status,
+                 self.ui.cell_processes_status,
+                 self.model_processes.COL_STATUS),
+                (self.ui.column_processes_cpu_time,
+                 self.ui.cell_processes_cpu_time,
+                 self.model_processes.COL_CPU_TIME),
+                (self.ui.column_processes_max_rss,
+                 self.ui.cell_processes_max_rss,
+                 self.model_processes.COL_MAX_RSS),
+                (self.ui.column_processes_switches,
+                 self.ui.cell_processes_switches,
+                 self.model_processes.COL_SWITCHES)):
+            column.set_cell_data_func(cell, self.do_render_process_usage, data)
+        # Render the syscalls arguments only for the visible rows
+        self.ui.column_activities_format.set_cell_data_func(
+            self.ui.cell_activities_format,
+            lambda column, cell, model, iter, data: cell.set_property(
+                'text', self.model_activities.get_format(model, iter)))
+        self.ui.column_activities_ip.set_cell_data_func(
+            self.ui.cell_activities_ip,
+            lambda column, cell, model, iter, data: cell.set_property(
+                'text', self.model_activities.get_ip(model, iter)))
+        self.ui.column_activities_result.set_cell_data_func(
+            self.ui.cell_activities_result,
+            lambda column, cell, model, iter, data: cell.set_property(
+                'text', self.model_activities.get_result(model, iter)))
+        self.ui.cell_activities_result.set_property('xalign', 1.0)
         # Set options menu items value as their column headers
         for section in self.column_headers.get_sections():
             for (column, menu, menuitem) in self.column_headers.get_values(
@@ -191,6 +407,10 @@ class UIMain(UIBase):
         self.ui.window.set_icon_from_file(str(FILE_ICON))
         self.ui.window.set_application(self.application)
         self.label_syscalls_text = self.ui.label_syscalls.get_text()
+        self.activities_filter_tooltip = (
+            self.ui.entry_activities_filter.get_tooltip_text())
+        self.statusbar_context_id = self.ui.statusbar.get_context_id(
+            'events queue')
         # Connect signals from the UI file to the functions with the same name
         self.ui.connect_signals(self)
 
@@ -200,19 +420,39 @@ class UIMain(UIBase):
         self.settings_map = {
             PREFERENCES_AUTO_CLEAR:
                 self.ui.action_auto_clear_results,
+            PREFERENCES_RECORD_TRACE:
+                self.ui.action_record_trace,
+            PREFERENCES_SECCOMP:
+                self.ui.action_seccomp_filter,
+            PREFERENCES_COUNTS_ONLY:
+                self.ui.action_counts_only,
+            PREFERENCES_ATTACH:
+                self.ui.action_attach,
+            PREFERENCES_ATTACH_THREADS:
+                self.ui.action_attach_threads,
             PREFERENCES_COUNT_CALLED:
                 self.ui.action_counts_only_called,
             PREFERENCES_FILES_EXISTING:
                 self.ui.action_files_only_existing,
+            PREFERENCES_ERRORS_BY_PID:
+                self.ui.action_errors_by_pid,
         }
         # Load settings
         for setting_name, action in self.settings_map.items():
             action.set_active(self.settings.get_preference(
                 option=setting_name))
-        self.ui.filter_activities.set_visible_func(
-            lambda model, iter, data:
-            self.model_activities.get_syscall(iter) not in self.filtered_items,
-            self.filtered_items)
+        # Associate each queued event kind to the function handling it
+        self.events_handlers = {
+            EVENT_SYSCALL: self.do_add_syscall,
+            EVENT_ACTIVITIES: self.do_add_activities,
+            EVENT_COUNT: self.model_counts.set_count,
+            EVENT_FILE: self.model_files.add_data,
+            EVENT_IO: self.model_files.add_io,
+            EVENT_NETWORK: self.model_network.add_data,
+            EVENT_PROCESS_NODE: self.model_processes.add_node,
+            EVENT_PROCESS: self.model_processes.add_data,
+        }
+        self.do_update_statusbar()
         # Set filter for counting only called syscalls
         self.ui.filter_counts.set_visible_column(
             self.model_counts.COL_VISIBILITY)
@@ -267,100 +507,211 @@ class UIMain(UIBase):
         self.ui.button_stop.set_property('width-request', max_width)
         self.ui.button_stop.set_visible(False)
 
-    def do_debug_process(self, program):
-        """Debug the requested program to trace the syscalls"""
-        logging.info(f'starting debug for program: {program}')
-
-        def add_process(pid, information, value):
-            """Add a process information"""
-            logging.info(f'added new process: {information}')
-            now = datetime.datetime.now()
-            GObject.idle_add(self.model_processes.add_data, ProcessItem(
-                pid=str(pid),
-                timestamp=(now - self.debug_start_time).total_seconds(),
-                time=now.strftime('%H:%M:%S.%f'),
-                information=information,
-                value=str(value).strip()))
-
-        self.debug_start_time = datetime.datetime.now()
-        self.debugger = SyscallTracer(
-            options=optparse.Values({
-                'fork': True,
-                'enter': False,
-                'show_ip': True,
-                'trace_exec': True,
-                'trace_clone': True,
-                'no_stdout': False,
-                'pid': None,
-                'show_pid': True,
-            }),
-            program=program,
-            ignore_syscall_callback=self.do_syscall_callback_ignore,
-            syscall_callback=self.do_syscall_callback,
-            event_callback=EventTracer(add_process).handle_event,
-            quit_callback=self.do_quit_callback)
-        self.debugger.main()
-        return True
-
     def do_include_exclude_syscall(self, status):
         """
         Add or remove the selected syscall name from the selected syscalls
         model
         """
+        # Get the syscall name to ignore/unignore
+        selected_syscall = self.do_get_selected_syscall()
+        if selected_syscall:
+            # Cycle each row in the selected syscalls model
+            for key in self.model_selected_syscalls:
+                # If the syscall name for the row is the same then
+                # ignore/unignore
+                treeiter = self.model_selected_syscalls.get_iter(key=key)
+                if self.model_selected_syscalls.get_syscall(
+                        treeiter=treeiter) == selected_syscall:
+                    self.model_selected_syscalls.set_checked(
+                        treeiter=treeiter,
+                        value=status)
+                    break
+            # Update the selected syscalls count
+            self.do_update_selected_syscalls_count()
+
+    def do_get_selected_syscall(self):
+        """Get the syscall name of the selected activity"""
         selection = self.ui.treeview_activities.get_selection()
         if selection:
             model, iter = selection.get_selected()
             if iter:
-                # Get the syscall name to ignore/unignore
-                selected_syscall = self.model_activities.get_syscall(
-                    self.ui.filter_activities.convert_iter_to_child_iter(iter))
-                # Cycle each row in the selected syscalls model
-                for key in self.model_selected_syscalls:
-                    # If the syscall name for the row is the same then
-                    # ignore/unignore
-                    treeiter = self.model_selected_syscalls.get_iter(key=key)
-                    if self.model_selected_syscalls.get_syscall(
-                            treeiter=treeiter) == selected_syscall:
-                        self.model_selected_syscalls.set_checked(
-                            treeiter=treeiter,
-                            value=status)
-                        break
-                # Update the selected syscalls count
-                self.do_update_selected_syscalls_count()
-
-    def do_syscall_callback(self, syscall):
-        """Add the syscall to the syscalls model"""
-        now = datetime.datetime.now()
-        GObject.idle_add(self.model_activities.add_data, ActivityItem(
-            timestamp=(now - self.debug_start_time).total_seconds(),
-            time=now.strftime('%H:%M:%S.%f'),
-            syscall=syscall.name,
-            format=syscall.format(),
-            pid=syscall.process.pid,
-            ip=formatAddress(syscall.instr_pointer)))
-        GObject.idle_add(self.model_counts.increment_count, syscall.name)
-        # Check if the syscall has any filename or pathname argument
-        for argument in syscall.arguments:
-            argument_text = argument.getText()
-            if (argument.name in FILENAME_ARGUMENTS and
-                    argument_text != "''..."):
-                GObject.idle_add(self.model_files.add_data, FileItem(
-                    pid=str(syscall.process.pid),
-                    file_path=argument_text[1:-1],
-                    existing=os.path.exists(argument_text[1:-1])))
-
-    def do_syscall_callback_ignore(self, syscall):
-        """Determine if to ignore a callback before it's processed"""
-        if syscall.name in self.model_selected_syscalls.syscalls:
-            # Process the syscall
-            return False
+                return self.model_activities.get_syscall(
+                    self.filter_activities.convert_iter_to_child_iter(iter))
+        return None
+
+    def do_create_activities_filter(self):
+        """Create the filter model of the activities, the rows already in
+        the activities model are shown without notifying them one by
+        one"""
+        self.filter_activities = self.model_activities.model.filter_new()
+        self.filter_activities.set_visible_func(self.do_filter_activity)
+        return self.filter_activities
+
+    def do_filter_activity(self, model, treeiter, data):
+        """Check if an activity matches the filter expression"""
+        return (self.activities_filter is None or
+                self.activities_filter(model.get_index(treeiter)))
+
+    def do_update_search_hits(self):
+        """Search the activities matching the search text"""
+        text = self.ui.entry_activities_search.get_text()
+        self.search_hits = self.search_index.search(text)
+        self.search_count = self.search_index.count
+        self.ui.label_activities_search.set_text(
+            _('%d matches') % len(self.search_hits) if text else '')
+
+    def do_schedule_search_index(self):
+        """Index the new activities when the main loop is idle"""
+        if not self.search_index_id and self.search_index.has_pending():
+            self.search_index_id = GLib.idle_add(
+                self.do_index_activities, priority=GLib.PRIORITY_LOW)
+
+    def do_index_activities(self):
+        """Index the activities for a time slice"""
+        # The index is built on the main loop, a worker thread would hold
+        # the GIL against the main loop and lock the rows being spilled
+        deadline = GLib.get_monotonic_time() + SEARCH_INDEX_SLICE
+        while self.search_index.index_rows():
+            if GLib.get_monotonic_time() >= deadline:
+                return True
+        self.search_index_id = None
+        return False
+
+    def do_cancel_search_index(self):
+        """Stop indexing the activities"""
+        if self.search_index_id:
+            GLib.source_remove(self.search_index_id)
+            self.search_index_id = None
+
+    def do_jump_search_hit(self, forward, include_selected=False):
+        """Select the next or the previous visible activity matching the
+        search text"""
+        if self.search_count != self.search_index.count:
+            # Search again including the latest indexed activities
+            self.do_update_search_hits()
+        hits = self.search_hits
+        if not hits:
+            return
+        model, treeiter = (
+            self.ui.treeview_activities.get_selection().get_selected())
+        if treeiter:
+            current = self.model_activities.model.get_index(
+                self.filter_activities.convert_iter_to_child_iter(treeiter))
+            if include_selected:
+                current += -1 if forward else 1
         else:
-            # Ignore the syscall
+            current = -1 if forward else len(self.model_activities.model)
+        # Cycle the matches starting from the selected activity
+        if forward:
+            start = bisect.bisect_right(hits, current)
+            positions = itertools.chain(range(start, len(hits)),
+                                        range(start))
+        else:
+            start = bisect.bisect_left(hits, current)
+            positions = itertools.chain(range(start - 1, -1, -1),
+                                        range(len(hits) - 1, start - 1, -1))
+        for position in positions:
+            # Skip the activities hidden by the filter
+            path = self.filter_activities.convert_child_path_to_path(
+                Gtk.TreePath((hits[position], )))
+            if path:
+                self.ui.treeview_activities.set_cursor(path, None, False)
+                self.ui.treeview_activities.scroll_to_cell(
+                    path, None, True, 0.5, 0.0)
+                self.ui.label_activities_search.set_text(
+                    _('%(position)d of %(count)d') % {
+                        'position': position + 1,
+                        'count': len(hits)})
+                break
+
+    def do_add_syscall(self, item):
+        """Add a syscall activity and update its count"""
+        self.model_activities.add_data(item)
+        self.model_counts.increment_count(item.syscall, item.duration)
+        if is_error(item.result):
+            self.model_errors.add_data(item)
+
+    def do_add_activities(self, activities):
+        """Add a block of activities read from a trace file"""
+        self.model_activities.model.extend(activities)
+        for syscall, count, histogram in activities.get_counts():
+            self.model_counts.add_counts(syscall, count, histogram)
+        for item in activities.get_errors():
+            self.model_errors.add_data(item)
+
+    def do_process_events_queue(self):
+        """Deliver a batch of the queued events to the models"""
+        batch_size = self.settings.get_preference(PREFERENCES_BATCH_SIZE)
+        for kind, item in self.events_queue.get_batch(batch_size):
+            self.events_handlers[kind](item)
+        self.model_counts.update_durations()
+        self.model_errors.update_errors()
+        self.do_schedule_search_index()
+        for message in self.tracer_service.get_messages():
+            if message == MESSAGE_FINISHED:
+                self.do_restore_controls()
+                if self.tracer_service.exited:
+                    self.ui.label_infobar_content.set_markup(
+                        _('The tracer process has exited unexpectedly'))
+                    self.ui.infobar_information.set_visible(True)
+        self.do_update_statusbar()
+        if self.events_queue or self.tracer_service.running:
+            # Keep processing the events
             return True
+        else:
+            # No more events to process, the timer will be restarted
+            # with the next debug session
+            self.events_timer_id = None
+            return False
+
+    def do_render_timestamp(self, column, cell, model, treeiter, data):
+        """Render the seconds since the session start"""
+        cell.set_property('text', format_timestamp(model[treeiter][data]))
+
+    def do_render_time(self, column, cell, model, treeiter, data):
+        """Render the wall clock time of the event"""
+        cell.set_property('text', self.session_clock.format_time(
+            model[treeiter][data]))
+
+    def do_render_size(self, column, cell, model, treeiter, data):
+        """Render the transferred bytes"""
+        cell.set_property('text', GLib.format_size(model[treeiter][data]))
+
+    def do_render_duration_value(self, column, cell, model, treeiter, data):
+        """Render the syscalls durations"""
+        value = model[treeiter][data]
+        cell.set_property('text', format_duration(value) if value else '')
+
+    def do_render_duration(self, column, cell, model, treeiter, data):
+        """Render the lifetime of the terminated processes"""
+        row = model[treeiter]
+        end = row[self.model_processes.COL_END]
+        cell.set_property('text', format_timestamp(
+            end - row[self.model_processes.COL_TIMESTAMP]) if end else '')
+
+    def do_render_process_usage(self, column, cell, model, treeiter, data):
+        """Render the exit status and the resources used by a process"""
+        row = model[treeiter]
+        if row[self.model_processes.COL_STATUS] is None:
+            text = ''
+        elif data == self.model_processes.COL_CPU_TIME:
+            text = format_timestamp(row[data])
+        elif data == self.model_processes.COL_MAX_RSS:
+            text = GLib.format_size(row[data] * 1024)
+        else:
+            text = str(row[data])
+        cell.set_property('text', text)
 
-    def do_quit_callback(self):
-        """The debugger is quitting"""
-        self.ui.action_stop.activate()
+    def do_restore_controls(self):
+        """Restore file chooser and set execute icon"""
+        self.ui.text_program.set_sensitive(True)
+        self.ui.action_start.set_sensitive(True)
+        self.ui.action_stop.set_sensitive(False)
+        self.ui.action_browse.set_sensitive(True)
+        self.ui.action_open_trace.set_sensitive(True)
+        self.ui.text_program.set_property('secondary-icon-sensitive', True)
+        self.ui.button_start.set_visible(True)
+        self.ui.button_stop.set_visible(False)
 
     def do_update_selected_syscalls_count(self):
         """Update the selected syscalls count label"""
@@ -369,6 +720,23 @@ class UIMain(UIBase):
                 'selected': len(self.model_selected_syscalls.syscalls),
                 'total': len(self.model_selected_syscalls),
             })
+        # Forward the selection changes to the running trace
+        if self.tracer_service.running:
+            self.tracer_service.set_syscalls(
+                set(self.model_selected_syscalls.syscalls))
+
+    def do_update_statusbar(self):
+        """Update the status bar with the events queue status"""
+        self.ui.statusbar.remove_all(self.statusbar_context_id)
+        self.ui.statusbar.push(
+            self.statusbar_context_id,
+            _('Refresh rate: %(rate)d Hz, batch size: %(size)d events, '
+              'pending events: %(pending)d') % {
+                'rate': self.settings.get_preference(
+                    PREFERENCES_REFRESH_RATE),
+                'size': self.settings.get_preference(PREFERENCES_BATCH_SIZE),
+                'pending': len(self.events_queue),
+            })
 
     def on_action_about_activate(self, widget):
         """Show the information dialog"""
@@ -400,11 +768,14 @@ class UIMain(UIBase):
         # before the window is effectively destroyed
         self.ui.window.hide()
         process_events()
-        # Cancel the running thread
-        if self.thread_loader and self.thread_loader.is_alive():
-            logging.info('canceling running thread')
-            self.thread_loader.cancel()
-            self.thread_loader.join()
+        # Close the tracer process
+        logging.info('closing the tracer process')
+        self.tracer_service.quit()
+        if self.trace_loader_id:
+            GLib.source_remove(self.trace_loader_id)
+            self.trace_loader_id = None
+            self.trace_events.close()
+        self.do_cancel_search_index()
         self.ui.window.destroy()
         self.application.quit()
 
@@ -420,13 +791,26 @@ class UIMain(UIBase):
                     option=setting_name,
                     value=widget.get_active())
 
+    def on_action_attach_toggled(self, widget):
+        """Set the program entry to accept the processes to attach"""
+        self.on_action_options_toggled(widget)
+        self.ui.text_program.set_placeholder_text(
+            _('PIDs or names of the processes to attach')
+            if widget.get_active() else '')
+
     def on_action_clear_results_activate(self, widget):
         """Clear the results list"""
         logging.debug('Clearing results list')
+        self.events_queue.clear()
         self.model_activities.clear()
+        self.do_cancel_search_index()
+        self.search_index.clear()
+        self.do_update_search_hits()
         self.model_counts.clear_values()
         self.model_files.clear()
         self.model_processes.clear()
+        self.model_errors.clear()
+        self.model_network.clear()
 
     def on_action_counts_only_called_toggled(self, widget):
         """Set visibility of syscalls in counts section"""
@@ -435,6 +819,32 @@ class UIMain(UIBase):
         else:
             self.ui.treeview_counts.set_model(self.ui.model_counts)
 
+    def on_action_errors_by_pid_toggled(self, widget):
+        """Group the errors by PID or by path"""
+        self.model_errors.set_by_pid(
+            self.ui.action_errors_by_pid.get_active())
+
+    def on_treeview_files_query_tooltip(self, widget, x, y, keyboard_mode,
+                                        tooltip):
+        """Show the processes which used the file under the pointer"""
+        result, x, y, model, path, treeiter = widget.get_tooltip_context(
+            x, y, keyboard_mode)
+        if not result:
+            return False
+        file_path = model[treeiter][self.model_files.COL_FILEPATH]
+        index = self.model_files.get_file_index(file_path)
+        if not index:
+            return False
+        tooltip.set_text(
+            _('Processes: %(pids)s\n'
+              'First use: %(time)s\n'
+              'Accesses: %(count)d') % {
+                'pids': ', '.join(sorted(index.pids, key=int)),
+                'time': self.session_clock.format_time(index.timestamp),
+                'count': index.count})
+        widget.set_tooltip_row(tooltip, path)
+        return True
+
     def on_action_files_only_existing_toggled(self, widget):
         """Set visibility of only existing files in files section"""
         state = self.ui.action_files_only_existing.get_active()
@@ -446,11 +856,17 @@ class UIMain(UIBase):
             state and -1 or self.model_files.COL_PID)
         self.ui.column_files_path.set_sort_column_id(
             state and -1 or self.model_files.COL_FILEPATH)
+        self.ui.column_files_read.set_sort_column_id(
+            state and -1 or self.model_files.COL_READ)
+        self.ui.column_files_written.set_sort_column_id(
+            state and -1 or self.model_files.COL_WRITTEN)
         # BUG: GTK+ seems to not react if the sort column ID is changed
         # Set the clickable property again after setting the sort column ID
         self.ui.column_files_existing.set_clickable(True)
         self.ui.column_files_pid.set_clickable(True)
         self.ui.column_files_path.set_clickable(True)
+        self.ui.column_files_read.set_clickable(True)
+        self.ui.column_files_written.set_clickable(True)
         if state:
             self.ui.treeview_files.set_model(self.ui.filter_files)
             self.ui.label_infobar_content.set_markup(
@@ -469,35 +885,64 @@ class UIMain(UIBase):
         self.ui.action_start.set_sensitive(False)
         self.ui.action_stop.set_sensitive(True)
         self.ui.action_browse.set_sensitive(False)
+        self.ui.action_open_trace.set_sensitive(False)
         self.ui.text_program.set_property('secondary-icon-sensitive', False)
         self.ui.button_start.set_visible(False)
         self.ui.button_stop.set_visible(True)
+        self.session_clock = SessionClock()
+        # Record the events to a trace file from the tracer process
+        record = None
+        if self.ui.action_record_trace.get_active():
+            record = show_dialog_filesave(
+                parent=self.ui.window,
+                title=_('Select the file where to record the trace'))
         # Start debugger
-        self.thread_loader = DaemonThread(
-            target=self.do_debug_process,
-            args=(shlex.split(self.ui.text_program.get_text()),)
-        )
-        self.thread_loader.start()
+        program = shlex.split(self.ui.text_program.get_text())
+        pids = []
+        names = []
+        if self.ui.action_attach.get_active():
+            # Attach the running processes by PID or by name
+            pids = [int(target) for target in program if target.isdigit()]
+            names = [target for target in program if not target.isdigit()]
+            program = []
+            logging.info(f'attaching processes: {pids} {names}')
+        else:
+            logging.info(f'starting debug for program: {program}')
+        self.tracer_service.start(
+            program=program,
+            options=optparse.Values({
+                'fork': True,
+                'enter': False,
+                'show_ip': True,
+                'trace_exec': True,
+                'trace_clone': True,
+                'no_stdout': False,
+                'pid': pids,
+                'process_names': names,
+                'threads': self.ui.action_attach_threads.get_active(),
+                'show_pid': True,
+                'seccomp': self.settings.get_preference(PREFERENCES_SECCOMP),
+                'counts_only': self.settings.get_preference(
+                    PREFERENCES_COUNTS_ONLY),
+                'decoding': self.settings.get_decoding_profiles(),
+                'syscalls': set(self.model_selected_syscalls.syscalls),
+                'record': record,
+            }),
+            clock=self.session_clock)
+        # Deliver the queued events at the configured refresh rate
+        if not self.events_timer_id:
+            refresh_rate = max(1, self.settings.get_preference(
+                PREFERENCES_REFRESH_RATE))
+            self.events_timer_id = GLib.timeout_add(
+                1000 // refresh_rate, self.do_process_events_queue)
 
     def on_action_stop_activate(self, widget):
         """Stop the running debugger"""
-        if self.thread_loader:
-            logging.warning('cancel running thread')
-            self.thread_loader.cancel()
-            try:
-                # Race condition, the debugger may be set to None
-                logging.info('quit the debugger')
-                self.debugger.quit()
-            except AttributeError:
-                pass
-            # Restore file chooser and set execute icon
-            self.ui.text_program.set_sensitive(True)
-            self.ui.action_start.set_sensitive(True)
+        if self.tracer_service.running:
+            logging.warning('stop the running debugger')
+            self.tracer_service.stop()
+            # The controls will be restored once the tracer has finished
             self.ui.action_stop.set_sensitive(False)
-            self.ui.action_browse.set_sensitive(True)
-            self.ui.text_program.set_property('secondary-icon-sensitive', True)
-            self.ui.button_start.set_visible(True)
-            self.ui.button_stop.set_visible(False)
 
     def on_action_browse_activate(self, widget):
         """Select the program to open"""
@@ -506,6 +951,70 @@ class UIMain(UIBase):
         if program:
             self.ui.text_program.set_text(program)
 
+    def on_action_open_trace_activate(self, widget):
+        """Load the events from a recorded trace file"""
+        filename = show_dialog_fileopen(parent=self.ui.window,
+                                        title=_('Select a trace to open'))
+        if filename:
+            self.ui.action_clear_results.activate()
+            # Detach the models from their views during the load
+            treeviews = (self.ui.treeview_activities,
+                         self.ui.treeview_counts,
+                         self.ui.treeview_files,
+                         self.ui.treeview_processes,
+                         self.ui.treeview_errors,
+                         self.ui.treeview_network)
+            self.trace_views = (treeviews,
+                                [treeview.get_model()
+                                 for treeview in treeviews])
+            for treeview in treeviews:
+                treeview.set_model(None)
+            for action in (self.ui.action_start,
+                           self.ui.action_open_trace,
+                           self.ui.action_clear_results):
+                action.set_sensitive(False)
+            # The trace is read a block at once while the UI is responsive
+            reader = TraceReader(filename)
+            self.trace_events = iter(reader)
+            self.trace_loader_id = GLib.idle_add(self.do_load_trace,
+                                                 reader)
+
+    def do_load_trace(self, reader):
+        """Load the events of a trace file for a time slice, returning True
+        until the whole trace was loaded"""
+        deadline = GLib.get_monotonic_time() + TRACE_LOAD_SLICE
+        try:
+            # The activities are loaded in bulk without any row signal
+            for kind, item in self.trace_events:
+                self.events_handlers[kind](item)
+                if GLib.get_monotonic_time() >= deadline:
+                    return True
+        except (OSError, TraceFileError) as error:
+            logging.error(f'Unable to load the trace {reader.filename}: '
+                          f'{error}')
+        self.trace_loader_id = None
+        self.trace_events = None
+        self.model_counts.update_durations()
+        self.model_errors.update_errors()
+        self.do_schedule_search_index()
+        if reader.start_time:
+            # Show the times from the recorded session start
+            self.session_clock = SessionClock(start_time=reader.start_time)
+        self.do_restore_trace_views()
+        return False
+
+    def do_restore_trace_views(self):
+        """Attach the models to their views after the trace load"""
+        treeviews, models = self.trace_views
+        self.trace_views = None
+        models[0] = self.do_create_activities_filter()
+        for treeview, model in zip(treeviews, models):
+            treeview.set_model(model)
+        for action in (self.ui.action_start,
+                       self.ui.action_open_trace,
+                       self.ui.action_clear_results):
+            action.set_sensitive(True)
+
     def on_action_syscalls_select_all_activate(self, widget):
         """Intercept all the syscalls"""
         for key in self.model_selected_syscalls:
@@ -544,42 +1053,30 @@ class UIMain(UIBase):
 
     def on_action_syscalls_filter_hide_activate(self, widget):
         """Hide the selected syscall from the results"""
-        selection = self.ui.treeview_activities.get_selection()
-        if selection:
-            model, iter = selection.get_selected()
-            if iter:
-                # Add the selected syscall to the filtered syscalls list
-                iter = self.ui.filter_activities.convert_iter_to_child_iter(
-                    iter)
-                self.filtered_items.append(self.model_activities.get_syscall(
-                    treeiter=iter))
-                # Filter the results
-                self.ui.filter_activities.refilter()
+        syscall = self.do_get_selected_syscall()
+        if syscall:
+            # Add the selected syscall to the filter expression
+            text = self.ui.entry_activities_filter.get_text().strip()
+            self.ui.entry_activities_filter.set_text(
+                f'{text} !syscall:{syscall}'.lstrip())
 
     def on_action_syscalls_filter_show_only_activate(self, widget):
         """Show only the selected syscall from the results"""
-        selection = self.ui.treeview_activities.get_selection()
-        if selection:
-            model, iter = selection.get_selected()
-            if iter:
-                while len(self.filtered_items):
-                    self.filtered_items.pop()
-                # First include every syscall names to the filtered syscalls
-                self.filtered_items.extend(SYSCALL_NAMES.values())
-                # Then remove the selected syscall from the filtered syscalls
-                # list
-                iter = self.ui.filter_activities.convert_iter_to_child_iter(
-                    iter)
-                self.filtered_items.remove(self.model_activities.get_syscall(
-                    treeiter=iter))
-                # Filter the results
-                self.ui.filter_activities.refilter()
+        syscall = self.do_get_selected_syscall()
+        if syscall:
+            self.ui.entry_activities_filter.set_text(f'syscall:{syscall}')
 
     def on_action_syscalls_filter_reset_activate(self, widget):
-        """Clear the filtered syscalls list including all"""
-        while len(self.filtered_items):
-            self.filtered_items.pop()
-        self.ui.filter_activities.refilter()
+        """Clear the filter expression including all"""
+        self.ui.entry_activities_filter.set_text('')
+
+    def on_action_search_previous_activate(self, widget):
+        """Select the previous activity matching the search text"""
+        self.do_jump_search_hit(forward=False)
+
+    def on_action_search_next_activate(self, widget):
+        """Select the next activity matching the search text"""
+        self.do_jump_search_hit(forward=True)
 
     def on_action_syscalls_filter_exclude_activate(self, widget):
         """
@@ -597,6 +1094,47 @@ class UIMain(UIBase):
         self.model_selected_syscalls.toggle_checked(treeiter)
         self.do_update_selected_syscalls_count()
 
+    def on_entry_activities_filter_search_changed(self, widget):
+        """Compile the filter expression and filter the activities"""
+        style_context = widget.get_style_context()
+        store = self.model_activities.model
+        try:
+            terms = parse_filter(widget.get_text())
+            self.activities_filter = compile_terms(terms=terms, store=store)
+        except FilterError as error:
+            # Keep the previous filter until the expression is valid
+            style_context.add_class('error')
+            widget.set_tooltip_text(str(error))
+            return
+        style_context.remove_class('error')
+        widget.set_tooltip_text(self.activities_filter_tooltip)
+        # Check only the rows of the changed syscalls and processes
+        rows = get_changed_rows(previous_terms=self.activities_terms,
+                                terms=terms,
+                                store=store)
+        self.activities_terms = terms
+        if rows is None:
+            self.filter_activities.refilter()
+        else:
+            store.refresh_rows(rows)
+
+    def on_entry_activities_search_search_changed(self, widget):
+        """Search the activities while typing"""
+        self.do_update_search_hits()
+        self.do_jump_search_hit(forward=True, include_selected=True)
+
+    def on_entry_activities_search_activate(self, widget):
+        """Select the next activity matching the search text"""
+        self.ui.action_search_next.activate()
+
+    def on_entry_activities_search_next_match(self, widget):
+        """Select the next activity matching the search text"""
+        self.ui.action_search_next.activate()
+
+    def on_entry_activities_search_previous_match(self, widget):
+        """Select the previous activity matching the search text"""
+        self.ui.action_search_previous.activate()
+
     def on_infobar_information_response(self, widget, response):
         """Click on the infobar buttons"""
         if response == Gtk.ResponseType.CLOSE:
@@ -216,6 +216,7 @@ setuptools.setup(
     url=URL_APPLICATION,
     description=APP_DESCRIPTION,
     license='GPL v3',
+    python_requires='>=3.7',
     scripts=['gptrace.py'],
     packages=['gptrace',
               'gptrace.models',
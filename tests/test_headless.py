@@ -0,0 +1,71 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import argparse
+import os
+import sys
+import tempfile
+import unittest
+
+from gptrace.headless import HeadlessTracer
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), 'requires ptrace')
+class TestHeadless(unittest.TestCase):
+    def setUp(self):
+        descriptor, self.filename = tempfile.mkstemp(suffix='.tsv')
+        os.close(descriptor)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def trace(self, *program, counts_only=False):
+        """Trace a program returning the output lines split by column"""
+        HeadlessTracer(argparse.Namespace(output=self.filename,
+                                          record=None,
+                                          syscalls=None,
+                                          seccomp=False,
+                                          pid=None,
+                                          name=None,
+                                          threads=False,
+                                          counts_only=counts_only,
+                                          decoding=[],
+                                          program=list(program))).run()
+        with open(self.filename) as output:
+            return [line.rstrip('\n').split('\t') for line in output]
+
+    def test_started_process(self):
+        """The traced program starts before its exit"""
+        lines = [line for line in self.trace('/bin/true')
+                 if line[0] in ('start', 'exit')]
+        self.assertEqual([line[0] for line in lines], ['start', 'exit'])
+        start, exit = lines
+        self.assertEqual(start[2], exit[2])
+        self.assertLessEqual(float(start[1]), float(exit[1]))
+
+    def test_escaped_values(self):
+        """The tabs, newlines and backslashes in the values are escaped"""
+        lines = self.trace('/bin/true', 'a\tb\nc\\d')
+        columns = {'start': 4, 'exit': 7, 'syscall': 8, 'file': 4,
+                   'process': 5, 'io': 5, 'network': 7, 'count': 9}
+        for line in lines:
+            self.assertEqual(len(line), columns[line[0]], line)
+        self.assertIn(['Command line', '/bin/true a\\tb\\nc\\\\d'],
+                      [line[3:] for line in lines if line[0] == 'process'])
@@ -0,0 +1,95 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import types
+import unittest
+
+from gptrace.path_resolver import PathResolver
+
+PID = 1000
+MFD_CLOEXEC = 1
+O_CLOEXEC = 0o2000000
+CLOSE_RANGE_CLOEXEC = 4
+
+
+def create_syscall(name, result, *values):
+    """Create a syscall with its raw arguments values"""
+    return types.SimpleNamespace(
+        name=name,
+        result=result,
+        process=types.SimpleNamespace(pid=PID),
+        arguments=[types.SimpleNamespace(value=value) for value in values])
+
+
+class TestPathResolver(unittest.TestCase):
+    def setUp(self):
+        self.resolver = PathResolver(
+            syscalls={'close', 'close_range', 'dup2', 'dup3'})
+        # Avoid to read the thread group of the fake process
+        self.resolver.join_group(PID, PID)
+        for descriptor in (3, 4, 5, 6):
+            self.resolver.update(
+                create_syscall('openat', descriptor, 0, 0, 0, 0, 0, 0),
+                f'/file{descriptor}')
+
+    def get_descriptors(self):
+        """Get the known descriptors with their close-on-exec flag"""
+        return {descriptor: cloexec
+                for descriptor, (_, cloexec)
+                in self.resolver.descriptors[PID].items()}
+
+    def test_close_range(self):
+        """The descriptors in the range are closed"""
+        # close_range has no prototype and gets six raw arguments
+        self.resolver.update(
+            create_syscall('close_range', 0, 4, 5, 0, 0, 0, 0), None)
+        self.assertEqual(self.get_descriptors(), {3: False, 6: False})
+
+    def test_close_range_unsigned_last(self):
+        """The last descriptor is an unsigned value"""
+        self.resolver.update(
+            create_syscall('close_range', 0, 5, 0xffffffff, 0, 0, 0, 0),
+            None)
+        self.assertEqual(self.get_descriptors(), {3: False, 4: False})
+
+    def test_close_range_cloexec(self):
+        """The descriptors in the range are marked as close-on-exec"""
+        self.resolver.update(
+            create_syscall('close_range', 0, 5, 6, CLOSE_RANGE_CLOEXEC,
+                           0, 0, 0),
+            None)
+        self.assertEqual(self.get_descriptors(),
+                         {3: False, 4: False, 5: True, 6: True})
+        self.resolver.execute(PID)
+        self.assertEqual(self.get_descriptors(), {3: False, 4: False})
+
+    def test_new_descriptors_cloexec(self):
+        """Each syscall uses its own close-on-exec flag"""
+        self.resolver.update(
+            create_syscall('memfd_create', 7, 0, MFD_CLOEXEC), None)
+        self.resolver.update(
+            create_syscall('memfd_create', 8, 0, O_CLOEXEC), None)
+        self.resolver.update(
+            create_syscall('socket', 9, 1, 1 | O_CLOEXEC, 0), None)
+        self.resolver.update(create_syscall('accept', 10, 9, 0, 0), None)
+        descriptors = self.get_descriptors()
+        self.assertEqual([descriptors[descriptor] for descriptor in
+                          (7, 8, 9, 10)],
+                         [True, False, True, False])
@@ -0,0 +1,197 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import datetime
+import os
+import random
+import tempfile
+import unittest
+import zlib
+
+from gptrace.event_queue import (EVENT_ACTIVITIES,
+                                 EVENT_FILE,
+                                 EVENT_PROCESS,
+                                 EVENT_PROCESS_NODE,
+                                 EVENT_SYSCALL)
+from gptrace.models.activity_item import ActivityItem
+from gptrace.models.file_item import FileItem
+from gptrace.models.process_item import ProcessItem
+from gptrace.models.process_node_item import ProcessNodeItem
+from gptrace.syscall_format import render_syscall
+from gptrace.trace_file import (TRACE_FILE_MAGIC,
+                                TRACE_FILE_VERSION,
+                                TraceFileError,
+                                TraceReader,
+                                TraceWriter,
+                                write_varint)
+
+# Unsigned registers values of the negative arguments
+AT_FDCWD = (1 << 64) - 100
+OFFSET_MINUS_5 = (1 << 64) - 5
+
+
+class TestTraceFile(unittest.TestCase):
+    def setUp(self):
+        descriptor, self.filename = tempfile.mkstemp(suffix='.gpt')
+        os.close(descriptor)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def replay(self, *items):
+        """Record the activities and read them back"""
+        writer = TraceWriter(filename=self.filename,
+                             start_time=datetime.datetime.now())
+        for item in items:
+            writer.write(EVENT_SYSCALL, item)
+        writer.close()
+        return [item
+                for kind, activities in TraceReader(self.filename)
+                if kind == EVENT_ACTIVITIES
+                for item in activities]
+
+    def test_arguments_values(self):
+        """The arguments values keep their unsigned 64 bits value"""
+        values = (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1,
+                  AT_FDCWD, OFFSET_MINUS_5)
+        item = ActivityItem(
+            timestamp=1000,
+            syscall='test',
+            arguments=('long', tuple((f'arg{index}', 'long', value, None)
+                                     for index, value in enumerate(values))),
+            pid=1,
+            ip=0x7fffffffffff,
+            result=-2)
+        replayed, = self.replay(item)
+        self.assertEqual(replayed.arguments, item.arguments)
+        self.assertEqual(replayed.result, -2)
+
+    def test_negative_python_values(self):
+        """The negative values are stored unchanged"""
+        item = ActivityItem(
+            timestamp=0,
+            syscall='close',
+            arguments=('int', (('fd', 'int', -100, None), )),
+            pid=1,
+            ip=0)
+        replayed, = self.replay(item)
+        self.assertEqual(replayed.arguments[1][0][2], -100)
+
+    def test_negative_offset_rendering(self):
+        """The replayed syscalls are rendered like the live ones"""
+        arguments = ('off_t', (('fd', 'unsigned int', 3, None),
+                               ('offset', 'off_t', OFFSET_MINUS_5, None),
+                               ('origin', 'unsigned int', 2, None)))
+        item = ActivityItem(timestamp=0,
+                            syscall='lseek',
+                            arguments=arguments,
+                            pid=1,
+                            ip=0,
+                            result=10)
+        replayed, = self.replay(item)
+        self.assertEqual(render_syscall('lseek', replayed.arguments),
+                         render_syscall('lseek', arguments))
+        self.assertNotIn('-', render_syscall('lseek', replayed.arguments))
+
+    def write_trace(self):
+        """Record a trace with every kind of event, returning its data"""
+        writer = TraceWriter(filename=self.filename,
+                             start_time=datetime.datetime.now())
+        writer.write(EVENT_PROCESS_NODE, ProcessNodeItem(pid='1',
+                                                         parent=None,
+                                                         timestamp=0))
+        writer.write(EVENT_PROCESS, ProcessItem(pid='1',
+                                                timestamp=10,
+                                                information='Command line',
+                                                value='/bin/true'))
+        writer.write(EVENT_FILE, FileItem(pid='1',
+                                          file_path='/etc/passwd',
+                                          existing=True,
+                                          timestamp=20))
+        for timestamp in range(100):
+            writer.write(EVENT_SYSCALL, ActivityItem(
+                timestamp=timestamp,
+                syscall='close',
+                arguments=('int', (('fd', 'int', 3, None), )),
+                pid=1,
+                ip=0,
+                result=0,
+                path='/etc/passwd'))
+        writer.close()
+        with open(self.filename, 'rb') as file:
+            return file.read()
+
+    def read_data(self, data):
+        """Read a trace file with the data, returning its events"""
+        with open(self.filename, 'wb') as file:
+            file.write(data)
+        return list(TraceReader(self.filename))
+
+    def test_truncated_files(self):
+        """The truncated files are read up to their last complete block
+        or they raise TraceFileError"""
+        data = self.write_trace()
+        for length in range(len(data)):
+            try:
+                self.read_data(data[:length])
+            except TraceFileError:
+                pass
+
+    def test_garbage_files(self):
+        """The invalid files raise TraceFileError"""
+        generator = random.Random(0)
+        for data in (b'', TRACE_FILE_MAGIC, b'garbage',
+                     bytes(generator.randrange(256) for _ in range(100))):
+            with self.assertRaises(TraceFileError):
+                self.read_data(data)
+
+    def test_garbage_blocks(self):
+        """The corrupted records raise only TraceFileError"""
+        generator = random.Random(0)
+        data = self.write_trace()
+        header = bytearray(TRACE_FILE_MAGIC)
+        header.append(TRACE_FILE_VERSION)
+        write_varint(header, 0)
+        for _ in range(200):
+            records = bytearray(
+                generator.randrange(256)
+                for _ in range(generator.randrange(1, 64)))
+            # Start with a valid record type
+            records[0] %= 8
+            block = zlib.compress(bytes(records))
+            trace = bytearray(header)
+            write_varint(trace, len(block))
+            trace += block
+            try:
+                self.read_data(trace)
+            except TraceFileError:
+                pass
+        # Corrupt the compressed block of a valid trace
+        for position in range(len(header), len(data), 7):
+            corrupted = bytearray(data)
+            corrupted[position] ^= 0xff
+            try:
+                self.read_data(corrupted)
+            except TraceFileError:
+                pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+##
+#     Project: gpTrace
+# Description: Trace the activities of an external application
+#      Author: Fabio Castelli (Muflone) <muflone@muflone.com>
+#   Copyright: 2014-2022 Fabio Castelli
+#     License: GPL-3+
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+##
+
+import optparse
+import types
+import unittest
+
+from ptrace.syscall import SYSCALL_NAMES
+
+from gptrace.session_clock import SessionClock
+from gptrace.syscall_counter import SyscallCounter
+from gptrace.tracer_service import (MESSAGE_FINISHED,
+                                    TracerService,
+                                    TracerWorker)
+
+
+class TestTracerService(unittest.TestCase):
+    def test_tracer_process_exited(self):
+        """The commands to a dead tracer process finish the trace"""
+        service = TracerService()
+        service.process.kill()
+        service.process.join()
+        service.start(program=['/bin/true'],
+                      options=optparse.Values({'syscalls': set()}),
+                      clock=SessionClock())
+        self.assertEqual(service.get_messages(), [MESSAGE_FINISHED])
+        self.assertFalse(service.running)
+        self.assertTrue(service.exited)
+        service.stop()
+        service.quit()
+
+    def test_set_syscalls(self):
+        """The selection changes reach the running trace"""
+        worker = TracerWorker(events=None, connection=None)
+        worker.collector = types.SimpleNamespace(syscalls={'read'})
+        worker.counter = SyscallCounter(syscalls={'read'}, callback=None)
+        worker.set_syscalls({'write'})
+        self.assertEqual(worker.collector.syscalls, {'write'})
+        self.assertEqual(
+            {SYSCALL_NAMES[number]
+             for number, selected in enumerate(worker.counter.selected)
+             if selected},
+            {'write'})